@@ -1,27 +1,123 @@
-from django.contrib import admin
-from .models import Room, Booking, Payment
+import re
+from functools import reduce
+from operator import or_
+
+from django.contrib import admin, messages
+from django.contrib.postgres.search import SearchQuery
+from django.db.models import Q
+from django.utils.text import smart_split, unescape_string_literal
+from .models import (
+    ROOM_SEARCH_CONFIG,
+    Room,
+    Booking,
+    BookingGroup,
+    Payment,
+    PaymentIntentOutbox,
+    WaitlistEntry,
+    ArchivedBooking,
+    ArchivedPayment,
+    BookingEvent,
+    StripeWebhookEvent,
+)
+from .booking_details import refresh_booking_details, refresh_room_booking_details
+from .paginators import EstimatedCountPaginator
+from .services import (
+    bulk_transition_bookings,
+    rebuild_seat_counters,
+    record_status_changes,
+    status_change_for,
+)
+
+
+class RelatedSearchMixin:
+    """
+    Search the user and room of each row through one subquery per table.
+
+    search_fields like ``user__email`` would join every table into one OR'd
+    condition that no index can serve. Here each subquery filters one table
+    with icontains, i.e. UPPER(col::text) LIKE UPPER('%word%'), which the
+    trigram indexes on those expressions serve. Every word must match, as
+    in the default admin search.
+    """
+
+    # Relation -> fields of the related model searched with icontains
+    related_search_fields = {"user": ["username", "email"], "room": ["name"]}
+
+    def get_search_results(self, request, queryset, search_term):
+        words = []
+        for word in smart_split(search_term):
+            if word[0] in "\"'" and word[0] == word[-1]:
+                word = unescape_string_literal(word)
+            words.append(word)
+        if not words:
+            return queryset, False
+
+        for word in words:
+            matches = []
+            for relation, fields in self.related_search_fields.items():
+                related = queryset.model._meta.get_field(relation).related_model
+                found = related._default_manager.filter(
+                    reduce(or_, (Q(**{f"{field}__icontains": word}) for field in fields))
+                )
+                matches.append(Q(**{f"{relation}__in": found.values("pk")}))
+            queryset = queryset.filter(reduce(or_, matches))
+        return queryset, False
 
 
 @admin.register(Room)
 class RoomAdmin(admin.ModelAdmin):
     list_display = [
         "id",
+        "code",
         "name",
         "price_per_slot",
         "capacity",
         "slot_duration_minutes",
         "opening_time",
         "closing_time",
+        "timezone",
+        "booking_mode",
+        "hold_minutes",
         "is_available",
         "created_at",
     ]
-    list_filter = ["is_available", "created_at"]
-    search_fields = ["name", "description"]
+    list_filter = ["is_available", "booking_mode", "timezone", "created_at"]
+    search_fields = ["code", "name", "description"]
     list_editable = ["is_available"]
 
+    # Fields that decide which seat counters a room's bookings occupy
+    SEAT_GRID_FIELDS = {"booking_mode", "opening_time", "slot_duration_minutes"}
+
+    def get_search_results(self, request, queryset, search_term):
+        # Words go through the search vector index instead of ILIKE '%term%' scans
+        term = search_term.strip()
+        if not term:
+            return super().get_search_results(request, queryset, search_term)
+        query = SearchQuery(term, search_type="websearch", config=ROOM_SEARCH_CONFIG)
+        # A half-typed word is a prefix, which whole-word lexemes never match.
+        # name__istartswith uses the UPPER(name) trigram index and
+        # code__startswith the pattern index Django adds for the unique code.
+        condition = (
+            Q(search_vector=query) | Q(name__istartswith=term) | Q(code__startswith=term)
+        )
+        words = re.findall(r"\w+", term)
+        if words:
+            prefixes = " & ".join(f"{word}:*" for word in words)
+            condition |= Q(
+                search_vector=SearchQuery(prefixes, search_type="raw", config=ROOM_SEARCH_CONFIG)
+            )
+        return queryset.filter(condition), False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and self.SEAT_GRID_FIELDS & set(form.changed_data):
+            rebuild_seat_counters(obj.id)
+        if change and "name" in form.changed_data:
+            refresh_room_booking_details([obj.id])
+
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(RelatedSearchMixin, admin.ModelAdmin):
     list_display = [
         "id",
         "user",
@@ -36,9 +132,90 @@ class BookingAdmin(admin.ModelAdmin):
         "hold_expires_at",
         "created_at",
     ]
-    list_filter = ["status", "payment_status", "booking_date", "created_at"]
+    list_filter = ["status", "payment_status", "created_at"]
+    list_select_related = ["user", "room"]
+    date_hierarchy = "booking_date"
     search_fields = ["user__username", "user__email", "room__name"]
-    readonly_fields = ["created_at", "updated_at", "hold_expires_at"]
+    readonly_fields = ["created_at", "updated_at", "hold_expires_at", "starts_at", "ends_at"]
+    raw_id_fields = ["user", "room", "group"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ["mark_completed", "mark_cancelled", "mark_refunded"]
+
+    # Fields that decide the seats a booking in a shared room takes
+    SEAT_FIELDS = {"room", "booking_date", "start_time", "end_time", "guest_count", "status"}
+
+    # Set when a booking is added here. Afterwards only the status actions
+    # and the booking API change them, so every change reaches the event log
+    LOCKED_FIELDS = [
+        "room",
+        "group",
+        "booking_date",
+        "start_time",
+        "end_time",
+        "number_of_slots",
+        "total_amount",
+        "status",
+        "payment_status",
+    ]
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is None:
+            return self.readonly_fields
+        return [*self.readonly_fields, *self.LOCKED_FIELDS]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            record_status_changes([status_change_for(obj, None)])
+        if self.SEAT_FIELDS & set(form.changed_data):
+            rebuild_seat_counters(obj.room_id)
+        refresh_booking_details([obj.id])
+
+    def _bulk_transition(self, request, queryset, target_status):
+        changed = bulk_transition_bookings(
+            queryset.values_list("id", flat=True), target_status
+        )
+        self.message_user(
+            request,
+            f"{len(changed)} booking(s) marked as {target_status}.",
+            messages.SUCCESS if changed else messages.WARNING,
+        )
+
+    @admin.action(description="Mark selected bookings as completed")
+    def mark_completed(self, request, queryset):
+        self._bulk_transition(request, queryset, "completed")
+
+    @admin.action(description="Mark selected bookings as cancelled")
+    def mark_cancelled(self, request, queryset):
+        self._bulk_transition(request, queryset, "cancelled")
+
+    @admin.action(description="Mark selected bookings as refunded")
+    def mark_refunded(self, request, queryset):
+        self._bulk_transition(request, queryset, "refunded")
+
+
+class GroupBookingInline(admin.TabularInline):
+    model = Booking
+    fields = ["room", "booking_date", "start_time", "end_time", "status", "payment_status", "total_amount"]
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    show_change_link = True
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BookingGroup)
+class BookingGroupAdmin(RelatedSearchMixin, admin.ModelAdmin):
+    list_display = ["id", "user", "total_amount", "created_at"]
+    list_select_related = ["user"]
+    search_fields = ["user__username", "user__email"]
+    related_search_fields = {"user": ["username", "email"]}
+    readonly_fields = ["total_amount", "created_at", "updated_at"]
+    raw_id_fields = ["user"]
+    inlines = [GroupBookingInline]
 
 
 @admin.register(Payment)
@@ -53,5 +230,149 @@ class PaymentAdmin(admin.ModelAdmin):
         "created_at",
     ]
     list_filter = ["status", "currency", "created_at"]
+    list_select_related = ["booking__user", "booking__room"]
     search_fields = ["stripe_payment_intent_id", "booking__id"]
+    search_help_text = "Exact Stripe PaymentIntent id or booking id"
+    readonly_fields = ["created_at", "updated_at"]
+    raw_id_fields = ["booking"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # A payment moved to another booking leaves the old one without it
+        refresh_booking_details({form.initial.get("booking"), obj.booking_id} - {None})
+
+    def get_search_results(self, request, queryset, search_term):
+        # Exact lookups keep the search on the unique intent id and booking FK
+        # indexes instead of casting every booking id to text
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        lookup = Q(stripe_payment_intent_id=search_term)
+        if search_term.isdigit():
+            lookup |= Q(booking_id=int(search_term))
+        return queryset.filter(lookup), False
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(RelatedSearchMixin, admin.ModelAdmin):
+    list_display = [
+        "id",
+        "user",
+        "room",
+        "booking_date",
+        "start_time",
+        "end_time",
+        "guest_count",
+        "status",
+        "booking",
+        "created_at",
+    ]
+    list_filter = ["status", "booking_date"]
+    list_select_related = ["user", "room"]
+    search_fields = ["user__email", "room__name"]
+    related_search_fields = {"user": ["email"], "room": ["name"]}
+    readonly_fields = ["created_at", "updated_at"]
+    raw_id_fields = ["user", "room", "booking"]
+
+
+@admin.register(PaymentIntentOutbox)
+class PaymentIntentOutboxAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "booking",
+        "amount",
+        "currency",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "stripe_payment_intent_id",
+        "created_at",
+    ]
+    list_filter = ["status", "created_at"]
+    list_select_related = ["booking__user", "booking__room"]
     readonly_fields = ["created_at", "updated_at"]
+    raw_id_fields = ["booking"]
+
+
+class ReadOnlyAdminMixin:
+    """Archive rows are only written by the archive job"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(ReadOnlyAdminMixin, RelatedSearchMixin, admin.ModelAdmin):
+    list_display = [
+        "id",
+        "user",
+        "room",
+        "booking_date",
+        "start_time",
+        "end_time",
+        "status",
+        "payment_status",
+        "total_amount",
+        "archived_at",
+    ]
+    list_filter = ["status", "payment_status"]
+    list_select_related = ["user", "room"]
+    date_hierarchy = "booking_date"
+    search_fields = ["user__username", "user__email", "room__name"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(ArchivedPayment)
+class ArchivedPaymentAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    list_display = [
+        "id",
+        "booking",
+        "stripe_payment_intent_id",
+        "amount",
+        "currency",
+        "status",
+        "created_at",
+    ]
+    list_filter = ["status", "currency"]
+    search_fields = ["=stripe_payment_intent_id"]
+    raw_id_fields = ["booking"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(BookingEvent)
+class BookingEventAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    list_display = [
+        "id",
+        "booking_id",
+        "room_id",
+        "booking_date",
+        "old_status",
+        "new_status",
+        "old_payment_status",
+        "new_payment_status",
+        "created_at",
+    ]
+    list_filter = ["new_status", "new_payment_status"]
+    search_fields = ["=booking_id"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StripeWebhookEvent)
+class StripeWebhookEventAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
+    list_display = ["id", "event_id", "event_type", "received_at", "processed_at"]
+    list_filter = ["event_type", ("processed_at", admin.EmptyFieldListFilter)]
+    search_fields = ["=event_id"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
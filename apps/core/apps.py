@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.core'
+
+    def ready(self):
+        from django.contrib.auth.models import User
+
+        from .booking_details import refresh_user_booking_details
+
+        post_save.connect(
+            refresh_user_booking_details,
+            sender=User,
+            dispatch_uid="core.refresh_user_booking_details",
+        )
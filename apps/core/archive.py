@@ -0,0 +1,99 @@
+"""
+Archival of finished bookings into cold tables
+
+Completed, cancelled and expired bookings whose date is well in the past are
+copied with their payments into ArchivedBooking / ArchivedPayment and removed
+from the hot tables, keeping overlap checks, staff listings and admin search
+working on a table sized by upcoming traffic rather than history.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ArchivedBooking, ArchivedPayment, Booking, BookingDetail, Payment
+
+
+# Statuses a booking never leaves again
+ARCHIVABLE_STATUSES = ("completed", "cancelled", "expired")
+
+# Cancelled or expired bookings still waiting on a refund, and bookings with
+# a payment request in flight, stay in the hot table until they settle
+NOT_SETTLED = Q(status__in=["cancelled", "expired"], payment_status="succeeded") | Q(
+    payment_status="processing"
+)
+
+
+def _copy(instance, model):
+    return model(
+        **{
+            field.attname: getattr(instance, field.attname)
+            for field in type(instance)._meta.concrete_fields
+        }
+    )
+
+
+def archive_batch(booking_ids):
+    """
+    Move the given finished bookings and their payments to the archive.
+
+    Rows are re-checked under lock, so bookings that changed since they were
+    selected are left alone. Returns the ids archived.
+    """
+    with transaction.atomic():
+        bookings = list(
+            Booking.objects.select_for_update(skip_locked=True)
+            .filter(id__in=booking_ids, status__in=ARCHIVABLE_STATUSES)
+            .exclude(NOT_SETTLED)
+            .order_by("id")
+        )
+        if not bookings:
+            return []
+
+        ids = [booking.id for booking in bookings]
+        payments = list(Payment.objects.filter(booking_id__in=ids))
+
+        ArchivedBooking.objects.bulk_create(
+            [_copy(booking, ArchivedBooking) for booking in bookings]
+        )
+        ArchivedPayment.objects.bulk_create(
+            [_copy(payment, ArchivedPayment) for payment in payments]
+        )
+        # Detail rows move to the archived booking so the delete keeps them
+        BookingDetail.objects.filter(id__in=ids).update(booking=None, archived_booking_id=F("id"))
+
+        # Cascades to payments and outbox entries; waitlist entries keep
+        # their history with the booking link cleared
+        Booking.objects.filter(id__in=ids).delete()
+
+    return ids
+
+
+def archive_bookings(older_than_days, batch_size=1000, now=None):
+    """
+    Archive finished bookings dated more than ``older_than_days`` days ago.
+
+    Works in id-ordered batches so each transaction stays short. Archiving is
+    not a status change, so room rollups are left as they are. Returns the
+    number of bookings archived.
+    """
+    cutoff = timezone.localdate(now or timezone.now()) - timedelta(days=older_than_days)
+
+    archived = 0
+    last_id = 0
+    while True:
+        ids = list(
+            Booking.objects.filter(
+                status__in=ARCHIVABLE_STATUSES, booking_date__lt=cutoff, id__gt=last_id
+            )
+            .exclude(NOT_SETTLED)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        archived += len(archive_batch(ids))
+        last_id = ids[-1]
+
+    return archived
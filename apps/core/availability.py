@@ -0,0 +1,226 @@
+"""
+Multi-day room calendars built from one query
+"""
+import hashlib
+from datetime import time, timedelta
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import Count, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import JSONObject
+
+from .clock import local_minutes
+from .models import Booking, BookingEvent, Room, SlotOccupancy
+from .rollups import slots_per_day
+from .services import ACTIVE_STATUSES
+
+
+def _clock(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _merge(intervals):
+    """Merge overlapping or touching (start, end) minute intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _run_length(values):
+    """Run-length encode a sequence as [value, length] pairs"""
+    runs = []
+    for value in values:
+        if runs and runs[-1][0] == value:
+            runs[-1][1] += 1
+        else:
+            runs.append([value, 1])
+    return runs
+
+
+def _slot_runs(occupied, opening, duration, count):
+    """
+    Run-length encode a day's slot grid as [state, length] pairs.
+
+    A slot is occupied if any booked interval overlaps it, so bookings that
+    do not line up with the grid still block every slot they touch.
+    """
+
+    def states():
+        index = 0
+        for slot in range(count):
+            start = opening + slot * duration
+            end = start + duration
+            while index < len(occupied) and occupied[index][1] <= start:
+                index += 1
+            yield (
+                "occupied"
+                if index < len(occupied) and occupied[index][0] < end
+                else "free"
+            )
+
+    return _run_length(states())
+
+
+def _shared_day(taken, capacity, opening, duration, count):
+    """
+    Slots of a shared room's day from its seat counters.
+
+    A slot is only occupied once all seats are taken; ``seats_left`` holds
+    the free seats per slot, run-length encoded.
+    """
+    left = [capacity - taken.get(opening + slot * duration, 0) for slot in range(count)]
+    full = _merge(
+        (opening + slot * duration, opening + (slot + 1) * duration)
+        for slot, seats in enumerate(left)
+        if seats <= 0
+    )
+    states = _run_length("occupied" if seats <= 0 else "free" for seats in left)
+    return full, states, _run_length(left)
+
+
+def room_calendar(room_id, date_from, date_to):
+    """
+    Occupied intervals and run-length encoded slots per day for a room.
+
+    The room and all of its active bookings, or for a shared room its seat
+    counters, in the range come back from a single query. Shared rooms also
+    get their free seats per slot. Returns None if the room does not exist or is unavailable.
+    """
+    bookings = (
+        Booking.objects.filter(
+            room_id=OuterRef("id"),
+            booking_date__range=(date_from, date_to),
+            status__in=ACTIVE_STATUSES,
+        )
+        .order_by()
+        .values(
+            json=JSONObject(
+                booking_date="booking_date", start_time="start_time", end_time="end_time"
+            )
+        )
+    )
+    # Shared rooms are read from their seat counters instead
+    seats = (
+        SlotOccupancy.objects.filter(
+            room_id=OuterRef("id"),
+            booking_date__range=(date_from, date_to),
+            seats_taken__gt=0,
+        )
+        .order_by()
+        .values(
+            json=JSONObject(
+                booking_date="booking_date", start_time="start_time", seats_taken="seats_taken"
+            )
+        )
+    )
+    room = (
+        Room.objects.filter(id=room_id, is_available=True)
+        .only(
+            "id",
+            "capacity",
+            "booking_mode",
+            "opening_time",
+            "closing_time",
+            "slot_duration_minutes",
+            "timezone",
+        )
+        .annotate(occupied=ArraySubquery(bookings), seats=ArraySubquery(seats))
+        .first()
+    )
+    if room is None:
+        return None
+
+    by_day = {}
+    for booking in room.occupied:
+        by_day.setdefault(booking["booking_date"], []).append(
+            (
+                local_minutes(time.fromisoformat(booking["start_time"])),
+                local_minutes(time.fromisoformat(booking["end_time"])),
+            )
+        )
+
+    taken_by_day = {}
+    for slot in room.seats:
+        taken_by_day.setdefault(slot["booking_date"], {})[
+            local_minutes(time.fromisoformat(slot["start_time"]))
+        ] = slot["seats_taken"]
+
+    opening = local_minutes(room.opening_time)
+    duration = room.slot_duration_minutes
+    count = slots_per_day(room)
+
+    days = []
+    day = date_from
+    while day <= date_to:
+        seats_left = None
+        if room.is_shared:
+            occupied, runs, seats_left = _shared_day(
+                taken_by_day.get(day.isoformat(), {}), room.capacity, opening, duration, count
+            )
+        else:
+            occupied = _merge(by_day.get(day.isoformat(), []))
+            runs = _slot_runs(occupied, opening, duration, count)
+        day_data = {
+            "date": day,
+            "occupied": [[_clock(start), _clock(end)] for start, end in occupied],
+            "slots": runs,
+            "free_slots": sum(length for state, length in runs if state == "free"),
+        }
+        if seats_left is not None:
+            day_data["seats_left"] = seats_left
+        days.append(day_data)
+        day += timedelta(days=1)
+
+    return {
+        "room_id": room.id,
+        "from": date_from,
+        "to": date_to,
+        "timezone": room.timezone,
+        "booking_mode": room.booking_mode,
+        "capacity": room.capacity,
+        "opening_time": room.opening_time,
+        "closing_time": room.closing_time,
+        "slot_duration_minutes": duration,
+        "days": days,
+    }
+
+
+def calendar_etag(room_id, date_from, date_to):
+    """
+    Validator for a room calendar, changing whenever a booking in the range
+    changes status or the room's hours change.
+
+    Counts events rather than only taking the newest id, because a booking
+    transaction can commit a lower event id after a higher one is visible.
+    """
+    events = (
+        BookingEvent.objects.filter(
+            room_id=OuterRef("id"), booking_date__range=(date_from, date_to)
+        )
+        .order_by()
+        .values("room_id")
+    )
+    row = (
+        Room.objects.filter(id=room_id)
+        .annotate(
+            event_count=Subquery(
+                events.annotate(count=Count("id")).values("count"),
+                output_field=IntegerField(),
+            ),
+            last_event_id=Subquery(
+                events.annotate(last=Max("id")).values("last"),
+                output_field=IntegerField(),
+            ),
+        )
+        .values_list("updated_at", "event_count", "last_event_id")
+        .first()
+    )
+    if row is None:
+        return None
+
+    updated_at, event_count, last_event_id = row
+    key = f"{room_id}:{date_from}:{date_to}:{updated_at.isoformat()}:{event_count or 0}:{last_event_id or 0}"
+    return hashlib.sha1(key.encode()).hexdigest()
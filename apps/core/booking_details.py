@@ -0,0 +1,151 @@
+"""
+Booking detail read model
+
+BookingDetail holds each booking as the API returns it, with the user and
+room names and the payment folded in. Writers refresh the rows of the
+bookings they changed in the same transaction, so readers fetch a booking,
+or many, by primary key without joining four tables. New bookings have
+their rows written from the objects that created them, without a query,
+and a user's rows are refreshed when their username or email is saved.
+Rows for bookings written before the read model existed are filled in by
+migration 0021.
+"""
+from django.core.exceptions import ObjectDoesNotExist
+
+from .models import ArchivedBooking, Booking, BookingDetail
+
+
+# Bookings refreshed per query when a whole room's bookings are refreshed
+REFRESH_CHUNK_SIZE = 1000
+
+# User fields copied into the booking details
+USER_DETAIL_FIELDS = {"username", "email"}
+
+
+def detail_data(booking):
+    """Booking fields, user and room names and payment of a Booking or ArchivedBooking"""
+    try:
+        payment = booking.payment
+    except ObjectDoesNotExist:
+        payment = None
+    return _detail_data(booking, payment)
+
+
+def _detail_data(booking, payment):
+    data = {
+        field.attname: getattr(booking, field.attname)
+        for field in type(booking)._meta.concrete_fields
+    }
+    data.update(
+        user_name=booking.user.username,
+        user_email=booking.user.email,
+        room_name=booking.room.name,
+    )
+    data["payment"] = payment and {
+        "payment_intent_id": payment.stripe_payment_intent_id,
+        "amount": payment.amount,
+        "currency": payment.currency,
+        "status": payment.status,
+        "payment_method": payment.payment_method,
+    }
+    return data
+
+
+def write_new_booking_details(bookings):
+    """
+    Write the detail rows of just created bookings from the objects themselves.
+
+    The bookings must have their user and room loaded; a new booking has no
+    payment yet. Call inside the transaction that created them.
+    """
+    BookingDetail.objects.bulk_create(
+        [
+            BookingDetail(
+                id=booking.id,
+                booking_id=booking.id,
+                user_id=booking.user_id,
+                data=_detail_data(booking, None),
+            )
+            for booking in bookings
+        ]
+    )
+
+
+def refresh_booking_details(booking_ids):
+    """
+    Rewrite the detail rows of the given bookings from the booking tables.
+
+    Call inside the transaction that changed the bookings. Rows of bookings
+    that no longer exist anywhere are removed.
+    """
+    booking_ids = set(booking_ids)
+    if not booking_ids:
+        return
+
+    details = []
+    for model in (Booking, ArchivedBooking):
+        missing = booking_ids - {detail.id for detail in details}
+        if not missing:
+            break
+        for booking in model.objects.filter(id__in=missing).select_related(
+            "user", "room", "payment"
+        ):
+            archived = model is ArchivedBooking
+            details.append(
+                BookingDetail(
+                    id=booking.id,
+                    booking_id=None if archived else booking.id,
+                    archived_booking_id=booking.id if archived else None,
+                    user_id=booking.user_id,
+                    data=detail_data(booking),
+                )
+            )
+
+    BookingDetail.objects.bulk_create(
+        details,
+        update_conflicts=True,
+        unique_fields=["id"],
+        update_fields=["booking", "archived_booking", "user", "data", "updated_at"],
+    )
+    gone = booking_ids - {detail.id for detail in details}
+    if gone:
+        BookingDetail.objects.filter(id__in=gone).delete()
+
+
+def refresh_room_booking_details(room_ids):
+    """Refresh the detail rows of every booking in the given rooms, e.g. after a rename"""
+    for model in (Booking, ArchivedBooking):
+        booking_ids = list(model.objects.filter(room_id__in=room_ids).values_list("id", flat=True))
+        for start in range(0, len(booking_ids), REFRESH_CHUNK_SIZE):
+            refresh_booking_details(booking_ids[start : start + REFRESH_CHUNK_SIZE])
+
+
+def refresh_user_booking_details(sender, instance, created, update_fields=None, **kwargs):
+    """
+    post_save receiver for User: refresh the user's detail rows that carry an
+    old username or email.
+
+    Saves that only touch other fields, such as last_login on login, are skipped.
+    """
+    if created or (update_fields is not None and not USER_DETAIL_FIELDS & set(update_fields)):
+        return
+
+    stale = list(
+        BookingDetail.objects.filter(user_id=instance.id)
+        .exclude(data__user_name=instance.username, data__user_email=instance.email)
+        .values_list("id", flat=True)
+    )
+    for start in range(0, len(stale), REFRESH_CHUNK_SIZE):
+        refresh_booking_details(stale[start : start + REFRESH_CHUNK_SIZE])
+
+
+def get_booking_details(booking_ids, user=None):
+    """
+    Return {booking id: response dict} for the bookings that exist.
+
+    With ``user``, only that user's bookings are returned. One query either way.
+    """
+    details = BookingDetail.objects.filter(id__in=set(booking_ids))
+    if user is not None:
+        details = details.filter(user=user)
+    return {detail.id: {**detail.data, "archived": detail.archived} for detail in details}
@@ -0,0 +1,111 @@
+"""
+Per-room wall clock: local slot grid and UTC instants for bookings
+
+Rooms keep their opening hours and bookings keep their wall-clock times in
+the room's own timezone. RoomClock turns those into integer minutes since
+local midnight for grid checks, and into UTC instants whose difference is
+the real elapsed time, so pricing and overlap stay correct on DST days.
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.core.exceptions import ValidationError
+
+
+def validate_timezone(value):
+    try:
+        ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(f"{value} is not a valid IANA timezone")
+
+
+def local_minutes(value):
+    """Minutes since local midnight for a time of day"""
+    return value.hour * 60 + value.minute
+
+
+class RoomClock:
+    """
+    A room's timezone and slot grid, computed once per room instance.
+
+    Opening and closing times are held as minutes since local midnight, so
+    checking a booking against the room's hours is integer comparison.
+    """
+
+    def __init__(self, tz_name, opening_time, closing_time, slot_duration_minutes, price_per_slot):
+        self.tz = ZoneInfo(tz_name)
+        self.opening_minute = local_minutes(opening_time)
+        self.closing_minute = local_minutes(closing_time)
+        self.slot_minutes = slot_duration_minutes
+        self.price_per_slot = price_per_slot
+
+    @classmethod
+    def for_room(cls, room):
+        return cls(
+            room.timezone,
+            room.opening_time,
+            room.closing_time,
+            room.slot_duration_minutes,
+            room.price_per_slot,
+        )
+
+    def within_hours(self, start_time, end_time):
+        return (
+            self.opening_minute <= local_minutes(start_time)
+            and local_minutes(end_time) <= self.closing_minute
+        )
+
+    def on_grid(self, start_time, end_time):
+        """True when both times fall on a slot boundary of the room's grid"""
+        return all(
+            (local_minutes(value) - self.opening_minute) % self.slot_minutes == 0
+            for value in (start_time, end_time)
+        )
+
+    def slot_starts(self, start_time, end_time):
+        """Local start times of the grid slots a booking touches"""
+        start = local_minutes(start_time)
+        end = local_minutes(end_time)
+        minute = start - (start - self.opening_minute) % self.slot_minutes
+        starts = []
+        while minute < end:
+            starts.append(time(minute // 60, minute % 60))
+            minute += self.slot_minutes
+        return starts
+
+    def today(self, now=None):
+        """The current date in the room's timezone"""
+        return (now or datetime.now(dt_timezone.utc)).astimezone(self.tz).date()
+
+    def instant(self, booking_date, value):
+        """
+        UTC instant of a local wall-clock time on ``booking_date``.
+
+        Times skipped by a DST jump raise ValueError. Times repeated when
+        clocks fall back resolve to their first occurrence.
+        """
+        local = datetime.combine(booking_date, value)
+        instant = local.replace(tzinfo=self.tz).astimezone(dt_timezone.utc)
+        if instant.astimezone(self.tz).replace(tzinfo=None) != local:
+            raise ValueError(
+                f"{value.strftime('%H:%M')} does not exist on {booking_date} in {self.tz.key}"
+            )
+        return instant
+
+    def span(self, booking_date, start_time, end_time):
+        """UTC (starts_at, ends_at) for a booking's local date and times"""
+        return (
+            self.instant(booking_date, start_time),
+            self.instant(booking_date, end_time),
+        )
+
+    def slots_and_amount(self, starts_at, ends_at):
+        """
+        Slots and price for the real time between two instants.
+
+        On a DST day a 01:00-03:00 booking covers one or three real hours, and
+        is charged for exactly that.
+        """
+        elapsed_minutes = (ends_at - starts_at) // timedelta(minutes=1)
+        number_of_slots = max(elapsed_minutes, 0) // self.slot_minutes
+        return number_of_slots, self.price_per_slot * number_of_slots
@@ -0,0 +1,195 @@
+"""
+Booking event log and the projections derived from it
+
+Every booking status or payment status change appends a BookingEvent in the
+transaction that made it. Projections (read models such as the room daily
+rollups) consume the log incrementally from their ProjectionCheckpoint, and
+can be rebuilt by replaying the whole log without scanning live tables.
+
+Event ids come from a sequence, so a transaction that started earlier can
+commit a lower id after a higher one is already visible. Projections
+therefore read the log in (transaction_id, id) order and only up to the
+oldest transaction still running, which is past every event that may still
+appear.
+"""
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import BookingEvent, ProjectionCheckpoint
+
+
+# One booking moving from ``old_status`` (None for a new booking) to
+# ``new_status``; the payment status pair is None when it is not tracked
+StatusChange = namedtuple(
+    "StatusChange",
+    [
+        "booking_id",
+        "room_id",
+        "booking_date",
+        "start_time",
+        "end_time",
+        "number_of_slots",
+        "total_amount",
+        "old_status",
+        "new_status",
+        "old_payment_status",
+        "new_payment_status",
+    ],
+    defaults=[None, None],
+)
+
+# Projection name -> class consuming the event log
+PROJECTIONS = {
+    "room_daily_stats": "apps.core.rollups.RoomDailyStatsProjection",
+}
+
+# Events read per query when replaying the log
+REPLAY_CHUNK_SIZE = 2000
+
+
+def append_events(changes):
+    """Append one event per change; call inside the transaction that made them"""
+    BookingEvent.objects.bulk_create(
+        [BookingEvent(**change._asdict()) for change in changes]
+    )
+
+
+class Projection:
+    """
+    A read model maintained from the booking event log.
+
+    ``apply`` folds a batch of new events into the read model. ``rebuild``
+    replaces the read model with one built from every event; the default
+    clears it with ``reset`` and applies the events in chunks.
+    """
+
+    name = None
+
+    def apply(self, events):
+        raise NotImplementedError
+
+    def reset(self):
+        raise NotImplementedError
+
+    def rebuild(self, events):
+        self.reset()
+        chunk = []
+        for event in events:
+            chunk.append(event)
+            if len(chunk) == REPLAY_CHUNK_SIZE:
+                self.apply(chunk)
+                chunk = []
+        if chunk:
+            self.apply(chunk)
+
+
+def get_projection(name):
+    return import_string(PROJECTIONS[name])()
+
+
+def _visible_horizon():
+    """Oldest transaction still running; every event below it is final"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        return cursor.fetchone()[0]
+
+
+def _events_after(last_transaction_id, last_event_id, horizon):
+    return (
+        BookingEvent.objects.filter(transaction_id__lt=horizon)
+        .filter(
+            Q(transaction_id__gt=last_transaction_id)
+            | Q(transaction_id=last_transaction_id, id__gt=last_event_id)
+        )
+        .order_by("transaction_id", "id")
+    )
+
+
+def tail_position():
+    """
+    Log position for a consumer that starts from the current state.
+
+    Every event before it is already visible in the booking tables, so a
+    consumer takes this position, then reads the tables, then follows the
+    log with tail_events without missing or needing anything older.
+    """
+    return (_visible_horizon(), 0)
+
+
+def tail_events(position, limit=REPLAY_CHUNK_SIZE):
+    """
+    Next events after an in-memory ``position``, for consumers that keep no
+    checkpoint. Returns (events, position to continue from).
+    """
+    events = list(_events_after(*position, _visible_horizon())[:limit])
+    if events:
+        position = (events[-1].transaction_id, events[-1].id)
+    return events, position
+
+
+def _lock_checkpoint(name):
+    ProjectionCheckpoint.objects.get_or_create(name=name)
+    return ProjectionCheckpoint.objects.select_for_update().get(name=name)
+
+
+def _advance(checkpoint, event):
+    checkpoint.last_transaction_id = event.transaction_id
+    checkpoint.last_event_id = event.id
+    checkpoint.save()
+
+
+def run_projection(name, batch_size=500):
+    """
+    Apply the next batch of events to a projection.
+
+    The read model and its checkpoint are updated in one transaction, so each
+    event is applied exactly once. Returns the number of events applied.
+    """
+    projection = get_projection(name)
+    with transaction.atomic():
+        checkpoint = _lock_checkpoint(name)
+        events = list(
+            _events_after(
+                checkpoint.last_transaction_id, checkpoint.last_event_id, _visible_horizon()
+            )[:batch_size]
+        )
+        if events:
+            projection.apply(events)
+            _advance(checkpoint, events[-1])
+    return len(events)
+
+
+def rebuild_projection(name):
+    """
+    Rebuild a projection by replaying the whole event log.
+
+    Runs in one transaction holding the checkpoint lock, so incremental
+    runners wait and then continue from the end of the replay. Returns the
+    number of events replayed.
+    """
+    projection = get_projection(name)
+    with transaction.atomic():
+        checkpoint = _lock_checkpoint(name)
+        checkpoint.last_transaction_id = checkpoint.last_event_id = 0
+
+        replayed = 0
+        last_event = None
+
+        def events():
+            nonlocal replayed, last_event
+            for event in _events_after(0, 0, _visible_horizon()).iterator(
+                chunk_size=REPLAY_CHUNK_SIZE
+            ):
+                replayed += 1
+                last_event = event
+                yield event
+
+        projection.rebuild(events())
+        if last_event:
+            _advance(checkpoint, last_event)
+        else:
+            checkpoint.save()
+    return replayed
@@ -0,0 +1,233 @@
+"""
+Group bookings: several rooms held, paid and confirmed all or nothing
+
+A group is created in one transaction. The rooms are locked in id order, so
+two groups sharing rooms cannot deadlock. The active bookings that conflict
+with any member are found with a single query. Any failure rolls the whole
+group back, including seats taken in shared rooms. The members share one
+hold and one PaymentIntent for the group total. That intent's Payment
+belongs to the lead member, and payment events, payment failures, hold
+heartbeats and hold expiry apply to every member together.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+
+from . import tracing
+from .booking_details import write_new_booking_details
+from .holds import hold_deadline
+from .models import Booking, BookingGroup, Room
+from .outbox import create_leased_entry, enqueue_payment_intent
+from .services import (
+    ACTIVE_STATUSES,
+    quote_price,
+    record_status_changes,
+    reserve_seats,
+    status_change_for,
+)
+
+
+class GroupBookingRejected(Exception):
+    """Raised to roll back a group booking; carries the HTTP status and response body"""
+
+    def __init__(self, status_code, error, **detail):
+        super().__init__(error)
+        self.status_code = status_code
+        self.data = {"error": error, **detail}
+
+
+def _check_member(index, item, room):
+    """UTC (starts_at, ends_at) of one requested member after the per-room checks"""
+    if not room.clock.within_hours(item.start_time, item.end_time):
+        raise GroupBookingRejected(
+            400,
+            f"Booking time must be between {room.opening_time.strftime('%H:%M')} and {room.closing_time.strftime('%H:%M')}",
+            index=index,
+        )
+    if item.booking_date < room.clock.today():
+        raise GroupBookingRejected(400, "Booking date cannot be in the past", index=index)
+    if item.guest_count > room.capacity:
+        raise GroupBookingRejected(
+            400, f"Guest count exceeds room capacity of {room.capacity}", index=index
+        )
+    try:
+        return room.clock.span(item.booking_date, item.start_time, item.end_time)
+    except ValueError as e:
+        # Local time skipped by a DST change in the room's timezone
+        raise GroupBookingRejected(400, str(e), index=index)
+
+
+def _find_conflicts(members):
+    """
+    Active bookings conflicting with requested members in exclusive rooms, in one query.
+
+    ``members`` are (index, room, date, starts_at, ends_at) tuples. Returns
+    (index, conflicting booking) pairs.
+    """
+    if not members:
+        return []
+
+    overlapping = reduce(
+        or_,
+        (
+            Q(room_id=room.id, booking_date=booking_date, starts_at__lt=ends_at, ends_at__gt=starts_at)
+            for _, room, booking_date, starts_at, ends_at in members
+        ),
+    )
+    bookings = list(
+        Booking.objects.filter(overlapping, status__in=ACTIVE_STATUSES)
+        .order_by("starts_at")
+        .only("room_id", "booking_date", "start_time", "end_time", "starts_at", "ends_at")
+    )
+    return [
+        (index, booking)
+        for index, room, booking_date, starts_at, ends_at in members
+        for booking in bookings
+        if booking.room_id == room.id
+        and booking.booking_date == booking_date
+        and booking.starts_at < ends_at
+        and booking.ends_at > starts_at
+    ]
+
+
+def create_group_booking(user, items, pay=False, currency="usd"):
+    """
+    Hold a booking for every item, or for none of them.
+
+    ``items`` carry room_id, booking_date, start_time, end_time, guest_count
+    and special_requests. Returns (group, bookings in item order, outbox
+    entry or None). The outbox entry exists with ``pay`` and is leased to the
+    caller for delivery after commit. Raises GroupBookingRejected with
+    nothing written.
+    """
+    room_ids = sorted({item.room_id for item in items})
+
+    with transaction.atomic():
+        # Locked in id order, as everywhere rooms are locked together
+        with tracing.span("group.room_locks", rooms=len(room_ids)):
+            rooms = {
+                room.id: room
+                for room in Room.objects.select_for_update()
+                .filter(id__in=room_ids, is_available=True)
+                .order_by("id")
+            }
+        missing = [room_id for room_id in room_ids if room_id not in rooms]
+        if missing:
+            raise GroupBookingRejected(404, "Room not found or not available", room_ids=missing)
+
+        spans = [_check_member(index, item, rooms[item.room_id]) for index, item in enumerate(items)]
+
+        exclusive = [
+            (index, rooms[item.room_id], item.booking_date, *spans[index])
+            for index, item in enumerate(items)
+            if not rooms[item.room_id].is_shared
+        ]
+        # Members may not overlap each other in an exclusive room either
+        for position, (index, room, booking_date, starts_at, ends_at) in enumerate(exclusive):
+            for other, other_room, _, other_starts_at, other_ends_at in exclusive[:position]:
+                if (
+                    room.id == other_room.id
+                    and starts_at < other_ends_at
+                    and ends_at > other_starts_at
+                ):
+                    raise GroupBookingRejected(
+                        400, "Group bookings overlap in the same room", indexes=[other, index]
+                    )
+
+        with tracing.span("group.conflict_check"):
+            conflicts = _find_conflicts(exclusive)
+        if conflicts:
+            raise GroupBookingRejected(
+                409,
+                "Time slot conflicts with existing booking",
+                conflicts=[
+                    {
+                        "index": index,
+                        "room_id": booking.room_id,
+                        "start_time": booking.start_time.strftime("%H:%M"),
+                        "end_time": booking.end_time.strftime("%H:%M"),
+                    }
+                    for index, booking in conflicts
+                ],
+            )
+
+        bookings = []
+        for index, item in enumerate(items):
+            room = rooms[item.room_id]
+            # Priced like a single booking, before its own seats are taken
+            quote = quote_price(room, item.booking_date, item.start_time, item.end_time)
+            if quote.number_of_slots < 1:
+                raise GroupBookingRejected(
+                    400, "Booking duration must be at least one slot", index=index
+                )
+            if room.is_shared:
+                reserved, left = reserve_seats(
+                    room, item.booking_date, item.start_time, item.end_time, item.guest_count
+                )
+                if not reserved:
+                    raise GroupBookingRejected(
+                        409, "Not enough seats left for this time", index=index, seats_left=left
+                    )
+
+            starts_at, ends_at = spans[index]
+            bookings.append(
+                Booking(
+                    user=user,
+                    room=room,
+                    booking_date=item.booking_date,
+                    start_time=item.start_time,
+                    end_time=item.end_time,
+                    guest_count=item.guest_count,
+                    total_amount=quote.total_amount,
+                    number_of_slots=quote.number_of_slots,
+                    special_requests=item.special_requests,
+                    status="pending",
+                    payment_status="processing" if pay else "pending",
+                    starts_at=starts_at,
+                    ends_at=ends_at,
+                )
+            )
+
+        # One hold for the group, as short as the shortest of its rooms'
+        hold_expires_at = min(hold_deadline(room) for room in rooms.values())
+        group = BookingGroup.objects.create(
+            user=user, total_amount=sum(booking.total_amount for booking in bookings)
+        )
+        for booking in bookings:
+            booking.group = group
+            booking.hold_expires_at = hold_expires_at
+        # Ids come back in insertion order, so the first booking is the lead
+        Booking.objects.bulk_create(bookings)
+        write_new_booking_details(bookings)
+        record_status_changes([status_change_for(booking, None) for booking in bookings])
+
+        entry = None
+        if pay:
+            entry = create_leased_entry(bookings[0], currency, amount=group.total_amount)
+
+    return group, bookings, entry
+
+
+def pay_group(group, currency="usd"):
+    """
+    Queue the group's PaymentIntent for its total on the lead booking.
+
+    Returns the outbox entry, or raises GroupBookingRejected when the group
+    is already paid or no longer held.
+    """
+    with transaction.atomic():
+        members = list(
+            Booking.objects.select_for_update().filter(group=group).order_by("id")
+        )
+        if not members:
+            raise GroupBookingRejected(404, "Booking group not found")
+        if any(member.payment_status == "succeeded" for member in members):
+            raise GroupBookingRejected(400, "Booking group already paid")
+        if any(member.status != "pending" for member in members):
+            raise GroupBookingRejected(400, "Booking group is no longer held")
+
+        return enqueue_payment_intent(
+            members[0], group.total_amount, currency, members=members
+        )
@@ -0,0 +1,251 @@
+"""
+Booking holds: per-room durations, heartbeat extension and timely expiry
+
+A pending booking holds its slot until ``hold_expires_at``, which starts at
+the room's ``hold_minutes`` and slides forward on every heartbeat from the
+checkout page. The hold expiry worker keeps every live hold in a timing
+wheel. It learns about new holds from the booking event log, and re-reads
+only the bookings whose timers fire, so it never scans the bookings table
+while running.
+
+A hold with a payment under way expires too, but only once its
+PaymentIntent is cancelled, so an expired booking can never be paid.
+"""
+import logging
+from datetime import timedelta
+
+import stripe
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import events
+from .booking_details import refresh_booking_details
+from .models import Booking, Payment, PaymentIntentOutbox
+from .payments import get_payment_gateway
+from .services import bulk_transition_bookings, group_filter
+from .timing_wheel import TimingWheel
+
+
+logger = logging.getLogger(__name__)
+
+
+# Longest heartbeats can keep a hold alive, counted from the booking's creation
+MAX_HOLD_MINUTES = 120
+
+# Payment statuses under which a pending booking's hold can run out
+EXPIRABLE_PAYMENT_STATUSES = ("pending", "processing", "failed")
+
+# Seconds before retrying a hold whose PaymentIntent could not be cancelled,
+# e.g. while the customer's payment is being processed
+CANCEL_RETRY_SECONDS = 30
+
+
+def hold_deadline(room, now=None):
+    """When a hold taken in ``room`` now runs out"""
+    return (now or timezone.now()) + timedelta(minutes=room.hold_minutes)
+
+
+def extend_hold(booking, now=None):
+    """
+    Slide a pending booking's hold to the room's hold duration from now,
+    capped at MAX_HOLD_MINUTES after the booking was made.
+
+    Only a hold that has not run out yet is extended, so a heartbeat racing
+    the expiry worker cannot revive it. A group's members share their hold,
+    so a heartbeat for any member extends all of them. Returns the new
+    deadline, or None if the hold is gone.
+    """
+    now = now or timezone.now()
+    deadline = max(
+        min(
+            hold_deadline(booking.room, now),
+            booking.created_at + timedelta(minutes=MAX_HOLD_MINUTES),
+        ),
+        # Never shorten a hold, e.g. in a room holding longer than the cap
+        booking.hold_expires_at or now,
+    )
+    with transaction.atomic():
+        if booking.group_id is None:
+            updated = Booking.objects.filter(
+                id=booking.id, status="pending", hold_expires_at__gt=now
+            ).update(hold_expires_at=deadline, updated_at=now)
+            extended = [booking.id] if updated else []
+        else:
+            # Locked in id order, like every other multi-booking update
+            extended = list(
+                Booking.objects.select_for_update()
+                .filter(group_filter(booking), status="pending", hold_expires_at__gt=now)
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+            Booking.objects.filter(id__in=extended).update(hold_expires_at=deadline, updated_at=now)
+        if extended:
+            refresh_booking_details(extended)
+    return deadline if booking.id in extended else None
+
+
+def _expirable_holds(booking_ids=None):
+    holds = Booking.objects.filter(
+        status="pending",
+        payment_status__in=EXPIRABLE_PAYMENT_STATUSES,
+        hold_expires_at__isnull=False,
+    )
+    if booking_ids is not None:
+        holds = holds.filter(id__in=booking_ids)
+    return holds.values_list("id", "hold_expires_at")
+
+
+def expire_bookings(booking_ids, now=None, gateway=None):
+    """
+    Expire the given holds that have run out, with the rest of their groups.
+
+    Unsent PaymentIntent requests are failed first, so the outbox worker
+    cancels an intent it creates afterwards instead of storing it. Then the
+    intent of every payment is cancelled through the gateway. A hold whose
+    intent cannot be cancelled, because it is being paid or Stripe is down,
+    is kept with its whole group; its payment's webhook settles it, or a
+    later attempt expires it. Returns (expired ids, kept ids).
+    """
+    now = now or timezone.now()
+    gateway = gateway or get_payment_gateway()
+
+    grouped = Booking.objects.filter(id__in=booking_ids, group__isnull=False).values("group_id")
+    holds = dict(
+        Booking.objects.filter(
+            Q(id__in=booking_ids) | Q(group__in=grouped),
+            status="pending",
+            payment_status__in=EXPIRABLE_PAYMENT_STATUSES,
+            hold_expires_at__lte=now,
+        ).values_list("id", "group_id")
+    )
+    if not holds:
+        return [], []
+
+    PaymentIntentOutbox.objects.filter(
+        booking_id__in=holds, status__in=["pending", "processing"]
+    ).update(status="failed", last_error="Booking hold expired", updated_at=now)
+
+    kept_groups = set()
+    kept = set()
+    for booking_id, intent_id in (
+        Payment.objects.filter(booking_id__in=holds)
+        .exclude(status="canceled")
+        .values_list("booking_id", "stripe_payment_intent_id")
+    ):
+        try:
+            gateway.cancel_payment_intent(intent_id)
+        except stripe.error.StripeError as e:
+            logger.warning(
+                "Keeping hold of booking %s: cancelling %s failed: %s", booking_id, intent_id, e
+            )
+            kept.add(booking_id)
+            if holds[booking_id] is not None:
+                kept_groups.add(holds[booking_id])
+
+    kept.update(booking_id for booking_id, group_id in holds.items() if group_id in kept_groups)
+    expiring = [booking_id for booking_id in holds if booking_id not in kept]
+    expired = bulk_transition_bookings(expiring, "expired") if expiring else []
+    return expired, sorted(kept)
+
+
+def expire_holds(batch_size=500, now=None, gateway=None):
+    """
+    Expire pending bookings whose hold has run out, freeing their slots.
+
+    Returns the number of bookings expired.
+    """
+    now = now or timezone.now()
+
+    expired = 0
+    last_id = 0
+    while True:
+        ids = list(
+            Booking.objects.filter(
+                status="pending",
+                payment_status__in=EXPIRABLE_PAYMENT_STATUSES,
+                hold_expires_at__lte=now,
+                id__gt=last_id,
+            )
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        expired += len(expire_bookings(ids, now, gateway)[0])
+        last_id = ids[-1]
+
+    return expired
+
+
+class HoldExpiryTracker:
+    """
+    In-memory timers for every expirable hold.
+
+    ``start`` loads the live holds, ``follow_events`` schedules holds that
+    appear or become expirable afterwards, and ``expire_due`` expires the
+    bookings whose timers fired. A fired hold that was extended in the
+    meantime is scheduled again at its new deadline, and one whose
+    PaymentIntent could not be cancelled is retried after
+    CANCEL_RETRY_SECONDS.
+    """
+
+    def __init__(self, tick_seconds=1.0, gateway=None):
+        self.tick_seconds = tick_seconds
+        self.gateway = gateway
+        self.wheel = None
+        self.position = None
+
+    def __len__(self):
+        return len(self.wheel)
+
+    def start(self, now=None):
+        """Load every live hold; returns the number of holds tracked"""
+        now = now or timezone.now()
+        self.wheel = TimingWheel(now.timestamp(), self.tick_seconds)
+        # Take the log position first, so holds made while loading are followed
+        self.position = events.tail_position()
+        for booking_id, deadline in _expirable_holds().iterator(chunk_size=2000):
+            self.wheel.schedule(booking_id, deadline.timestamp())
+        return len(self.wheel)
+
+    def follow_events(self, batch_size=500):
+        """Track holds from new booking events; returns the number of events read"""
+        new_events, self.position = events.tail_events(self.position, batch_size)
+
+        held = set()
+        for event in new_events:
+            if (
+                event.new_status == "pending"
+                and event.new_payment_status in EXPIRABLE_PAYMENT_STATUSES
+            ):
+                held.add(event.booking_id)
+            else:
+                held.discard(event.booking_id)
+                self.wheel.cancel(event.booking_id)
+
+        if held:
+            for booking_id, deadline in _expirable_holds(held):
+                self.wheel.schedule(booking_id, deadline.timestamp())
+        return len(new_events)
+
+    def expire_due(self, now=None, batch_size=500):
+        """Expire the holds whose timers fired; returns the number expired"""
+        now = now or timezone.now()
+        due = self.wheel.advance(now.timestamp())
+
+        expired = 0
+        for start in range(0, len(due), batch_size):
+            expiring = []
+            for booking_id, deadline in _expirable_holds(due[start : start + batch_size]):
+                if deadline <= now:
+                    expiring.append(booking_id)
+                else:
+                    # Extended by a heartbeat since it was scheduled
+                    self.wheel.schedule(booking_id, deadline.timestamp())
+            if expiring:
+                done, kept = expire_bookings(expiring, now, self.gateway)
+                expired += len(done)
+                for booking_id in kept:
+                    self.wheel.schedule(booking_id, now.timestamp() + CANCEL_RETRY_SECONDS)
+        return expired
@@ -0,0 +1,33 @@
+"""
+Sorted interval index for matching free time ranges
+"""
+from bisect import bisect_left, bisect_right
+
+
+class IntervalIndex:
+    """
+    Index of non-overlapping half-open ``[start, end)`` intervals kept sorted
+    by start, so overlap checks and inserts are O(log n) bisects instead of a
+    scan over every booking of the day.
+    """
+
+    def __init__(self, intervals=()):
+        self._intervals = sorted(intervals)
+        self._starts = [start for start, _ in self._intervals]
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def overlaps(self, start, end):
+        """Return True if ``[start, end)`` intersects any indexed interval"""
+        position = bisect_right(self._starts, start)
+        # The interval starting at or before ``start`` may run past it
+        if position and self._intervals[position - 1][1] > start:
+            return True
+        # The next interval may start before ``end``
+        return position < len(self._starts) and self._starts[position] < end
+
+    def add(self, start, end):
+        position = bisect_left(self._starts, start)
+        self._starts.insert(position, start)
+        self._intervals.insert(position, (start, end))
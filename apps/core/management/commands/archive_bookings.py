@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.archive import archive_bookings
+
+
+class Command(BaseCommand):
+    help = "Move finished bookings older than N days into the archive tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=90,
+            help="Archive completed, cancelled and expired bookings dated more than N days ago",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of bookings moved per transaction",
+        )
+
+    def handle(self, *args, **options):
+        archived = archive_bookings(
+            older_than_days=options["days"], batch_size=options["batch_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} bookings"))
@@ -0,0 +1,301 @@
+import hashlib
+import hmac
+import json
+import random
+import time
+import uuid
+from datetime import time as dt_time, timedelta
+
+import stripe
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from apps.core.models import Booking, Payment, Room, StripeWebhookEvent
+from apps.core.views import stripe_webhook
+from apps.core.webhooks import process_pending_events, verify_event
+
+
+# Event types Stripe sends to a typical account that the webhook does not handle
+UNHANDLED_EVENT_TYPES = [
+    "payment_intent.created",
+    "charge.succeeded",
+    "charge.updated",
+    "customer.updated",
+    "balance.available",
+]
+
+
+def _percentile(latencies, fraction):
+    return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)]
+
+
+def make_event(event_type, intent_id, run_id, index):
+    """A payload shaped like a real Stripe event, about 2 KB"""
+    return json.dumps(
+        {
+            "id": f"evt_bench_{run_id}_{index}",
+            "object": "event",
+            "api_version": "2024-06-20",
+            "created": int(time.time()),
+            "data": {
+                "object": {
+                    "id": intent_id,
+                    "object": "payment_intent",
+                    "amount": 2000,
+                    "amount_received": 2000,
+                    "automatic_payment_methods": {"allow_redirects": "always", "enabled": True},
+                    "client_secret": f"{intent_id}_secret_{uuid.uuid4().hex}",
+                    "currency": "usd",
+                    "latest_charge": f"ch_bench_{index}",
+                    "livemode": False,
+                    "metadata": {"booking_id": str(index), "room_name": "bench"},
+                    "payment_method": f"pm_bench_{index}",
+                    "payment_method_options": {
+                        "card": {
+                            "installments": None,
+                            "mandate_options": None,
+                            "network": None,
+                            "request_three_d_secure": "automatic",
+                        }
+                    },
+                    "payment_method_types": ["card", "link"],
+                    "status": "succeeded",
+                    "charges": {
+                        "object": "list",
+                        "data": [
+                            {
+                                "id": f"ch_bench_{index}",
+                                "object": "charge",
+                                "amount": 2000,
+                                "billing_details": {
+                                    "address": {
+                                        "city": None,
+                                        "country": "DE",
+                                        "line1": None,
+                                        "postal_code": "10115",
+                                    },
+                                    "email": "guest@example.com",
+                                    "name": "Bench Guest",
+                                },
+                                "outcome": {
+                                    "network_status": "approved_by_network",
+                                    "risk_level": "normal",
+                                    "risk_score": random.randint(0, 60),
+                                    "seller_message": "Payment complete.",
+                                    "type": "authorized",
+                                },
+                                "paid": True,
+                                "payment_method_details": {
+                                    "card": {
+                                        "brand": "visa",
+                                        "checks": {"cvc_check": "pass"},
+                                        "exp_month": 12,
+                                        "exp_year": 2030,
+                                        "last4": "4242",
+                                    },
+                                    "type": "card",
+                                },
+                                "status": "succeeded",
+                            }
+                        ],
+                        "has_more": False,
+                    },
+                }
+            },
+            "livemode": False,
+            "pending_webhooks": 1,
+            "request": {"id": None, "idempotency_key": None},
+            "type": event_type,
+        }
+    ).encode()
+
+
+def sign(payload, secret):
+    """Stripe-Signature header for ``payload``, as Stripe computes it"""
+    timestamp = int(time.time())
+    signature = hmac.new(
+        secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the Stripe webhook with locally generated, signed events: "
+        "verification and parsing, the request path, and the batch worker"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--events", type=int, default=2000, help="Events to send")
+        parser.add_argument(
+            "--handled-ratio",
+            type=float,
+            default=0.2,
+            help="Share of events of a handled type; each confirms one booking",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Events the worker applies per transaction",
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the benchmark room, bookings and events"
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Run even when DEBUG is off (the benchmark writes real rows)",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError("Refusing to run with DEBUG off; pass --force to run anyway")
+
+        run_id = uuid.uuid4().hex[:8]
+        secret = f"whsec_bench_{run_id}"
+        room = Room.objects.create(
+            name=f"webhook-bench-{run_id}",
+            description="Created by bench_webhook",
+            price_per_slot=10,
+            capacity=10,
+            opening_time=dt_time(9),
+            closing_time=dt_time(18),
+        )
+        user = User.objects.create_user(
+            username=f"webhook-bench-{run_id}", email=f"webhook-bench-{run_id}@example.com"
+        )
+
+        try:
+            handled = round(options["events"] * options["handled_ratio"])
+            intent_ids = self._make_payments(room, user, handled, run_id)
+            types = ["payment_intent.succeeded"] * handled + [
+                random.choice(UNHANDLED_EVENT_TYPES)
+                for _ in range(options["events"] - handled)
+            ]
+            random.shuffle(types)
+            handled_intents = iter(intent_ids)
+            payloads = [
+                make_event(
+                    event_type,
+                    next(handled_intents) if event_type == "payment_intent.succeeded"
+                    else f"pi_bench_{run_id}_other_{index}",
+                    run_id,
+                    index,
+                )
+                for index, event_type in enumerate(types)
+            ]
+            signed = [(payload, sign(payload, secret)) for payload in payloads]
+
+            self._bench_parsing(signed, secret)
+            with override_settings(STRIPE_WEBHOOK_SECRET=secret):
+                self._bench_requests(signed, types)
+            self._bench_worker(options["batch_size"], handled)
+
+            confirmed = Booking.objects.filter(room=room, status="confirmed").count()
+            if confirmed != handled:
+                raise CommandError(f"Expected {handled} confirmed bookings, found {confirmed}")
+            self.stdout.write(self.style.SUCCESS(f"All {handled} bookings confirmed"))
+        finally:
+            if not options["keep"]:
+                StripeWebhookEvent.objects.filter(event_id__startswith=f"evt_bench_{run_id}_").delete()
+                room.delete()
+                user.delete()
+
+    def _make_payments(self, room, user, count, run_id):
+        """Pending bookings with a payment each, one per slot; returns the intent ids"""
+        clock = room.clock
+        slots_per_day = (clock.closing_minute - clock.opening_minute) // clock.slot_minutes
+        first_day = clock.today() + timedelta(days=1)
+        bookings = []
+        for index in range(count):
+            start = clock.opening_minute + (index % slots_per_day) * clock.slot_minutes
+            end = start + clock.slot_minutes
+            booking = Booking(
+                user=user,
+                room=room,
+                booking_date=first_day + timedelta(days=index // slots_per_day),
+                start_time=dt_time(start // 60, start % 60),
+                end_time=dt_time(end // 60, end % 60),
+                guest_count=1,
+                total_amount=room.price_per_slot,
+            )
+            booking.set_instants()
+            bookings.append(booking)
+        Booking.objects.bulk_create(bookings, batch_size=1000)
+
+        intent_ids = [f"pi_bench_{run_id}_{index}" for index in range(count)]
+        Payment.objects.bulk_create(
+            [
+                Payment(
+                    booking=booking,
+                    stripe_payment_intent_id=intent_id,
+                    amount=booking.total_amount,
+                    status="requires_payment_method",
+                )
+                for booking, intent_id in zip(bookings, intent_ids)
+            ],
+            batch_size=1000,
+        )
+        return intent_ids
+
+    def _bench_parsing(self, signed, secret):
+        for label, parse in (
+            ("construct_event", stripe.Webhook.construct_event),
+            ("verify_event", verify_event),
+        ):
+            started = time.perf_counter()
+            for payload, header in signed:
+                parse(payload, header, secret)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{label:<16} {len(signed) / elapsed:>10.0f} events/s "
+                f"({elapsed / len(signed) * 1e6:.0f} us/event)"
+            )
+
+    def _bench_requests(self, signed, types):
+        factory = APIRequestFactory()
+        latencies = {"handled": [], "ignored": []}
+
+        started = time.perf_counter()
+        for (payload, header), event_type in zip(signed, types):
+            request = factory.post(
+                "/api/stripe-webhook/",
+                payload,
+                content_type="application/json",
+                HTTP_STRIPE_SIGNATURE=header,
+            )
+            request_started = time.perf_counter()
+            response = stripe_webhook(request)
+            elapsed = time.perf_counter() - request_started
+            if response.status_code != 200:
+                raise CommandError(f"Webhook answered {response.status_code}: {response.data}")
+            kind = "ignored" if response.data["status"] == "ignored" else "handled"
+            latencies[kind].append(elapsed)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{len(signed)} webhook requests in {elapsed:.2f}s ({len(signed) / elapsed:.0f} req/s)"
+        )
+        for kind, values in latencies.items():
+            if values:
+                values.sort()
+                self.stdout.write(
+                    f"  {kind}: {len(values)}, p50 {_percentile(values, 0.5) * 1000:.2f} ms, "
+                    f"p95 {_percentile(values, 0.95) * 1000:.2f} ms"
+                )
+
+    def _bench_worker(self, batch_size, handled):
+        processed = 0
+        started = time.perf_counter()
+        while batch := process_pending_events(batch_size):
+            processed += batch
+        elapsed = time.perf_counter() - started
+        if processed:
+            self.stdout.write(
+                f"Worker applied {processed} events in {elapsed:.2f}s "
+                f"({processed / elapsed:.0f} events/s, batches of {batch_size})"
+            )
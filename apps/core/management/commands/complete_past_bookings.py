@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.services import complete_past_bookings
+
+
+class Command(BaseCommand):
+    help = "Mark confirmed bookings that have already ended as completed"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of bookings updated per transaction",
+        )
+
+    def handle(self, *args, **options):
+        completed = complete_past_bookings(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Completed {completed} bookings"))
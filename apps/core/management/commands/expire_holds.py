@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.holds import expire_holds
+
+
+class Command(BaseCommand):
+    help = "Expire pending bookings whose hold has run out and promote waitlisted users"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of bookings expired per transaction",
+        )
+
+    def handle(self, *args, **options):
+        expired = expire_holds(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} booking holds"))
@@ -0,0 +1,76 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.room_import import (
+    IMPORT_FORMATS,
+    RoomImportError,
+    import_rooms,
+    read_rows,
+)
+
+
+# Row errors printed before the rest are only counted
+MAX_PRINTED_ERRORS = 50
+
+
+class Command(BaseCommand):
+    help = "Create or update rooms from a CSV or JSON Lines file, keyed by room code"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import; the format follows the extension")
+        parser.add_argument(
+            "--format",
+            choices=IMPORT_FORMATS,
+            help="Input format when the extension is neither .csv nor .jsonl",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Rooms upserted per query",
+        )
+        parser.add_argument(
+            "--partial",
+            action="store_true",
+            help="Keep the valid rows when some rows are invalid",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        fmt = options["format"] or {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}.get(
+            path.suffix.lower()
+        )
+        if fmt is None:
+            raise CommandError("Cannot tell the format from the extension; pass --format")
+
+        try:
+            with path.open(encoding="utf-8-sig", newline="") as lines:
+                report = import_rooms(
+                    read_rows(lines, fmt),
+                    chunk_size=options["chunk_size"],
+                    partial=options["partial"],
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+        except RoomImportError as e:
+            self._print_errors(e.report)
+            raise CommandError(f"{e.report['failed']} invalid rows, nothing was imported")
+
+        self._print_errors(report)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {report['created']} and updated {report['updated']} rooms"
+                + (f", skipped {report['failed']} invalid rows" if report["failed"] else "")
+            )
+        )
+
+    def _print_errors(self, report):
+        for error in report["errors"][:MAX_PRINTED_ERRORS]:
+            messages = "; ".join(
+                f"{'.'.join(map(str, detail.get('loc', ()))) or 'row'}: {detail['msg']}"
+                for detail in error["errors"]
+            )
+            self.stderr.write(f"Row {error['row']}: {messages}")
+        if report["failed"] > MAX_PRINTED_ERRORS:
+            self.stderr.write(f"... and {report['failed'] - MAX_PRINTED_ERRORS} more invalid rows")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.events import PROJECTIONS, rebuild_projection
+
+
+class Command(BaseCommand):
+    help = "Rebuild a read model projection by replaying the booking event log"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "projections",
+            nargs="*",
+            help="Projections to rebuild (default: all)",
+        )
+
+    def handle(self, *args, **options):
+        names = options["projections"] or list(PROJECTIONS)
+        unknown = set(names) - set(PROJECTIONS)
+        if unknown:
+            raise CommandError(f"Unknown projections: {', '.join(sorted(unknown))}")
+
+        for name in names:
+            replayed = rebuild_projection(name)
+            self.stdout.write(
+                self.style.SUCCESS(f"Rebuilt {name} from {replayed} booking events")
+            )
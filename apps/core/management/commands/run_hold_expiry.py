@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.holds import HoldExpiryTracker
+
+
+class Command(BaseCommand):
+    help = "Expire booking holds within seconds of their deadline using an in-memory timing wheel"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tick",
+            type=float,
+            default=1.0,
+            help="Timing wheel resolution in seconds",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of events read, and bookings expired, per query",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds between checks for new holds and due timers",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Expire the holds already due and exit instead of running forever",
+        )
+
+    def handle(self, *args, **options):
+        tracker = HoldExpiryTracker(tick_seconds=options["tick"])
+        tracked = tracker.start()
+        self.stdout.write(f"Tracking {tracked} booking holds")
+
+        expired = 0
+        while True:
+            while tracker.follow_events(options["batch_size"]) == options["batch_size"]:
+                pass
+            expired += tracker.expire_due(batch_size=options["batch_size"])
+
+            if options["once"]:
+                break
+            time.sleep(options["poll_interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} booking holds"))
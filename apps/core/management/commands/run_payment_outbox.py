@@ -0,0 +1,68 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.core.outbox import claim_due_entries, process_entry
+from apps.core.payments import get_payment_gateway
+
+
+class Command(BaseCommand):
+    help = "Create queued Stripe PaymentIntents with a bounded worker pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Maximum number of Stripe calls in flight",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait for new entries when the outbox is empty",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no entries are due instead of polling forever",
+        )
+
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"]
+        gateway = get_payment_gateway()
+        processed = 0
+
+        def work(entry_id):
+            close_old_connections()
+            try:
+                return process_entry(entry_id, gateway)
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            in_flight = set()
+            while True:
+                free_slots = concurrency - len(in_flight)
+                entry_ids = claim_due_entries(free_slots) if free_slots else []
+                in_flight.update(pool.submit(work, entry_id) for entry_id in entry_ids)
+
+                if not in_flight:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                done, in_flight = wait(
+                    in_flight, timeout=options["poll_interval"], return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    entry = future.result()
+                    processed += 1
+                    self.stdout.write(
+                        f"PaymentIntent request {entry.id} for booking {entry.booking_id}: {entry.status}"
+                    )
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} PaymentIntent requests"))
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.events import PROJECTIONS, run_projection
+
+
+class Command(BaseCommand):
+    help = "Apply new booking events to read model projections"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "projections",
+            nargs="*",
+            help="Projections to run (default: all)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of events applied per transaction",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait for new events when every projection is current",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once every projection is current instead of polling forever",
+        )
+
+    def handle(self, *args, **options):
+        names = options["projections"] or list(PROJECTIONS)
+        unknown = set(names) - set(PROJECTIONS)
+        if unknown:
+            raise CommandError(f"Unknown projections: {', '.join(sorted(unknown))}")
+
+        applied = 0
+        while True:
+            batch = sum(run_projection(name, options["batch_size"]) for name in names)
+            applied += batch
+
+            if not batch:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"Applied {applied} booking events"))
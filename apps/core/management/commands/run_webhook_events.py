@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.webhooks import process_pending_events
+
+
+class Command(BaseCommand):
+    help = "Apply stored Stripe webhook events to payments and bookings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Number of events applied per transaction",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=0.5,
+            help="Seconds to wait for new events when none are pending",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no events are pending instead of polling forever",
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            batch = process_pending_events(options["batch_size"])
+            processed += batch
+
+            if not batch:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} webhook events"))
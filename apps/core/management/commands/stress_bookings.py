@@ -0,0 +1,239 @@
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import time as dt_time, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.core.models import Room
+from apps.core.services import (
+    bulk_transition_bookings,
+    find_overlapping_bookings,
+    find_seat_count_errors,
+)
+from apps.core.views import create_booking
+
+
+# Postgres messages for the failures the booking path must never produce
+DEADLOCK = "deadlock detected"
+SERIALIZATION_FAILURE = "could not serialize access"
+
+
+def classify_error(message):
+    if DEADLOCK in message:
+        return "deadlock"
+    if SERIALIZATION_FAILURE in message:
+        return "serialization_failure"
+    return "error"
+
+
+def _percentile(latencies, fraction):
+    return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent overlapping booking requests at a few rooms and verify "
+        "that no two active bookings overlap"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=3, help="Rooms to book against")
+        parser.add_argument(
+            "--requests", type=int, default=2000, help="Total booking requests to send"
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=32, help="Requests in flight at once"
+        )
+        parser.add_argument(
+            "--window-slots",
+            type=int,
+            default=8,
+            help="Slots of the day requests start in; fewer means more contention",
+        )
+        parser.add_argument(
+            "--cancel-ratio",
+            type=float,
+            default=0.1,
+            help="Share of successful bookings cancelled again during the run",
+        )
+        parser.add_argument(
+            "--shared",
+            action="store_true",
+            help="Book shared rooms by seat instead of exclusive rooms",
+        )
+        parser.add_argument(
+            "--with-limits",
+            action="store_true",
+            help="Keep rate limits and per-room admission control enabled",
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the stress rooms, users and bookings"
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Run even when DEBUG is off (the harness writes real rows)",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError("Refusing to run with DEBUG off; pass --force to run anyway")
+
+        run_id = uuid.uuid4().hex[:8]
+        rooms = [
+            Room.objects.create(
+                name=f"stress-{run_id}-{index}",
+                description="Created by stress_bookings",
+                price_per_slot=10,
+                capacity=10,
+                booking_mode="shared" if options["shared"] else "exclusive",
+                opening_time=dt_time(9),
+                closing_time=dt_time(18),
+            )
+            for index in range(options["rooms"])
+        ]
+        users = [
+            User.objects.create_user(
+                username=f"stress-{run_id}-{index}", email=f"stress-{run_id}-{index}@example.com"
+            )
+            for index in range(options["concurrency"])
+        ]
+
+        try:
+            limits = {} if options["with_limits"] else {"RATELIMIT_ENABLED": False}
+            with override_settings(**limits):
+                report = self._run(rooms, users, options)
+            self._report(report, options)
+
+            room_ids = [room.id for room in rooms]
+            if options["shared"]:
+                violations = find_seat_count_errors(room_ids)
+                problem = "slots overbooked or miscounted"
+                invariant = "no slot over capacity, all seat counters exact"
+            else:
+                violations = find_overlapping_bookings(room_ids)
+                problem = "overlapping active booking pairs"
+                invariant = "no overlapping active bookings"
+            if violations:
+                raise CommandError(
+                    f"Invariant violated: {len(violations)} {problem}, e.g. {violations[:5]}"
+                )
+            self.stdout.write(self.style.SUCCESS(f"Invariant holds: {invariant}"))
+        finally:
+            if not options["keep"]:
+                Room.objects.filter(id__in=[room.id for room in rooms]).delete()
+                User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    def _run(self, rooms, users, options):
+        factory = APIRequestFactory()
+        booking_date = rooms[0].clock.today() + timedelta(days=7)
+        opening = rooms[0].clock.opening_minute
+        slot = rooms[0].clock.slot_minutes
+
+        outcomes = Counter()
+        latencies = []
+        created = []
+        lock = threading.Lock()
+
+        def request_body():
+            start = opening + random.randrange(options["window_slots"]) * slot
+            end = start + random.randint(1, 4) * slot
+            return {
+                "room_id": random.choice(rooms).id,
+                "booking_date": booking_date.isoformat(),
+                "start_time": f"{start // 60:02d}:{start % 60:02d}:00",
+                "end_time": f"{end // 60:02d}:{end % 60:02d}:00",
+                "guest_count": random.randint(1, 4) if options["shared"] else 1,
+            }
+
+        def send(user):
+            request = factory.post("/api/bookings/", request_body(), format="json")
+            force_authenticate(request, user=user)
+
+            started = time.perf_counter()
+            response = create_booking(request)
+            elapsed = time.perf_counter() - started
+
+            if response.status_code == 500:
+                outcome = classify_error(str(response.data.get("detail", "")))
+            else:
+                outcome = str(response.status_code)
+
+            cancel_id = None
+            with lock:
+                outcomes[outcome] += 1
+                latencies.append(elapsed)
+                if response.status_code == 201:
+                    created.append(response.data["id"])
+                    if random.random() < options["cancel_ratio"]:
+                        cancel_id = random.choice(created)
+
+            if cancel_id:
+                try:
+                    bulk_transition_bookings([cancel_id], "cancelled")
+                    outcome = "cancelled"
+                except Exception as e:
+                    outcome = f"cancel_{classify_error(str(e))}"
+                with lock:
+                    outcomes[outcome] += 1
+
+        # Each worker thread keeps one database connection for the whole run,
+        # like a server worker would, and closes it when the requests run out
+        remaining = iter(range(options["requests"]))
+
+        def worker(user):
+            try:
+                while True:
+                    with lock:
+                        if next(remaining, None) is None:
+                            return
+                    send(user)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            list(pool.map(worker, users))
+        elapsed = time.perf_counter() - started
+
+        return {"outcomes": outcomes, "latencies": sorted(latencies), "elapsed": elapsed}
+
+    def _report(self, report, options):
+        outcomes = report["outcomes"]
+        latencies = report["latencies"]
+        elapsed = report["elapsed"]
+
+        self.stdout.write(
+            f"{options['requests']} requests, {options['concurrency']} concurrent, "
+            f"{options['rooms']} rooms in {elapsed:.2f}s ({options['requests'] / elapsed:.1f} req/s)"
+        )
+        if latencies:
+            self.stdout.write(
+                "Latency p50 {:.1f} ms, p95 {:.1f} ms, p99 {:.1f} ms".format(
+                    *(_percentile(latencies, fraction) * 1000 for fraction in (0.5, 0.95, 0.99))
+                )
+            )
+        labels = {
+            "201": "created",
+            "409": "conflict",
+            "429": "shed (rate limit / admission)",
+        }
+        for outcome, count in sorted(outcomes.items()):
+            self.stdout.write(f"  {labels.get(outcome, outcome)}: {count}")
+
+        failures = sum(
+            count
+            for outcome, count in outcomes.items()
+            if outcome.endswith(("deadlock", "serialization_failure"))
+        )
+        style = self.style.ERROR if failures else self.style.SUCCESS
+        self.stdout.write(style(f"Deadlocks/serialization failures: {failures}"))
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.tracing import summarize_traces
+
+
+def _percentile(durations, fraction):
+    return durations[min(int(len(durations) * fraction), len(durations) - 1)]
+
+
+class Command(BaseCommand):
+    help = "Summarize span durations per route from traces written by FileExporter"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file",
+            default=settings.TRACING_FILE,
+            help="JSON lines trace file (default: settings.TRACING_FILE)",
+        )
+        parser.add_argument(
+            "--route", help="Only report routes whose root span name contains this text"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["file"]) as f:
+                summary = summarize_traces(f)
+        except FileNotFoundError:
+            raise CommandError(f"No trace file at {options['file']}")
+
+        reported = 0
+        for route, spans in sorted(summary.items()):
+            if options["route"] and options["route"] not in route:
+                continue
+            reported += 1
+            root = spans[route]
+            self.stdout.write(f"{route}: {len(root)} traces")
+            # Slowest spans first, by total time across the traces
+            for name, durations in sorted(spans.items(), key=lambda item: -sum(item[1])):
+                self.stdout.write(
+                    f"  {name:<32} {len(durations):>6}x  p50 {_percentile(durations, 0.5):>8.2f} ms  "
+                    f"p95 {_percentile(durations, 0.95):>8.2f} ms  "
+                    f"{sum(durations) / sum(root):>6.1%} of request time"
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Reported {reported} routes"))
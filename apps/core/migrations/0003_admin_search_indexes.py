@@ -0,0 +1,46 @@
+# Generated by Django 5.2.2 on 2026-10-19 03:05
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built concurrently so large tables stay writable
+    atomic = False
+
+    dependencies = [
+        ('core', '0002_booking_status_date_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(fields=['booking_date'], name='booking_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(fields=['-created_at'], name='booking_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='payment',
+            index=models.Index(fields=['-created_at'], name='payment_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='room',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='room_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        # Booking admin searches user__username/user__email with ILIKE '%term%'
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS auth_user_username_trgm_idx ON auth_user USING gin (username gin_trgm_ops);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS auth_user_username_trgm_idx;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS auth_user_email_trgm_idx ON auth_user USING gin (email gin_trgm_ops);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS auth_user_email_trgm_idx;',
+        ),
+    ]
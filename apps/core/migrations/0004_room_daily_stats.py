@@ -0,0 +1,51 @@
+# Generated by Django 5.2.2 on 2026-10-19 03:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_admin_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('booked_slots', models.IntegerField(default=0, help_text='Slots held by confirmed or completed bookings')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, help_text='Total amount of confirmed or completed bookings', max_digits=12)),
+                ('pending_count', models.IntegerField(default=0)),
+                ('confirmed_count', models.IntegerField(default=0)),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('expired_count', models.IntegerField(default=0)),
+                ('completed_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['updated_at'], name='booking_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='roomdailystats',
+            name='room',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='core.room'),
+        ),
+        migrations.AddIndex(
+            model_name='roomdailystats',
+            index=models.Index(fields=['date'], name='room_daily_stats_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='roomdailystats',
+            constraint=models.UniqueConstraint(fields=('room', 'date'), name='room_daily_stats_room_date_uniq'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.2 on 2026-10-19 03:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_room_daily_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('guest_count', models.IntegerField()),
+                ('special_requests', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('promoted', 'Promoted'), ('cancelled', 'Cancelled')], default='waiting', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['room', 'booking_date'], name='booking_room_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='waitlistentry',
+            name='booking',
+            field=models.OneToOneField(blank=True, help_text='Pending hold created when the entry was promoted', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='waitlist_entry', to='core.booking'),
+        ),
+        migrations.AddField(
+            model_name='waitlistentry',
+            name='room',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='core.room'),
+        ),
+        migrations.AddField(
+            model_name='waitlistentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='waitlistentry',
+            index=models.Index(condition=models.Q(('status', 'waiting')), fields=['room', 'booking_date', 'start_time'], name='waitlist_waiting_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='waitlistentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'waiting')), fields=('user', 'room', 'booking_date', 'start_time', 'end_time'), name='waitlist_one_waiting_entry_per_range'),
+        ),
+    ]
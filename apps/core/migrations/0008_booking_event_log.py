@@ -0,0 +1,77 @@
+# Generated by Django 5.2.2 on 2026-10-19 03:21
+
+from django.db import migrations, models
+
+
+# One creation event per existing booking, so the log is complete from day one
+SEED_EVENTS_SQL = """
+INSERT INTO core_bookingevent (
+    booking_id, room_id, booking_date, start_time, end_time, number_of_slots,
+    total_amount, old_status, new_status, old_payment_status, new_payment_status,
+    transaction_id, created_at
+)
+SELECT id, room_id, booking_date, start_time, end_time, number_of_slots,
+       total_amount, NULL, status, NULL, payment_status, txid_current(), created_at
+FROM (
+    SELECT id, room_id, booking_date, start_time, end_time, number_of_slots,
+           total_amount, status, payment_status, created_at
+    FROM core_booking
+    UNION ALL
+    SELECT id, room_id, booking_date, start_time, end_time, number_of_slots,
+           total_amount, status, payment_status, created_at
+    FROM core_archivedbooking
+) AS bookings
+ORDER BY created_at, id
+"""
+
+# Existing rollups already count the seeded bookings
+SEED_CHECKPOINT_SQL = """
+INSERT INTO core_projectioncheckpoint (name, last_transaction_id, last_event_id, updated_at)
+SELECT 'room_daily_stats', txid_current(), COALESCE(MAX(id), 0), now()
+FROM core_bookingevent
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_booking_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectionCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('last_transaction_id', models.BigIntegerField(default=0)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BookingEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_id', models.BigIntegerField()),
+                ('room_id', models.BigIntegerField()),
+                ('booking_date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('number_of_slots', models.IntegerField()),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('old_status', models.CharField(blank=True, help_text='Empty for a new booking', max_length=20, null=True)),
+                ('new_status', models.CharField(max_length=20)),
+                ('old_payment_status', models.CharField(blank=True, max_length=20, null=True)),
+                ('new_payment_status', models.CharField(blank=True, max_length=20, null=True)),
+                ('transaction_id', models.BigIntegerField(db_default=models.Func(function='txid_current', output_field=models.BigIntegerField()), help_text='Postgres transaction that wrote the event; orders the log for projections')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['transaction_id', 'id'],
+                'indexes': [models.Index(fields=['transaction_id', 'id'], name='booking_event_position_idx'), models.Index(fields=['booking_id'], name='booking_event_booking_idx')],
+            },
+        ),
+        migrations.RunSQL(SEED_EVENTS_SQL, migrations.RunSQL.noop),
+        migrations.RunSQL(SEED_CHECKPOINT_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.2 on 2026-10-19 03:23
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built concurrently so large tables stay writable
+    atomic = False
+
+    dependencies = [
+        ('core', '0008_booking_event_log'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='archivedbooking',
+            index=models.Index(fields=['user', 'booking_date', 'start_time', 'id'], name='archived_booking_user_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(fields=['user', 'booking_date', 'start_time', 'id'], name='booking_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.2 on 2026-10-19 03:24
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built concurrently so large tables stay writable
+    atomic = False
+
+    dependencies = [
+        ('core', '0009_booking_user_history_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='bookingevent',
+            index=models.Index(fields=['room_id', 'booking_date'], name='booking_event_room_date_idx'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.2 on 2026-10-19 03:31
+
+import apps.core.clock
+from django.db import migrations, models
+
+
+# Existing rooms keep the former project-wide UTC; the instants are derived
+# from each booking's local date and times in its room's timezone
+BACKFILL_INSTANTS_SQL = """
+UPDATE {table} AS booking
+SET starts_at = (booking.booking_date + booking.start_time) AT TIME ZONE room.timezone,
+    ends_at = (booking.booking_date + booking.end_time) AT TIME ZONE room.timezone
+FROM core_room AS room
+WHERE room.id = booking.room_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_booking_event_room_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='timezone',
+            field=models.CharField(default='UTC', help_text='IANA timezone of the opening hours and booking times, e.g. Europe/Berlin', max_length=64, validators=[apps.core.clock.validate_timezone]),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='starts_at',
+            field=models.DateTimeField(help_text="Start as a UTC instant, from the room's timezone", null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='ends_at',
+            field=models.DateTimeField(help_text="End as a UTC instant, from the room's timezone", null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedbooking',
+            name='starts_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedbooking',
+            name='ends_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunSQL(
+            BACKFILL_INSTANTS_SQL.format(table='core_booking'), migrations.RunSQL.noop
+        ),
+        migrations.RunSQL(
+            BACKFILL_INSTANTS_SQL.format(table='core_archivedbooking'), migrations.RunSQL.noop
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='starts_at',
+            field=models.DateTimeField(help_text="Start as a UTC instant, from the room's timezone"),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='ends_at',
+            field=models.DateTimeField(help_text="End as a UTC instant, from the room's timezone"),
+        ),
+        migrations.AlterField(
+            model_name='archivedbooking',
+            name='starts_at',
+            field=models.DateTimeField(),
+        ),
+        migrations.AlterField(
+            model_name='archivedbooking',
+            name='ends_at',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'ends_at'], name='booking_status_ends_idx'),
+        ),
+    ]
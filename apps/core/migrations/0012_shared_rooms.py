@@ -0,0 +1,33 @@
+# Generated by Django 5.2.2 on 2026-10-19 03:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_room_timezone_booking_instants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='booking_mode',
+            field=models.CharField(choices=[('exclusive', 'Exclusive'), ('shared', 'Shared')], default='exclusive', help_text="Exclusive rooms take one booking per time slot; shared rooms take bookings until the capacity's seats are taken", max_length=20),
+        ),
+        migrations.CreateModel(
+            name='SlotOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_date', models.DateField()),
+                ('start_time', models.TimeField(help_text='Slot start time')),
+                ('seats_taken', models.IntegerField(default=0)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_occupancy', to='core.room')),
+            ],
+            options={
+                'ordering': ['booking_date', 'start_time'],
+                'constraints': [models.UniqueConstraint(fields=('room', 'booking_date', 'start_time'), name='slot_occupancy_room_slot_uniq'), models.CheckConstraint(condition=models.Q(('seats_taken__gte', 0)), name='slot_occupancy_seats_taken_gte_0')],
+            },
+        ),
+    ]
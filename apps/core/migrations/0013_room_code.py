@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-19 03:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_shared_rooms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='code',
+            field=models.SlugField(blank=True, help_text='Stable key used to update the room from bulk imports', max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-19 03:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_room_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='hold_minutes',
+            field=models.IntegerField(default=30, help_text='Minutes a pending booking holds its slot, extended by heartbeats'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.2 on 2026-10-19 03:52
+
+import django.db.models.deletion
+import rest_framework.utils.encoders
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_stripe_webhook_event'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingDetail',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('data', models.JSONField(encoder=rest_framework.utils.encoders.JSONEncoder, help_text='Booking fields, user and room names and payment')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('archived_booking', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='detail', to='core.archivedbooking')),
+                ('booking', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='detail', to='core.booking')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_details', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.2 on 2026-10-19 03:55
+
+import apps.core.pricing
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_booking_detail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='pricing_tiers',
+            field=models.JSONField(blank=True, help_text='Occupancy price multipliers, e.g. [{"from": 0.8, "multiplier": "1.2"}]; empty uses the default tiers, [] prices every slot at the base price', null=True, validators=[apps.core.pricing.validate_pricing_tiers]),
+        ),
+    ]
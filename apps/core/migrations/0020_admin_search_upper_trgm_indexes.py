@@ -0,0 +1,45 @@
+# Generated by Django 5.2.2 on 2026-10-19 04:18
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built concurrently so large tables stay writable
+    atomic = False
+
+    dependencies = [
+        ('core', '0019_booking_groups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Admin icontains searches compile to UPPER(col::text) LIKE UPPER('%term%'),
+        # which only an index on that expression can serve
+        AddIndexConcurrently(
+            model_name='room',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('name', models.TextField())), name='gin_trgm_ops'), name='room_name_upper_trgm_idx'),
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS auth_user_username_upper_trgm_idx ON auth_user USING gin ((UPPER(username::text)) gin_trgm_ops);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS auth_user_username_upper_trgm_idx;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS auth_user_email_upper_trgm_idx ON auth_user USING gin ((UPPER(email::text)) gin_trgm_ops);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS auth_user_email_upper_trgm_idx;',
+        ),
+        # Replaced by the expression indexes above; nothing else searches these columns
+        migrations.RunSQL(
+            sql='DROP INDEX CONCURRENTLY IF EXISTS auth_user_username_trgm_idx;',
+            reverse_sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS auth_user_username_trgm_idx ON auth_user USING gin (username gin_trgm_ops);',
+        ),
+        migrations.RunSQL(
+            sql='DROP INDEX CONCURRENTLY IF EXISTS auth_user_email_trgm_idx;',
+            reverse_sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS auth_user_email_trgm_idx ON auth_user USING gin (email gin_trgm_ops);',
+        ),
+    ]
@@ -0,0 +1,67 @@
+from django.db import migrations
+
+
+CHUNK_SIZE = 1000
+
+
+def _detail_data(booking):
+    # Same shape as booking_details.detail_data, on the historical models
+    data = {
+        field.attname: getattr(booking, field.attname)
+        for field in type(booking)._meta.concrete_fields
+    }
+    data.update(
+        user_name=booking.user.username,
+        user_email=booking.user.email,
+        room_name=booking.room.name,
+    )
+    payment = getattr(booking, "payment", None)
+    data["payment"] = payment and {
+        "payment_intent_id": payment.stripe_payment_intent_id,
+        "amount": payment.amount,
+        "currency": payment.currency,
+        "status": payment.status,
+        "payment_method": payment.payment_method,
+    }
+    return data
+
+
+def backfill_booking_details(apps, schema_editor):
+    """Write the detail rows of bookings that predate the read model"""
+    BookingDetail = apps.get_model("core", "BookingDetail")
+
+    for model_name, link in (("Booking", "booking_id"), ("ArchivedBooking", "archived_booking_id")):
+        model = apps.get_model("core", model_name)
+        last_id = 0
+        while True:
+            bookings = list(
+                model.objects.filter(id__gt=last_id, detail__isnull=True)
+                .select_related("user", "room", "payment")
+                .order_by("id")[:CHUNK_SIZE]
+            )
+            if not bookings:
+                break
+            BookingDetail.objects.bulk_create(
+                [
+                    BookingDetail(
+                        id=booking.id,
+                        user_id=booking.user_id,
+                        data=_detail_data(booking),
+                        **{link: booking.id},
+                    )
+                    for booking in bookings
+                ],
+                ignore_conflicts=True,
+            )
+            last_id = bookings[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_admin_search_upper_trgm_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_booking_details, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.2 on 2026-10-19 04:29
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are built concurrently so large tables stay writable
+    atomic = False
+
+    dependencies = [
+        ('core', '0021_backfill_booking_details'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='archivedbooking',
+            index=models.Index(fields=['user', 'starts_at', 'id'], name='archived_booking_starts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='booking',
+            index=models.Index(fields=['user', 'starts_at', 'id'], name='booking_user_starts_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='archivedbooking',
+            name='archived_booking_user_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='booking',
+            name='booking_user_date_idx',
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.2 on 2026-10-19 04:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def count_day_slots(apps, schema_editor):
+    """Count the slots of the active bookings of every room and day"""
+    Booking = apps.get_model("core", "Booking")
+    DayOccupancy = apps.get_model("core", "DayOccupancy")
+    days = (
+        Booking.objects.filter(status__in=["pending", "confirmed"])
+        .values("room_id", "booking_date")
+        .annotate(slots=Sum("number_of_slots"))
+        .order_by()
+    )
+    DayOccupancy.objects.bulk_create(
+        (
+            DayOccupancy(
+                room_id=day["room_id"], booking_date=day["booking_date"], slots_taken=day["slots"]
+            )
+            for day in days.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_booking_user_starts_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DayOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_date', models.DateField()),
+                ('slots_taken', models.IntegerField(default=0)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_occupancy', to='core.room')),
+            ],
+            options={
+                'ordering': ['booking_date'],
+                'constraints': [models.UniqueConstraint(fields=('room', 'booking_date'), name='day_occupancy_room_date_uniq'), models.CheckConstraint(condition=models.Q(('slots_taken__gte', 0)), name='day_occupancy_slots_taken_gte_0')],
+            },
+        ),
+        migrations.RunPython(count_day_slots, migrations.RunPython.noop),
+    ]
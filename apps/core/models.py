@@ -1,25 +1,129 @@
+from functools import cached_property
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db.models.functions import Cast, Upper
+from rest_framework.utils.encoders import JSONEncoder
+
+from .clock import RoomClock, validate_timezone
+from .pricing import pricing_for, validate_pricing_tiers
+
+
+# Text search configuration of Room.search_vector; queries must use the same one
+ROOM_SEARCH_CONFIG = "english"
 
 
 class Room(models.Model):
     """Model for rooms/services available for booking"""
 
+    BOOKING_MODE_CHOICES = [
+        ("exclusive", "Exclusive"),
+        ("shared", "Shared"),
+    ]
+
+    code = models.SlugField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text="Stable key used to update the room from bulk imports",
+    )
     name = models.CharField(max_length=255)
     description = models.TextField()
     price_per_slot = models.DecimalField(max_digits=10, decimal_places=2, help_text="Price per 30-minute slot")
+    pricing_tiers = models.JSONField(
+        null=True,
+        blank=True,
+        validators=[validate_pricing_tiers],
+        help_text='Occupancy price multipliers, e.g. [{"from": 0.8, "multiplier": "1.2"}]. '
+        "Empty follows the ROOM_PRICING_TIERS setting, which charges the base price "
+        "unless tiers are configured there; [] always charges the base price",
+    )
     capacity = models.IntegerField()
     amenities = models.JSONField(default=list, blank=True)
     is_available = models.BooleanField(default=True)
     slot_duration_minutes = models.IntegerField(default=30, help_text="Duration of each time slot in minutes")
     opening_time = models.TimeField(default="09:00:00", help_text="Daily opening time")
     closing_time = models.TimeField(default="18:00:00", help_text="Daily closing time")
+    timezone = models.CharField(
+        max_length=64,
+        default="UTC",
+        validators=[validate_timezone],
+        help_text="IANA timezone of the opening hours and booking times, e.g. Europe/Berlin",
+    )
+    hold_minutes = models.IntegerField(
+        default=30, help_text="Minutes a pending booking holds its slot, extended by heartbeats"
+    )
+    booking_mode = models.CharField(
+        max_length=20,
+        choices=BOOKING_MODE_CHOICES,
+        default="exclusive",
+        help_text="Exclusive rooms take one booking per time slot; shared rooms take "
+        "bookings until the capacity's seats are taken",
+    )
+    # Maintained by Postgres on every write, so search never re-parses the text
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("name", weight="A", config=ROOM_SEARCH_CONFIG)
+            + SearchVector("amenities", weight="B", config=ROOM_SEARCH_CONFIG)
+            + SearchVector("description", weight="C", config=ROOM_SEARCH_CONFIG)
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
+    @cached_property
+    def clock(self):
+        """Slot grid and timezone conversions for this room"""
+        return RoomClock.for_room(self)
+
+    @cached_property
+    def pricing(self):
+        """Compiled occupancy pricing tiers for this room"""
+        return pricing_for(self.pricing_tiers)
+
+    @property
+    def is_shared(self):
+        return self.booking_mode == "shared"
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            GinIndex(fields=["name"], opclasses=["gin_trgm_ops"], name="room_name_trgm_idx"),
+            # Admin name__icontains compiles to UPPER("name"::text) LIKE UPPER('%term%')
+            GinIndex(
+                OpClass(Upper(Cast("name", models.TextField())), name="gin_trgm_ops"),
+                name="room_name_upper_trgm_idx",
+            ),
+            GinIndex(fields=["search_vector"], name="room_search_vector_idx"),
+        ]
+
+
+class BookingGroup(models.Model):
+    """
+    Bookings of several rooms held together, e.g. a main hall with breakout rooms.
+
+    The members are created, paid with one PaymentIntent, confirmed and
+    expired together. The intent's Payment belongs to the lead member, the
+    one with the lowest id.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="booking_groups")
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Group {self.id} of {self.user_id}"
+
     class Meta:
         ordering = ["-created_at"]
 
@@ -57,21 +161,109 @@ class Booking(models.Model):
     )
     special_requests = models.TextField(blank=True, null=True)
     hold_expires_at = models.DateTimeField(null=True, blank=True)
+    # Indexed by booking_group_idx, which only covers grouped bookings
+    group = models.ForeignKey(
+        BookingGroup,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        db_index=False,
+        related_name="bookings",
+    )
+    starts_at = models.DateTimeField(help_text="Start as a UTC instant, from the room's timezone")
+    ends_at = models.DateTimeField(help_text="End as a UTC instant, from the room's timezone")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.user.username} - {self.room.name} - {self.booking_date} ({self.start_time}-{self.end_time})"
+        # Names only when the user and room are already loaded, so printing a
+        # booking never queries; ids otherwise, as for waitlist entries
+        user = self.user.username if Booking.user.is_cached(self) else self.user_id
+        room = self.room.name if Booking.room.is_cached(self) else self.room_id
+        return f"{user} - {room} - {self.booking_date} ({self.start_time}-{self.end_time})"
+
+    def save(self, *args, **kwargs):
+        if self._state.adding or self.starts_at is None:
+            self.set_instants()
+        super().save(*args, **kwargs)
+
+    def set_instants(self):
+        """Derive starts_at/ends_at from the room-local date and times"""
+        self.starts_at, self.ends_at = self.room.clock.span(
+            self.booking_date, self.start_time, self.end_time
+        )
 
     def is_hold_expired(self):
         """Check if the booking hold has expired"""
-        from django.utils import timezone
         if self.hold_expires_at and self.status == 'pending' and self.payment_status == 'pending':
             return timezone.now() > self.hold_expires_at
         return False
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "booking_date"], name="booking_status_date_idx"),
+            models.Index(fields=["room", "booking_date"], name="booking_room_date_idx"),
+            models.Index(fields=["booking_date"], name="booking_date_idx"),
+            models.Index(fields=["-created_at"], name="booking_created_idx"),
+            models.Index(fields=["updated_at"], name="booking_updated_idx"),
+            models.Index(fields=["status", "ends_at"], name="booking_status_ends_idx"),
+            models.Index(fields=["user", "starts_at", "id"], name="booking_user_starts_idx"),
+            models.Index(
+                fields=["group"],
+                condition=models.Q(group__isnull=False),
+                name="booking_group_idx",
+            ),
+        ]
+
+
+class WaitlistEntry(models.Model):
+    """Model for users waiting on a fully booked time range"""
+
+    STATUS_CHOICES = [
+        ("waiting", "Waiting"),
+        ("promoted", "Promoted"),
+        ("cancelled", "Cancelled"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="waitlist_entries")
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="waitlist_entries")
+    booking_date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    guest_count = models.IntegerField()
+    special_requests = models.TextField(blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="waiting")
+    booking = models.OneToOneField(
+        Booking,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="waitlist_entry",
+        help_text="Pending hold created when the entry was promoted",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.room_id} - {self.booking_date} ({self.start_time}-{self.end_time})"
+
+    class Meta:
+        ordering = ["created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "room", "booking_date", "start_time", "end_time"],
+                condition=models.Q(status="waiting"),
+                name="waitlist_one_waiting_entry_per_range",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["room", "booking_date", "start_time"],
+                condition=models.Q(status="waiting"),
+                name="waitlist_waiting_idx",
+            ),
+        ]
 
 
 class Payment(models.Model):
@@ -90,7 +282,321 @@ class Payment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"Payment for {self.booking.id} - {self.status}"
+        return f"Payment for {self.booking_id} - {self.status}"
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-created_at"], name="payment_created_idx"),
+        ]
+
+
+class ArchivedBooking(models.Model):
+    """Finished booking moved out of the Booking table by the archive job"""
+
+    # Keeps the id the booking had in the Booking table
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_bookings")
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="archived_bookings")
+    booking_date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    guest_count = models.IntegerField()
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    number_of_slots = models.IntegerField(default=1)
+    status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES)
+    payment_status = models.CharField(max_length=20, choices=Booking.PAYMENT_STATUS_CHOICES)
+    special_requests = models.TextField(blank=True, null=True)
+    hold_expires_at = models.DateTimeField(null=True, blank=True)
+    group = models.ForeignKey(
+        BookingGroup,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        db_index=False,
+        related_name="archived_bookings",
+    )
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.room_id} - {self.booking_date} ({self.start_time}-{self.end_time})"
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["room", "booking_date"], name="archived_booking_room_date_idx"),
+            models.Index(fields=["booking_date"], name="archived_booking_date_idx"),
+            models.Index(fields=["user", "starts_at", "id"], name="archived_booking_starts_idx"),
+        ]
+
+
+class ArchivedPayment(models.Model):
+    """Payment of an archived booking"""
+
+    id = models.BigIntegerField(primary_key=True)
+    booking = models.OneToOneField(
+        ArchivedBooking, on_delete=models.CASCADE, related_name="payment"
+    )
+    stripe_payment_intent_id = models.CharField(max_length=255, unique=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, default="usd")
+    status = models.CharField(max_length=50)
+    payment_method = models.CharField(max_length=100, blank=True, null=True)
+    metadata = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Archived payment for {self.booking_id} - {self.status}"
 
     class Meta:
         ordering = ["-created_at"]
+
+
+class PaymentIntentOutbox(models.Model):
+    """Outbox entry for a Stripe PaymentIntent, created in Stripe by the payment worker"""
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("processing", "Processing"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    ]
+
+    booking = models.ForeignKey(
+        Booking, on_delete=models.CASCADE, related_name="payment_intent_requests"
+    )
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, default="usd")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the entry is next due; for processing entries, when the worker lease ends",
+    )
+    stripe_payment_intent_id = models.CharField(max_length=255, blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"PaymentIntent request for {self.booking_id} - {self.status}"
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(status__in=["pending", "processing"]),
+                name="payment_outbox_due_idx",
+            ),
+        ]
+
+
+class BookingEvent(models.Model):
+    """
+    Append-only log of booking status and payment status changes.
+
+    Written in the same transaction as the change. Rows are never updated or
+    deleted, and outlive archived bookings, so projections can be rebuilt
+    from the log alone.
+    """
+
+    booking_id = models.BigIntegerField()
+    room_id = models.BigIntegerField()
+    booking_date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    number_of_slots = models.IntegerField()
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    old_status = models.CharField(
+        max_length=20, null=True, blank=True, help_text="Empty for a new booking"
+    )
+    new_status = models.CharField(max_length=20)
+    old_payment_status = models.CharField(max_length=20, null=True, blank=True)
+    new_payment_status = models.CharField(max_length=20, null=True, blank=True)
+    transaction_id = models.BigIntegerField(
+        db_default=models.Func(function="txid_current", output_field=models.BigIntegerField()),
+        help_text="Postgres transaction that wrote the event; orders the log for projections",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.booking_id}: {self.old_status} -> {self.new_status}"
+
+    class Meta:
+        ordering = ["transaction_id", "id"]
+        indexes = [
+            models.Index(fields=["transaction_id", "id"], name="booking_event_position_idx"),
+            models.Index(fields=["booking_id"], name="booking_event_booking_idx"),
+            models.Index(fields=["room_id", "booking_date"], name="booking_event_room_date_idx"),
+        ]
+
+
+class ProjectionCheckpoint(models.Model):
+    """Position in the booking event log up to which a projection is current"""
+
+    name = models.CharField(max_length=100, unique=True)
+    last_transaction_id = models.BigIntegerField(default=0)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_transaction_id}/{self.last_event_id}"
+
+
+class SlotOccupancy(models.Model):
+    """
+    Seats taken in one slot of a shared room, kept by the booking path.
+
+    ``start_time`` is the slot's start on the room's local grid. Rows are
+    created on first use and updated in place as bookings take and free seats.
+    """
+
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="slot_occupancy")
+    booking_date = models.DateField()
+    start_time = models.TimeField(help_text="Slot start time")
+    seats_taken = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.room_id} - {self.booking_date} {self.start_time}: {self.seats_taken}"
+
+    class Meta:
+        ordering = ["booking_date", "start_time"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["room", "booking_date", "start_time"],
+                name="slot_occupancy_room_slot_uniq",
+            ),
+            models.CheckConstraint(
+                condition=models.Q(seats_taken__gte=0),
+                name="slot_occupancy_seats_taken_gte_0",
+            ),
+        ]
+
+
+class DayOccupancy(models.Model):
+    """
+    Slots held by a room's active bookings on one day, kept by the booking path.
+
+    record_status_changes adds a booking's slots when it becomes active and
+    takes them off when it stops being active, so pricing reads the day's
+    occupancy from one row. Rows are created on first use.
+    """
+
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="day_occupancy")
+    booking_date = models.DateField()
+    slots_taken = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.room_id} - {self.booking_date}: {self.slots_taken}"
+
+    class Meta:
+        ordering = ["booking_date"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["room", "booking_date"], name="day_occupancy_room_date_uniq"
+            ),
+            models.CheckConstraint(
+                condition=models.Q(slots_taken__gte=0),
+                name="day_occupancy_slots_taken_gte_0",
+            ),
+        ]
+
+
+class RoomDailyStats(models.Model):
+    """Per room, per day booking rollup maintained incrementally on status changes"""
+
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="daily_stats")
+    date = models.DateField()
+    booked_slots = models.IntegerField(
+        default=0, help_text="Slots held by confirmed or completed bookings"
+    )
+    revenue = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text="Total amount of confirmed or completed bookings",
+    )
+    pending_count = models.IntegerField(default=0)
+    confirmed_count = models.IntegerField(default=0)
+    cancelled_count = models.IntegerField(default=0)
+    expired_count = models.IntegerField(default=0)
+    completed_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.room_id} - {self.date}"
+
+    class Meta:
+        ordering = ["date"]
+        constraints = [
+            models.UniqueConstraint(fields=["room", "date"], name="room_daily_stats_room_date_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["date"], name="room_daily_stats_date_idx"),
+        ]
+
+
+class StripeWebhookEvent(models.Model):
+    """
+    Verified Stripe webhook event of a handled type, waiting to be applied.
+
+    The webhook stores the event and answers at once; the webhook worker
+    applies pending events in batches. The unique event id makes redelivered
+    events no-ops.
+    """
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField(help_text="The event's data.object")
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.event_id} ({self.event_type})"
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(
+                fields=["id"],
+                condition=models.Q(processed_at__isnull=True),
+                name="stripe_event_pending_idx",
+            ),
+        ]
+
+
+class BookingDetail(models.Model):
+    """
+    Denormalized booking with its user, room and payment, as the API returns it.
+
+    Refreshed in the transaction of every booking or payment write, so
+    reading a booking is a primary key lookup. Archived bookings keep their
+    row, pointing at the archive instead.
+    """
+
+    # The booking's id, kept when the booking is archived
+    id = models.BigIntegerField(primary_key=True)
+    booking = models.OneToOneField(
+        Booking, null=True, blank=True, on_delete=models.CASCADE, related_name="detail"
+    )
+    archived_booking = models.OneToOneField(
+        ArchivedBooking, null=True, blank=True, on_delete=models.CASCADE, related_name="detail"
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="booking_details")
+    data = models.JSONField(
+        encoder=JSONEncoder, help_text="Booking fields, user and room names and payment"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Detail of booking {self.id}"
+
+    @property
+    def archived(self):
+        return self.archived_booking_id is not None
@@ -0,0 +1,249 @@
+"""
+Transactional outbox for Stripe PaymentIntent creation
+
+Views record a PaymentIntentOutbox row in the same transaction as the booking
+update. Workers claim due rows, create the intent in Stripe with an
+idempotency key and store the resulting Payment, retrying transient Stripe
+failures with exponential backoff.
+
+A claim is a lease that ends at the entry's ``next_attempt_at``. Results are
+only written while the entry still carries the lease it was delivered under;
+a worker whose lease was taken over leaves the entry to the new holder, and
+one whose entry was failed meanwhile (its hold expired) cancels the intent
+it just created.
+"""
+import logging
+import random
+from datetime import timedelta
+
+import stripe
+from django.db import transaction
+from django.utils import timezone
+
+from . import tracing
+from .booking_details import refresh_booking_details
+from .holds import hold_deadline
+from .models import Booking, Payment, PaymentIntentOutbox
+from .payments import get_payment_gateway
+from .services import group_filter, record_status_changes, status_change_for
+
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BASE_BACKOFF_SECONDS = 2
+MAX_BACKOFF_SECONDS = 300
+
+# How long a claimed entry stays with one worker before others may retry it
+LEASE_SECONDS = 60
+
+# Stripe errors worth retrying; anything else fails the request immediately
+RETRYABLE_ERRORS = (
+    stripe.error.APIConnectionError,
+    stripe.error.RateLimitError,
+    stripe.error.APIError,
+)
+
+
+def enqueue_payment_intent(booking, amount, currency, members=None):
+    """
+    Record a PaymentIntent request for ``booking``.
+
+    Must run inside the transaction that holds the booking row lock. An
+    unfinished request for the booking is reused instead of creating a
+    second intent. For a group, ``booking`` is the lead and ``members`` are
+    all the group's bookings, locked; they all move to processing.
+    """
+    entry = (
+        PaymentIntentOutbox.objects.filter(
+            booking=booking, status__in=["pending", "processing"]
+        )
+        .order_by("-created_at")
+        .first()
+    )
+    if entry is None:
+        entry = PaymentIntentOutbox.objects.create(
+            booking=booking, amount=amount, currency=currency
+        )
+
+    changes = []
+    for member in members or [booking]:
+        old_payment_status = member.payment_status
+        member.payment_status = "processing"
+        update_fields = ["payment_status", "updated_at"]
+        if member.hold_expires_at is None:
+            # Every hold with a payment under way must be able to expire
+            member.hold_expires_at = hold_deadline(member.room)
+            update_fields.append("hold_expires_at")
+        member.save(update_fields=update_fields)
+        changes.append(status_change_for(member, member.status, old_payment_status))
+    record_status_changes(changes)
+    return entry
+
+
+def create_leased_entry(booking, currency, amount=None):
+    """
+    Record a PaymentIntent request for a booking created in this transaction.
+
+    The entry starts out claimed by the caller, which delivers it right after
+    commit; workers only pick it up if that attempt never finishes. The
+    booking must be saved with payment_status "processing". ``amount``
+    defaults to the booking total; a group's lead books the group total.
+    """
+    return PaymentIntentOutbox.objects.create(
+        booking=booking,
+        amount=booking.total_amount if amount is None else amount,
+        currency=currency,
+        status="processing",
+        next_attempt_at=timezone.now() + timedelta(seconds=LEASE_SECONDS),
+    )
+
+
+def claim_due_entries(limit):
+    """Lease up to ``limit`` due entries to the calling worker"""
+    now = timezone.now()
+    with transaction.atomic():
+        entries = list(
+            PaymentIntentOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status__in=["pending", "processing"], next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:limit]
+        )
+        if entries:
+            PaymentIntentOutbox.objects.filter(id__in=[entry.id for entry in entries]).update(
+                status="processing",
+                next_attempt_at=now + timedelta(seconds=LEASE_SECONDS),
+                updated_at=now,
+            )
+    return [entry.id for entry in entries]
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with jitter for the given number of failed attempts"""
+    delay = min(BASE_BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def process_entry(entry_id, gateway=None):
+    """Load one claimed outbox entry and deliver it to Stripe"""
+    entry = PaymentIntentOutbox.objects.select_related("booking__room").get(id=entry_id)
+    return deliver_entry(entry, gateway)
+
+
+def _lock_lease(entry):
+    """
+    Lock ``entry`` and check it still carries the lease it was delivered under.
+
+    Returns the locked row, or None when the entry was claimed again after
+    the lease ran out, or settled meanwhile.
+    """
+    locked = PaymentIntentOutbox.objects.select_for_update().get(id=entry.id)
+    if locked.status != "processing" or locked.next_attempt_at != entry.next_attempt_at:
+        return None
+    return locked
+
+
+def deliver_entry(entry, gateway=None):
+    """
+    Create the PaymentIntent for a claimed outbox entry.
+
+    Uses ``entry.booking`` and its room as already loaded, so callers holding
+    them in memory pay no extra queries. The idempotency key is derived from
+    the entry id, so a retry after a crash returns the intent Stripe already
+    created instead of an orphan. The result is only written while the
+    entry still carries this claim's lease. Returns the entry after
+    processing, reloaded if the lease was lost.
+    """
+    gateway = gateway or get_payment_gateway()
+    if entry.status != "processing":
+        return entry
+
+    booking = entry.booking
+    attempts = entry.attempts + 1
+
+    try:
+        with tracing.span("stripe.create_payment_intent", booking_id=booking.id, attempt=attempts):
+            payment_intent = gateway.create_payment_intent(
+                amount_cents=int(entry.amount * 100),
+                currency=entry.currency,
+                metadata={
+                    "booking_id": booking.id,
+                    "user_id": booking.user_id,
+                    "room_name": booking.room.name,
+                    **({"group_id": booking.group_id} if booking.group_id else {}),
+                },
+                idempotency_key=f"payment-intent-outbox-{entry.id}",
+            )
+    except stripe.error.StripeError as e:
+        retry = isinstance(e, RETRYABLE_ERRORS) and attempts < MAX_ATTEMPTS
+        logger.warning(
+            "PaymentIntent request %s failed (attempt %s): %s", entry.id, attempts, e
+        )
+        with transaction.atomic():
+            if _lock_lease(entry) is None:
+                entry.refresh_from_db()
+                return entry
+            entry.attempts = attempts
+            entry.last_error = str(e)
+            if retry:
+                entry.status = "pending"
+                entry.next_attempt_at = timezone.now() + timedelta(
+                    seconds=backoff_delay(attempts)
+                )
+            else:
+                entry.status = "failed"
+                # A group's payment fails for all its members
+                failed = list(
+                    Booking.objects.select_for_update()
+                    .filter(group_filter(booking), payment_status="processing")
+                    .order_by("id")
+                )
+                if failed:
+                    Booking.objects.filter(id__in=[member.id for member in failed]).update(
+                        payment_status="failed", updated_at=timezone.now()
+                    )
+                    for member in failed:
+                        member.payment_status = "failed"
+                        if member.id == booking.id:
+                            booking.payment_status = "failed"
+                    record_status_changes(
+                        [status_change_for(member, member.status, "processing") for member in failed]
+                    )
+            entry.save()
+        return entry
+
+    with transaction.atomic():
+        if _lock_lease(entry) is None:
+            entry.refresh_from_db()
+            if entry.status == "failed":
+                # Failed while Stripe was called, e.g. its hold expired: the
+                # intent must not stay payable
+                _cancel_orphan(gateway, payment_intent["id"])
+            return entry
+
+        payment, _ = Payment.objects.update_or_create(
+            booking=booking,
+            defaults={
+                "stripe_payment_intent_id": payment_intent["id"],
+                "amount": entry.amount,
+                "currency": entry.currency,
+                "status": payment_intent["status"],
+                "metadata": {"client_secret": payment_intent["client_secret"]},
+            },
+        )
+        entry.attempts = attempts
+        entry.status = "succeeded"
+        entry.stripe_payment_intent_id = payment_intent["id"]
+        entry.last_error = None
+        entry.save()
+        refresh_booking_details([booking.id])
+
+    # Cache the payment on the in-memory booking for callers building responses
+    booking.payment = payment
+    return entry
+
+
+def _cancel_orphan(gateway, intent_id):
+    try:
+        gateway.cancel_payment_intent(intent_id)
+    except stripe.error.StripeError as e:
+        logger.error("Cancelling orphaned PaymentIntent %s failed: %s", intent_id, e)
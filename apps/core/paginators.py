@@ -0,0 +1,75 @@
+"""
+Pagination helpers for large tables
+"""
+import base64
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+# Below this many rows an exact COUNT(*) is cheap enough to keep
+ESTIMATED_COUNT_THRESHOLD = 100_000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses Postgres planner statistics instead of COUNT(*)
+    when paging an unfiltered, very large table.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+
+        if connection.vendor == "postgresql" and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= ESTIMATED_COUNT_THRESHOLD:
+                return row[0]
+
+        return super().count
+
+
+def encode_cursor(values):
+    """Opaque cursor for the sort key of the last row on a page"""
+    payload = json.dumps(
+        [value.isoformat() if hasattr(value, "isoformat") else value for value in values]
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; values come back as JSON scalars"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def keyset_after(fields, values, descending=False):
+    """
+    Filter for rows sorting strictly after ``values`` on ``fields``.
+
+    Expands the row comparison (a, b, c) > (x, y, z) into OR-ed equality
+    prefixes, plus a bound on the first field so Postgres can start the index
+    scan at the cursor instead of filtering from the beginning.
+    """
+    op = "lt" if descending else "gt"
+    bound = "lte" if descending else "gte"
+
+    condition = Q()
+    for position, field in enumerate(fields):
+        prefix = {fields[i]: values[i] for i in range(position)}
+        condition |= Q(**prefix, **{f"{field}__{op}": values[position]})
+    return Q(**{f"{fields[0]}__{bound}": values[0]}) & condition
@@ -0,0 +1,114 @@
+"""
+Payment gateway used to create and cancel Stripe PaymentIntents
+
+The gateway class is selected with settings.PAYMENT_GATEWAY so tests and
+local development can swap Stripe for FakeStripeGateway.
+"""
+import itertools
+import threading
+import uuid
+
+import stripe
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class StripeGateway:
+    """Creates PaymentIntents through the Stripe API"""
+
+    def __init__(self):
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+
+    def create_payment_intent(self, amount_cents, currency, metadata, idempotency_key):
+        payment_intent = stripe.PaymentIntent.create(
+            amount=amount_cents,
+            currency=currency,
+            metadata=metadata,
+            automatic_payment_methods={
+                "enabled": True,
+            },
+            idempotency_key=idempotency_key,
+        )
+        return {
+            "id": payment_intent.id,
+            "client_secret": payment_intent.client_secret,
+            "status": payment_intent.status,
+        }
+
+    def cancel_payment_intent(self, intent_id):
+        """
+        Cancel an intent so it can no longer be paid; returns its status.
+
+        An intent that is already canceled counts as cancelled. Raises
+        stripe.error.InvalidRequestError for an intent that is paid or being
+        paid, and other Stripe errors when Stripe cannot be reached.
+        """
+        try:
+            return stripe.PaymentIntent.cancel(intent_id).status
+        except stripe.error.InvalidRequestError:
+            if stripe.PaymentIntent.retrieve(intent_id).status == "canceled":
+                return "canceled"
+            raise
+
+
+class FakeStripeGateway:
+    """
+    In-memory stand-in for Stripe.
+
+    Replays the stored intent for a repeated idempotency key like Stripe does.
+    Set ``failures`` to make the next N calls raise a connection error, and
+    an intent's "status" to "processing" or "succeeded" to refuse its
+    cancellation like Stripe does.
+    """
+
+    failures = 0
+    intents = {}
+    _lock = threading.Lock()
+    _ids = itertools.count(1)
+
+    def create_payment_intent(self, amount_cents, currency, metadata, idempotency_key):
+        with self._lock:
+            if FakeStripeGateway.failures > 0:
+                FakeStripeGateway.failures -= 1
+                raise stripe.error.APIConnectionError("Simulated Stripe outage")
+
+            if idempotency_key not in self.intents:
+                intent_id = f"pi_fake_{next(self._ids)}"
+                self.intents[idempotency_key] = {
+                    "id": intent_id,
+                    "client_secret": f"{intent_id}_secret_{uuid.uuid4().hex[:16]}",
+                    "status": "requires_payment_method",
+                    "amount": amount_cents,
+                    "currency": currency,
+                    "metadata": metadata,
+                }
+            intent = self.intents[idempotency_key]
+
+        return {
+            "id": intent["id"],
+            "client_secret": intent["client_secret"],
+            "status": intent["status"],
+        }
+
+    def cancel_payment_intent(self, intent_id):
+        with self._lock:
+            if FakeStripeGateway.failures > 0:
+                FakeStripeGateway.failures -= 1
+                raise stripe.error.APIConnectionError("Simulated Stripe outage")
+
+            intent = next(
+                (intent for intent in self.intents.values() if intent["id"] == intent_id), None
+            )
+            if intent is None:
+                raise stripe.error.InvalidRequestError(f"No such payment_intent: {intent_id}", "intent")
+            if intent["status"] in ("processing", "succeeded"):
+                raise stripe.error.InvalidRequestError(
+                    f"You cannot cancel this PaymentIntent because it has a status of {intent['status']}",
+                    "intent",
+                )
+            intent["status"] = "canceled"
+            return intent["status"]
+
+
+def get_payment_gateway():
+    return import_string(settings.PAYMENT_GATEWAY)()
@@ -0,0 +1,82 @@
+"""
+Occupancy pricing: the price per slot follows how full a room's day is
+
+Pricing tiers map the share of a room's day already booked to a multiplier
+on its price per slot, e.g. a discount on quiet days and a surcharge near
+full occupancy:
+
+    [{"from": 0, "multiplier": "0.90"}, {"from": 0.3, "multiplier": "1"},
+     {"from": 0.8, "multiplier": "1.20"}]
+
+A tier applies from its "from" occupancy up to the next tier's. Below the
+first tier the base price applies. Each distinct set of tiers is compiled
+once and cached for the life of the process, so pricing a quote is a bisect
+and a multiplication.
+"""
+import json
+from bisect import bisect_right
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+
+CENT = Decimal("0.01")
+
+
+class PricingTiers:
+    """Step function from occupancy (0 to 1) to a price multiplier"""
+
+    def __init__(self, tiers):
+        tiers = sorted(
+            (float(tier["from"]), Decimal(str(tier["multiplier"]))) for tier in tiers
+        )
+        self.starts = [start for start, _ in tiers]
+        self.multipliers = [multiplier for _, multiplier in tiers]
+
+    def multiplier(self, occupancy):
+        index = bisect_right(self.starts, occupancy) - 1
+        return self.multipliers[index] if index >= 0 else Decimal(1)
+
+    def price_per_slot(self, base_price, occupancy):
+        """``base_price`` adjusted for ``occupancy``, rounded to the cent"""
+        return (Decimal(base_price) * self.multiplier(occupancy)).quantize(
+            CENT, rounding=ROUND_HALF_UP
+        )
+
+
+def validate_pricing_tiers(value):
+    if value is None:
+        return
+    if not isinstance(value, list):
+        raise ValidationError("Pricing tiers must be a list")
+
+    starts = set()
+    for tier in value:
+        if not isinstance(tier, dict) or set(tier) != {"from", "multiplier"}:
+            raise ValidationError('Each pricing tier needs exactly "from" and "multiplier"')
+        try:
+            start = float(tier["from"])
+            multiplier = Decimal(str(tier["multiplier"]))
+        except (TypeError, ValueError, InvalidOperation):
+            raise ValidationError(f"Invalid pricing tier: {tier}")
+        if not 0 <= start < 1:
+            raise ValidationError('A tier\'s "from" occupancy must be at least 0 and below 1')
+        if not multiplier > 0:
+            raise ValidationError("A tier's multiplier must be positive")
+        if start in starts:
+            raise ValidationError(f"More than one pricing tier starts at {start}")
+        starts.add(start)
+
+
+@lru_cache(maxsize=1024)
+def _compile(tiers_json):
+    return PricingTiers(json.loads(tiers_json))
+
+
+def pricing_for(tiers):
+    """Compiled pricing tiers; None means settings.ROOM_PRICING_TIERS"""
+    if tiers is None:
+        tiers = settings.ROOM_PRICING_TIERS
+    return _compile(json.dumps(tiers, sort_keys=True))
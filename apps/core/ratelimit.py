@@ -0,0 +1,216 @@
+"""
+Token-bucket rate limiting and per-room admission control for API views
+"""
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """Parse "30/m" into (capacity, tokens refilled per second)"""
+    count, period = rate.split("/")
+    return int(count), int(count) / PERIODS[period[0]]
+
+
+def _refill(tokens, updated_at, now, capacity, refill_rate):
+    return min(capacity, tokens + (now - updated_at) * refill_rate)
+
+
+class InMemoryBackend:
+    """
+    Token buckets held in this process.
+
+    Limits apply per worker process; use CacheBackend to share them.
+    Buckets are kept in least recently used order, and beyond max_buckets
+    the longest idle one is dropped on each call, so a call costs O(1)
+    however many clients are tracked. A dropped bucket starts full again
+    if its client comes back.
+    """
+
+    # Buckets kept before the least recently used ones are dropped
+    max_buckets = 10_000
+
+    def __init__(self):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, refill_rate):
+        """Take one token; return (allowed, seconds until a token is available)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = _refill(tokens, updated_at, now, capacity, refill_rate)
+
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                allowed, retry_after = True, 0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (1 - tokens) / refill_rate
+
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+
+        return allowed, retry_after
+
+
+class CacheBackend:
+    """
+    Token buckets stored in a Django cache so limits are shared across
+    processes and hosts. Point RATELIMIT_CACHE at Redis or Memcached.
+
+    Updates are read-modify-write, so a few concurrent requests may slip past
+    the limit; the limit is approximate rather than exact.
+    """
+
+    def __init__(self):
+        self.cache = caches[settings.RATELIMIT_CACHE]
+
+    def consume(self, key, capacity, refill_rate):
+        now = time.time()
+        tokens, updated_at = self.cache.get(key, (capacity, now))
+        tokens = _refill(tokens, updated_at, now, capacity, refill_rate)
+
+        if tokens >= 1:
+            allowed, retry_after, tokens = True, 0, tokens - 1
+        else:
+            allowed, retry_after = False, (1 - tokens) / refill_rate
+
+        # Expire once the bucket would have refilled anyway
+        self.cache.set(key, (tokens, now), timeout=math.ceil(capacity / refill_rate))
+        return allowed, retry_after
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = import_string(settings.RATELIMIT_BACKEND)()
+    return _backend
+
+
+def client_ip(request):
+    value = request.META.get(settings.RATELIMIT_IP_HEADER) or request.META.get(
+        "REMOTE_ADDR", ""
+    )
+    # Forwarded headers list the original client first
+    return value.split(",")[0].strip()
+
+
+def _room_id(request):
+    # Views behind @validate_body have the body validated already; reading
+    # request.data would parse it a second time
+    validated = getattr(request, "validated", None)
+    if validated is not None:
+        return getattr(validated, "room_id", None)
+    data = request.data
+    return data.get("room_id") if hasattr(data, "get") else None
+
+
+def _identity(request, key):
+    if key == "ip":
+        return client_ip(request)
+    if key == "user":
+        user = request.user
+        return f"user:{user.id}" if user.is_authenticated else f"ip:{client_ip(request)}"
+    if key == "room":
+        return str(_room_id(request))
+    raise ValueError(f"Unknown rate limit key: {key}")
+
+
+def _too_many_requests(error, retry_after):
+    return Response(
+        {"error": error},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def rate_limit(scope, key="ip"):
+    """
+    Limit a DRF function view with a token bucket per ``key``.
+
+    ``key`` is "ip", "user" or "room" (the room_id in the request body). The
+    rate for ``scope`` comes from settings.RATELIMIT_RATES, e.g. "30/m".
+    Apply below @api_view so the request is already a DRF request.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if settings.RATELIMIT_ENABLED:
+                capacity, refill_rate = parse_rate(settings.RATELIMIT_RATES[scope])
+                allowed, retry_after = get_backend().consume(
+                    f"ratelimit:{scope}:{_identity(request, key)}", capacity, refill_rate
+                )
+                if not allowed:
+                    return _too_many_requests("Too many requests", retry_after)
+            return view(request, *args, **kwargs)
+
+        return wrapped
+
+    return decorator
+
+
+class RoomAdmission:
+    """
+    Caps concurrent booking attempts per room in this process.
+
+    Attempts beyond the cap are shed immediately instead of queueing on the
+    room's row lock and tying up worker threads.
+    """
+
+    def __init__(self):
+        self._active = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def try_acquire(self, room_id, limit):
+        with self._lock:
+            if self._active[room_id] >= limit:
+                return False
+            self._active[room_id] += 1
+            return True
+
+    def release(self, room_id):
+        with self._lock:
+            self._active[room_id] -= 1
+            if self._active[room_id] <= 0:
+                del self._active[room_id]
+
+
+room_admission = RoomAdmission()
+
+
+def limit_room_concurrency(view):
+    """Shed booking attempts with 429 once a room has too many in flight"""
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        room_id = _room_id(request)
+        if not settings.RATELIMIT_ENABLED or room_id is None:
+            return view(request, *args, **kwargs)
+
+        room_id = str(room_id)
+        if not room_admission.try_acquire(room_id, settings.BOOKING_MAX_CONCURRENT_PER_ROOM):
+            return _too_many_requests("Room is busy, please retry shortly", 1)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            room_admission.release(room_id)
+
+    return wrapped
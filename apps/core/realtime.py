@@ -0,0 +1,196 @@
+"""
+Availability change fan-out for Server-Sent Events streams
+
+Each process runs at most one pub/sub listener. The Broadcaster hands every
+message from that listener to the asyncio queues of the SSE clients watching
+the same room and date, so pushing a change costs no per-client queries.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+# Postgres NOTIFY channel carrying availability changes between processes
+AVAILABILITY_CHANNEL = "booking_availability"
+
+# Messages buffered per client before it is told to resync
+CLIENT_QUEUE_SIZE = 100
+
+# Messages packed into one NOTIFY, keeping payloads under Postgres' 8000 bytes
+NOTIFY_BATCH_SIZE = 25
+
+
+def stream_key(room_id, booking_date):
+    return f"{room_id}:{booking_date.isoformat()}"
+
+
+class InProcessPubSub:
+    """
+    Pub/sub stand-in that delivers messages within the current process.
+
+    Suitable for tests and a single-process development server.
+    """
+
+    def __init__(self):
+        self._deliver = None
+
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, messages):
+        # Deliver only once the booking change is committed
+        def deliver():
+            for message in messages:
+                self._deliver(message)
+
+        if self._deliver:
+            transaction.on_commit(deliver)
+
+
+class PostgresPubSub:
+    """
+    Pub/sub over Postgres LISTEN/NOTIFY.
+
+    NOTIFY is transactional, so messages published inside the booking
+    transaction are only delivered if it commits. The listener uses one
+    dedicated connection and thread per process.
+    """
+
+    poll_timeout = 5
+    reconnect_delay = 1
+
+    def __init__(self, channel=AVAILABILITY_CHANNEL):
+        self.channel = channel
+        self._deliver = None
+
+    def start(self, deliver):
+        self._deliver = deliver
+        thread = threading.Thread(
+            target=self._listen, name="availability-listener", daemon=True
+        )
+        thread.start()
+
+    def publish(self, messages):
+        with connection.cursor() as cursor:
+            for offset in range(0, len(messages), NOTIFY_BATCH_SIZE):
+                cursor.execute(
+                    "SELECT pg_notify(%s, %s)",
+                    [
+                        self.channel,
+                        json.dumps(messages[offset : offset + NOTIFY_BATCH_SIZE]),
+                    ],
+                )
+
+    def _listen(self):
+        while True:
+            try:
+                wrapper = connections.create_connection("default")
+                raw = wrapper.get_new_connection(wrapper.get_connection_params())
+                raw.autocommit = True
+                with raw.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+
+                while True:
+                    if select.select([raw], [], [], self.poll_timeout) == ([], [], []):
+                        continue
+                    raw.poll()
+                    while raw.notifies:
+                        notify = raw.notifies.pop(0)
+                        for message in json.loads(notify.payload):
+                            self._deliver(message)
+            except Exception:
+                logger.exception("Availability listener failed, reconnecting")
+                time.sleep(self.reconnect_delay)
+
+
+class Broadcaster:
+    """Fans pub/sub messages out to the SSE clients of this process"""
+
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._started = False
+
+    def publish(self, messages):
+        if messages:
+            self.pubsub.publish(messages)
+
+    def subscribe(self, key):
+        """Register the calling event loop for messages on ``key``"""
+        with self._lock:
+            if not self._started:
+                self.pubsub.start(self.dispatch)
+                self._started = True
+
+            queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+            self._subscribers[key].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, key, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(key, set())
+            subscribers.difference_update(
+                {subscriber for subscriber in subscribers if subscriber[1] is queue}
+            )
+            if not subscribers:
+                self._subscribers.pop(key, None)
+
+    def dispatch(self, message):
+        """Deliver a message to every subscriber; safe to call from any thread"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(message["key"], ()))
+
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(_offer, queue, message)
+
+
+def _offer(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # Slow client: drop its backlog and ask it to reload availability
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({"type": "resync", "key": message["key"]})
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster():
+    global _broadcaster
+    with _broadcaster_lock:
+        if _broadcaster is None:
+            pubsub_class = import_string(settings.AVAILABILITY_PUBSUB_BACKEND)
+            _broadcaster = Broadcaster(pubsub_class())
+    return _broadcaster
+
+
+def publish_availability_changes(changes):
+    """Publish one slot message per booking status change, without booking ids"""
+    get_broadcaster().publish(
+        [
+            {
+                "type": "slot",
+                "key": stream_key(change.room_id, change.booking_date),
+                "room_id": change.room_id,
+                "booking_date": change.booking_date.isoformat(),
+                "start_time": change.start_time.isoformat(),
+                "end_time": change.end_time.isoformat(),
+                "status": change.new_status,
+            }
+            for change in changes
+        ]
+    )
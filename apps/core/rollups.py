@@ -0,0 +1,200 @@
+"""
+Per room, per day booking rollups, maintained from the booking event log
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import F, Sum
+
+from .events import Projection
+from .models import Room, RoomDailyStats
+
+
+# Statuses whose slots and amount count as booked occupancy and revenue
+REALIZED_STATUSES = ("confirmed", "completed")
+
+STATUS_COUNT_FIELDS = {
+    "pending": "pending_count",
+    "confirmed": "confirmed_count",
+    "cancelled": "cancelled_count",
+    "expired": "expired_count",
+    "completed": "completed_count",
+}
+
+ROLLUP_FIELDS = ["booked_slots", "revenue", *STATUS_COUNT_FIELDS.values()]
+
+# Rollup rows inserted per query when rebuilding
+REBUILD_BATCH_SIZE = 500
+
+
+def status_delta(old_status, new_status, number_of_slots, total_amount):
+    """Return the rollup column increments for one booking changing status"""
+    delta = defaultdict(int)
+
+    if old_status:
+        delta[STATUS_COUNT_FIELDS[old_status]] -= 1
+        if old_status in REALIZED_STATUSES:
+            delta["booked_slots"] -= number_of_slots
+            delta["revenue"] -= total_amount
+
+    if new_status:
+        delta[STATUS_COUNT_FIELDS[new_status]] += 1
+        if new_status in REALIZED_STATUSES:
+            delta["booked_slots"] += number_of_slots
+            delta["revenue"] += total_amount
+
+    return {field: value for field, value in delta.items() if value}
+
+
+def _merge_deltas(changes):
+    """Sum the rollup increments of many status changes per (room, date)"""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for change in changes:
+        if change.old_status == change.new_status:
+            continue
+        delta = status_delta(
+            change.old_status,
+            change.new_status,
+            change.number_of_slots,
+            change.total_amount,
+        )
+        for field, value in delta.items():
+            deltas[(change.room_id, change.booking_date)][field] += value
+
+    return {
+        key: {field: value for field, value in delta.items() if value}
+        for key, delta in deltas.items()
+    }
+
+
+def apply_status_changes(changes):
+    """
+    Fold booking status changes (StatusChange tuples or BookingEvents) into
+    RoomDailyStats.
+
+    Changes are merged per (room, date) first, so a batch touching many
+    bookings on the same day issues one UPDATE for that day.
+    """
+    for (room_id, day), delta in _merge_deltas(changes).items():
+        if not delta:
+            continue
+
+        increments = {field: F(field) + value for field, value in delta.items()}
+        stats = RoomDailyStats.objects.filter(room_id=room_id, date=day)
+        if not stats.update(**increments):
+            # First change for this day: create the row, tolerating a
+            # concurrent insert, then apply the increment
+            RoomDailyStats.objects.bulk_create(
+                [RoomDailyStats(room_id=room_id, date=day)], ignore_conflicts=True
+            )
+            stats.update(**increments)
+
+
+class RoomDailyStatsProjection(Projection):
+    """RoomDailyStats as a projection of the booking event log"""
+
+    name = "room_daily_stats"
+
+    def apply(self, events):
+        # Rooms deleted since the events were written have no rollups left
+        room_ids = set(
+            Room.objects.filter(id__in={event.room_id for event in events}).values_list(
+                "id", flat=True
+            )
+        )
+        apply_status_changes(event for event in events if event.room_id in room_ids)
+
+    def reset(self):
+        RoomDailyStats.objects.all().delete()
+
+    def rebuild(self, events):
+        # Fold the whole log in memory and write each room/day once
+        deltas = _merge_deltas(events)
+        room_ids = set(Room.objects.values_list("id", flat=True))
+        deltas = {key: delta for key, delta in deltas.items() if key[0] in room_ids}
+        self.reset()
+        RoomDailyStats.objects.bulk_create(
+            [
+                RoomDailyStats(room_id=room_id, date=day, **delta)
+                for (room_id, day), delta in deltas.items()
+            ],
+            batch_size=REBUILD_BATCH_SIZE,
+        )
+
+
+def slots_per_day(room):
+    """Number of bookable slots between a room's opening and closing time"""
+    open_minutes = room.opening_time.hour * 60 + room.opening_time.minute
+    close_minutes = room.closing_time.hour * 60 + room.closing_time.minute
+    return max(close_minutes - open_minutes, 0) // room.slot_duration_minutes
+
+
+def _rate(numerator, denominator):
+    return round(numerator / denominator, 4) if denominator else 0.0
+
+
+def utilization_summary(date_from, date_to, room_id=None):
+    """Occupancy, revenue and outcome rates per room over a date range"""
+    rooms = Room.objects.order_by("id").only(
+        "id", "name", "opening_time", "closing_time", "slot_duration_minutes"
+    )
+    stats = RoomDailyStats.objects.filter(date__range=(date_from, date_to))
+    if room_id:
+        rooms = rooms.filter(id=room_id)
+        stats = stats.filter(room_id=room_id)
+
+    totals = {
+        row["room_id"]: row
+        for row in stats.order_by()
+        .values("room_id")
+        .annotate(**{field: Sum(field) for field in ROLLUP_FIELDS})
+    }
+
+    days = (date_to - date_from).days + 1
+    summary = []
+    for room in rooms:
+        total = totals.get(room.id, {})
+        counts = {
+            field: total.get(field) or 0 for field in STATUS_COUNT_FIELDS.values()
+        }
+        booked_slots = total.get("booked_slots") or 0
+        bookings = sum(counts.values())
+
+        summary.append(
+            {
+                "room_id": room.id,
+                "room_name": room.name,
+                "booked_slots": booked_slots,
+                "available_slots": slots_per_day(room) * days,
+                "occupancy_rate": _rate(booked_slots, slots_per_day(room) * days),
+                "revenue": total.get("revenue") or Decimal("0"),
+                "bookings": bookings,
+                "expiry_rate": _rate(counts["expired_count"], bookings),
+                "cancellation_rate": _rate(counts["cancelled_count"], bookings),
+                **counts,
+            }
+        )
+
+    return summary
+
+
+def daily_stats(date_from, date_to, room_id=None):
+    """Per room, per day rollup rows with occupancy over a date range"""
+    stats = (
+        RoomDailyStats.objects.filter(date__range=(date_from, date_to))
+        .select_related("room")
+        .order_by("date", "room_id")
+    )
+    if room_id:
+        stats = stats.filter(room_id=room_id)
+
+    return [
+        {
+            "room_id": row.room_id,
+            "room_name": row.room.name,
+            "date": row.date,
+            "occupancy_rate": _rate(row.booked_slots, slots_per_day(row.room)),
+            **{field: getattr(row, field) for field in ROLLUP_FIELDS},
+        }
+        for row in stats
+    ]
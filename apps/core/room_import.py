@@ -0,0 +1,176 @@
+"""
+Bulk room import from CSV or JSON Lines, upserted by room code
+
+Rows are read from a stream one at a time, validated with RoomImportSchema
+and written in chunks with INSERT ... ON CONFLICT (code) DO UPDATE, so a
+file of any size is imported in a single pass without holding it in memory.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+from pydantic import ValidationError
+
+from .booking_details import refresh_room_booking_details
+from .models import Room
+from .schemas import RoomImportSchema
+from .services import rebuild_seat_counters
+
+
+IMPORT_FORMATS = ("csv", "jsonl")
+
+# Room columns written by an import; rows always replace all of them
+IMPORT_FIELDS = [
+    "name",
+    "description",
+    "price_per_slot",
+    "capacity",
+    "amenities",
+    "is_available",
+    "slot_duration_minutes",
+    "opening_time",
+    "closing_time",
+    "timezone",
+    "booking_mode",
+    "hold_minutes",
+]
+
+# Columns that decide which seat counters a shared room's bookings occupy
+SEAT_GRID_FIELDS = ["booking_mode", "opening_time", "slot_duration_minutes"]
+
+# Row errors kept in the report; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+
+class RoomImportError(Exception):
+    """Raised when an import has invalid rows and was rolled back"""
+
+    def __init__(self, report):
+        super().__init__(f"{report['failed']} invalid rows, nothing imported")
+        self.report = report
+
+
+def read_rows(lines, fmt):
+    """
+    Yield (row number, dict) from an iterable of text lines.
+
+    CSV rows are numbered from 1 after the header. Empty and missing CSV
+    cells are dropped so the field defaults apply.
+    """
+    if fmt == "csv":
+        for number, row in enumerate(csv.DictReader(lines), start=1):
+            yield number, {
+                key: value for key, value in row.items() if key and value not in ("", None)
+            }
+    elif fmt == "jsonl":
+        number = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = e
+            yield number, row
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def _validate(number, row):
+    """Return (Room, None) for a valid row, or (None, error) for an invalid one"""
+    if isinstance(row, ValueError):
+        return None, {"row": number, "errors": [{"msg": f"Invalid JSON: {row}"}]}
+    if not isinstance(row, dict):
+        return None, {"row": number, "errors": [{"msg": "Row must be a JSON object"}]}
+    try:
+        data = RoomImportSchema(**row)
+    except ValidationError as e:
+        return None, {"row": number, "errors": e.errors(include_context=False)}
+    return Room(code=data.code, **{field: getattr(data, field) for field in IMPORT_FIELDS}), None
+
+
+def _upsert(rooms):
+    """
+    Insert or update one chunk of rooms by code.
+
+    Returns (created, updated, ids of rooms whose slot grid changed, ids of
+    renamed rooms).
+    """
+    # A code repeated within the chunk would hit its own row twice; last one wins
+    rooms = list({room.code: room for room in rooms}.values())
+    existing = {
+        row["code"]: row
+        for row in Room.objects.filter(code__in=[room.code for room in rooms]).values(
+            "id", "code", "name", *SEAT_GRID_FIELDS
+        )
+    }
+
+    # updated_at is in the update list so calendar validators see the change
+    Room.objects.bulk_create(
+        rooms,
+        update_conflicts=True,
+        unique_fields=["code"],
+        update_fields=[*IMPORT_FIELDS, "updated_at"],
+    )
+
+    regridded = [
+        existing[room.code]["id"]
+        for room in rooms
+        if room.code in existing
+        and any(getattr(room, field) != existing[room.code][field] for field in SEAT_GRID_FIELDS)
+    ]
+    renamed = [
+        existing[room.code]["id"]
+        for room in rooms
+        if room.code in existing and room.name != existing[room.code]["name"]
+    ]
+    return len(rooms) - len(existing), len(existing), regridded, renamed
+
+
+def import_rooms(rows, chunk_size=500, partial=False):
+    """
+    Validate and upsert rooms from (row number, dict) pairs.
+
+    The whole import is one transaction. Once a row is invalid, the rest of
+    the input is only validated for the report and the import is rolled back
+    with RoomImportError, unless ``partial`` is set, in which case the valid
+    rows are kept. Rooms whose slot grid or booking mode changed have their
+    seat counters recounted once, at the end, as are the booking details of
+    renamed rooms. Returns the report.
+    """
+    report = {"created": 0, "updated": 0, "failed": 0, "errors": []}
+    regridded = []
+    renamed = []
+
+    def valid_rooms():
+        for number, row in rows:
+            room, error = _validate(number, row)
+            if error is None:
+                yield room
+                continue
+            report["failed"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append(error)
+
+    with transaction.atomic():
+        rooms = valid_rooms()
+        while chunk := list(islice(rooms, chunk_size)):
+            if report["failed"] and not partial:
+                continue
+            created, updated, changed, changed_names = _upsert(chunk)
+            report["created"] += created
+            report["updated"] += updated
+            regridded.extend(changed)
+            renamed.extend(changed_names)
+
+        if report["failed"] and not partial:
+            raise RoomImportError(report)
+
+        for room_id in sorted(set(regridded)):
+            rebuild_seat_counters(room_id)
+        if renamed:
+            refresh_room_booking_details(renamed)
+
+    return report
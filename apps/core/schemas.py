@@ -1,15 +1,17 @@
 """
 Pydantic schemas for request/response validation
 """
-from pydantic import BaseModel, Field, validator
-from typing import Optional, List
-from datetime import date, time, datetime
+from pydantic import BaseModel, ConfigDict, Field, ValidationInfo, field_validator
+from typing import Optional, List, Literal
+from datetime import date, time, datetime, timedelta
 from decimal import Decimal
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 
 class RoomSchema(BaseModel):
     """Schema for Room data"""
     id: Optional[int] = None
+    code: Optional[str] = Field(None, max_length=64, pattern=r'^[-a-zA-Z0-9_]+$')
     name: str = Field(..., min_length=1, max_length=255)
     description: str
     price_per_slot: Decimal = Field(..., gt=0)
@@ -19,20 +21,46 @@ class RoomSchema(BaseModel):
     slot_duration_minutes: int = 30
     opening_time: time
     closing_time: time
+    timezone: str = "UTC"
+    booking_mode: Literal["exclusive", "shared"] = "exclusive"
+    hold_minutes: int = Field(30, gt=0)
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
-        json_encoders = {
-            Decimal: lambda v: float(v),
-            time: lambda v: v.isoformat(),
-        }
+    model_config = ConfigDict(from_attributes=True)
 
 
-class BookingCreateSchema(BaseModel):
-    """Schema for creating a booking"""
-    user_id: Optional[int] = Field(None, gt=0)
+class RoomImportSchema(RoomSchema):
+    """Schema for one row of a bulk room import (staff only), keyed by code"""
+    code: str = Field(..., min_length=1, max_length=64, pattern=r'^[-a-zA-Z0-9_]+$')
+    slot_duration_minutes: int = Field(30, gt=0)
+    opening_time: time = time(9, 0)
+    closing_time: time = time(18, 0)
+
+    @field_validator('amenities', mode='before')
+    def split_amenities(cls, v):
+        # CSV cells list amenities separated by semicolons
+        if isinstance(v, str):
+            return [amenity.strip() for amenity in v.split(';') if amenity.strip()]
+        return v
+
+    @field_validator('closing_time')
+    def validate_hours(cls, v, info: ValidationInfo):
+        if 'opening_time' in info.data and v <= info.data['opening_time']:
+            raise ValueError('Closing time must be after opening time')
+        return v
+
+    @field_validator('timezone')
+    def validate_timezone(cls, v):
+        try:
+            ZoneInfo(v)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f'{v} is not a valid IANA timezone')
+        return v
+
+
+class BookingSlotSchema(BaseModel):
+    """Schema for the room, date, time and guests of a booking"""
     room_id: int = Field(..., gt=0)
     booking_date: date
     start_time: time
@@ -40,23 +68,50 @@ class BookingCreateSchema(BaseModel):
     guest_count: int = Field(..., gt=0)
     special_requests: Optional[str] = None
 
-    @validator('booking_date')
+    @field_validator('booking_date')
     def validate_booking_date(cls, v):
-        if v < date.today():
+        # Dates are local to the room, which may be up to a day behind UTC;
+        # the exact check happens against the room's clock
+        if v < date.today() - timedelta(days=1):
             raise ValueError('Booking date cannot be in the past')
         return v
 
-    @validator('end_time')
-    def validate_time_range(cls, v, values):
-        if 'start_time' in values and v <= values['start_time']:
+    @field_validator('end_time')
+    def validate_time_range(cls, v, info: ValidationInfo):
+        if 'start_time' in info.data and v <= info.data['start_time']:
             raise ValueError('End time must be after start time')
         return v
 
-    class Config:
-        json_encoders = {
-            date: lambda v: v.isoformat(),
-            time: lambda v: v.isoformat(),
-        }
+
+class BookingCreateSchema(BookingSlotSchema):
+    """Schema for creating a booking"""
+    user_id: Optional[int] = Field(None, gt=0)
+    pay: bool = Field(default=False, description="Also create the PaymentIntent for the hold")
+    currency: str = Field(default='usd', min_length=3, max_length=3)
+
+    @field_validator('currency')
+    def validate_currency(cls, v):
+        return v.lower()
+
+
+class BookingGroupCreateSchema(BaseModel):
+    """Schema for holding several rooms at once, all or nothing"""
+    bookings: List[BookingSlotSchema] = Field(..., min_length=2, max_length=10)
+    pay: bool = Field(default=False, description="Also create the group's PaymentIntent")
+    currency: str = Field(default='usd', min_length=3, max_length=3)
+
+    @field_validator('currency')
+    def validate_currency(cls, v):
+        return v.lower()
+
+
+class BookingGroupPaymentSchema(BaseModel):
+    """Schema for paying a booking group"""
+    currency: str = Field(default='usd', min_length=3, max_length=3)
+
+    @field_validator('currency')
+    def validate_currency(cls, v):
+        return v.lower()
 
 
 class BookingResponseSchema(BaseModel):
@@ -80,31 +135,99 @@ class BookingResponseSchema(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
-        json_encoders = {
-            Decimal: lambda v: float(v),
-            date: lambda v: v.isoformat(),
-            time: lambda v: v.isoformat(),
-            datetime: lambda v: v.isoformat(),
-        }
+    model_config = ConfigDict(from_attributes=True)
+
+
+class BookingBulkStatusSchema(BaseModel):
+    """Schema for bulk booking status transitions (staff only)"""
+    booking_ids: List[int] = Field(..., min_length=1, max_length=1000)
+    status: Literal["completed", "cancelled", "refunded"]
+
+
+class BookingBatchQuerySchema(BaseModel):
+    """Schema for fetching many bookings by id; ids come comma separated"""
+    ids: List[int] = Field(..., min_length=1, max_length=100)
+
+    @field_validator('ids', mode='before')
+    def split_ids(cls, v):
+        if isinstance(v, str):
+            return [part.strip() for part in v.split(',') if part.strip()]
+        return v
+
+
+class BookingHistoryQuerySchema(BaseModel):
+    """Schema for the current user's booking history query parameters"""
+    when: Literal["upcoming", "past"] = "upcoming"
+    limit: int = Field(20, ge=1, le=100)
+    cursor: Optional[str] = None
+
+
+class AnalyticsQuerySchema(BaseModel):
+    """Schema for analytics date range query parameters"""
+    date_from: date = Field(..., alias="from")
+    date_to: date = Field(..., alias="to")
+    room_id: Optional[int] = Field(None, gt=0)
+
+    @field_validator('date_to')
+    def validate_date_range(cls, v, info: ValidationInfo):
+        if 'date_from' in info.data:
+            if v < info.data['date_from']:
+                raise ValueError('End date must be on or after start date')
+            if (v - info.data['date_from']).days > 366:
+                raise ValueError('Date range cannot exceed 366 days')
+        return v
+
+
+class RoomSearchQuerySchema(BaseModel):
+    """Schema for room search query parameters"""
+    q: str = Field(..., min_length=1, max_length=200)
+    limit: int = Field(20, ge=1, le=50)
+
+    @field_validator('q')
+    def validate_query(cls, v):
+        if not v.strip():
+            raise ValueError('Search query cannot be blank')
+        return v.strip()
+
+
+class PriceQuoteQuerySchema(BaseModel):
+    """Schema for price quote query parameters"""
+    booking_date: date
+    start_time: time
+    end_time: time
+
+    @field_validator('end_time')
+    def validate_time_range(cls, v, info: ValidationInfo):
+        if 'start_time' in info.data and v <= info.data['start_time']:
+            raise ValueError('End time must be after start time')
+        return v
+
+
+class CalendarQuerySchema(BaseModel):
+    """Schema for room calendar date range query parameters"""
+    date_from: date = Field(..., alias="from")
+    date_to: date = Field(..., alias="to")
+
+    @field_validator('date_to')
+    def validate_date_range(cls, v, info: ValidationInfo):
+        if 'date_from' in info.data:
+            if v < info.data['date_from']:
+                raise ValueError('End date must be on or after start date')
+            if (v - info.data['date_from']).days > 62:
+                raise ValueError('Date range cannot exceed 62 days')
+        return v
 
 
 class PaymentIntentCreateSchema(BaseModel):
     """Schema for creating a payment intent"""
     booking_id: int = Field(..., gt=0)
-    amount: Decimal = Field(..., gt=0)
+    amount: Optional[Decimal] = Field(None, gt=0, description="Must match the booking total if sent")
     currency: str = Field(default='usd', min_length=3, max_length=3)
 
-    @validator('currency')
+    @field_validator('currency')
     def validate_currency(cls, v):
         return v.lower()
 
-    class Config:
-        json_encoders = {
-            Decimal: lambda v: float(v),
-        }
-
 
 class PaymentIntentResponseSchema(BaseModel):
     """Schema for payment intent response"""
@@ -115,19 +238,13 @@ class PaymentIntentResponseSchema(BaseModel):
     status: str
     booking_id: int
 
-    class Config:
-        json_encoders = {
-            Decimal: lambda v: float(v),
-        }
-
 
 class PaymentWebhookSchema(BaseModel):
     """Schema for Stripe webhook payload"""
     type: str
     data: dict
 
-    class Config:
-        extra = 'allow'
+    model_config = ConfigDict(extra='allow')
 
 
 class ErrorResponseSchema(BaseModel):
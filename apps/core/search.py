@@ -0,0 +1,56 @@
+"""
+Room search over the precomputed search vector, with a fuzzy fallback
+
+Full-text matches come from Room.search_vector, a generated column over the
+name, amenities and description kept in a GIN index, ranked by weight (name
+first, description last). When nothing matches, usually because of a typo,
+room names are matched by trigram word similarity through the trigram index
+on the name instead. Both paths use an index, and a query matching most
+rooms ranks only a bounded set of candidates, so a search costs about the
+same at tens of thousands of rooms as at a hundred.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F
+
+from .models import ROOM_SEARCH_CONFIG, Room
+
+
+# Full-text matches ranked per search. A word found in most rooms would
+# otherwise rank every row, so broad queries rank only this many of them
+RANKED_CANDIDATES = 1000
+
+# Room columns returned by search and listing; the search vector stays internal
+ROOM_FIELDS = [field.attname for field in Room._meta.concrete_fields if field.name != "search_vector"]
+
+
+def search_rooms(text, limit=20):
+    """
+    Return (match, rooms) for a free text query over available rooms.
+
+    ``match`` is "fulltext" when the words matched the search vector, or
+    "fuzzy" when the rooms were found by name similarity instead; ``rooms``
+    are dicts of ROOM_FIELDS, best match first.
+    """
+    rooms = Room.objects.filter(is_available=True)
+
+    # websearch syntax: quoted phrases, OR and -excluded words work as users expect
+    query = SearchQuery(text, search_type="websearch", config=ROOM_SEARCH_CONFIG)
+    # Unordered, so the scan stops at the first RANKED_CANDIDATES matches
+    candidates = rooms.filter(search_vector=query).order_by().values("id")[:RANKED_CANDIDATES]
+    found = list(
+        Room.objects.filter(id__in=candidates)
+        .annotate(rank=SearchRank(F("search_vector"), query))
+        .order_by("-rank", "id")
+        .values(*ROOM_FIELDS)[:limit]
+    )
+    if found:
+        return "fulltext", found
+
+    # name %> text uses room_name_trgm_idx; pg_trgm's word_similarity_threshold applies
+    found = list(
+        rooms.filter(name__trigram_word_similar=text)
+        .annotate(similarity=TrigramWordSimilarity(text, "name"))
+        .order_by("-similarity", "id")
+        .values(*ROOM_FIELDS)[:limit]
+    )
+    return "fuzzy", found
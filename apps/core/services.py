@@ -0,0 +1,631 @@
+"""
+Booking state transitions shared by views, admin actions and management commands
+"""
+from collections import Counter, defaultdict, namedtuple
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.utils import timezone
+
+from . import events, realtime
+from .booking_details import refresh_booking_details, write_new_booking_details
+from .events import StatusChange
+from .intervals import IntervalIndex
+from .models import Booking, DayOccupancy, Payment, Room, SlotOccupancy, WaitlistEntry
+
+
+# Statuses that occupy a room's time slot
+ACTIVE_STATUSES = ("pending", "confirmed")
+
+
+# Booking columns needed to build a StatusChange
+STATUS_CHANGE_FIELDS = [
+    "id",
+    "room_id",
+    "booking_date",
+    "start_time",
+    "end_time",
+    "number_of_slots",
+    "total_amount",
+    "status",
+    "payment_status",
+]
+
+
+# Target status -> which bookings may move, the booking columns to write and
+# the status written to their Payment rows (None leaves payments untouched).
+BULK_TRANSITIONS = {
+    "completed": {
+        "filter": Q(status="confirmed"),
+        "booking": {"status": "completed"},
+        "payment": None,
+    },
+    "cancelled": {
+        "filter": Q(status__in=["pending", "confirmed"]),
+        "booking": {
+            "status": "cancelled",
+            "payment_status": Case(
+                When(payment_status="succeeded", then=Value("succeeded")),
+                default=Value("failed"),
+            ),
+        },
+        "payment": "canceled",
+    },
+    "refunded": {
+        "filter": Q(payment_status="succeeded"),
+        "booking": {"status": "cancelled", "payment_status": "refunded"},
+        "payment": "refunded",
+    },
+    # Only holds.expire_bookings expires holds, after cancelling their
+    # PaymentIntents. A group's members share one hold, so they expire together
+    "expired": {
+        "filter": Q(status="pending", payment_status__in=["pending", "processing", "failed"]),
+        "booking": {
+            "status": "expired",
+            "payment_status": Case(
+                When(payment_status="processing", then=Value("failed")),
+                default=F("payment_status"),
+            ),
+        },
+        "payment": "canceled",
+        "whole_group": True,
+    },
+}
+
+
+def group_filter(booking):
+    """Q matching ``booking`` and, if it belongs to a group, the rest of its group"""
+    if booking.group_id is None:
+        return Q(id=booking.id)
+    return Q(group_id=booking.group_id)
+
+
+def calculate_slots_and_amount(room, booking_date, start_time, end_time):
+    """
+    Calculate number of slots and total amount for a booking in the room's
+    timezone. Raises ValueError for a time skipped by a DST change.
+    """
+    starts_at, ends_at = room.clock.span(booking_date, start_time, end_time)
+    return room.clock.slots_and_amount(starts_at, ends_at)
+
+
+# A booking priced for the occupancy of its room and day
+PriceQuote = namedtuple(
+    "PriceQuote",
+    ["number_of_slots", "occupancy", "multiplier", "price_per_slot", "total_amount"],
+)
+
+
+def day_occupancy(room, booking_date):
+    """
+    Share of a room's day already booked, held or confirmed, from 0 to 1.
+
+    A shared room reads its seat counters, an exclusive room its day's
+    DayOccupancy row; the RoomDailyStats projection lags and counts
+    confirmed bookings only.
+    """
+    clock = room.clock
+    slots = max(clock.closing_minute - clock.opening_minute, 0) // clock.slot_minutes
+    if room.is_shared:
+        taken = SlotOccupancy.objects.filter(room=room, booking_date=booking_date).aggregate(
+            taken=Sum("seats_taken")
+        )["taken"]
+        slots *= room.capacity
+    else:
+        taken = (
+            DayOccupancy.objects.filter(room=room, booking_date=booking_date)
+            .values_list("slots_taken", flat=True)
+            .first()
+        )
+    if not slots:
+        return 1.0
+    return min((taken or 0) / slots, 1.0)
+
+
+def quote_price(room, booking_date, start_time, end_time):
+    """
+    Price a booking at the room's current occupancy for its day.
+
+    Builds on calculate_slots_and_amount, with the price per slot adjusted by
+    the room's pricing tiers. Raises ValueError for a time skipped by a DST
+    change.
+    """
+    number_of_slots, _ = calculate_slots_and_amount(room, booking_date, start_time, end_time)
+    occupancy = day_occupancy(room, booking_date)
+    price_per_slot = room.pricing.price_per_slot(room.price_per_slot, occupancy)
+    return PriceQuote(
+        number_of_slots=number_of_slots,
+        occupancy=occupancy,
+        multiplier=room.pricing.multiplier(occupancy),
+        price_per_slot=price_per_slot,
+        total_amount=price_per_slot * number_of_slots,
+    )
+
+
+def check_time_slot_overlap(
+    room, booking_date, start_time, end_time, exclude_booking_id=None
+):
+    """
+    Check if the requested time slot overlaps with existing bookings.
+
+    Compares UTC instants in the database, so a single indexed query finds
+    the first conflicting active booking.
+    """
+    starts_at, ends_at = room.clock.span(booking_date, start_time, end_time)
+
+    bookings = Booking.objects.filter(
+        room=room,
+        booking_date=booking_date,
+        status__in=ACTIVE_STATUSES,
+        starts_at__lt=ends_at,
+        ends_at__gt=starts_at,
+    )
+
+    if exclude_booking_id:
+        bookings = bookings.exclude(id=exclude_booking_id)
+
+    conflicting = bookings.order_by("starts_at").first()
+    return conflicting is not None, conflicting
+
+
+def seats_left(room, booking_date, start_time, end_time):
+    """
+    Fewest free seats over the slots a booking in a shared room would take.
+
+    Reads one seat counter per slot. Raises ValueError for a time skipped by
+    a DST change.
+    """
+    room.clock.span(booking_date, start_time, end_time)
+    taken = SlotOccupancy.objects.filter(
+        room=room,
+        booking_date=booking_date,
+        start_time__in=room.clock.slot_starts(start_time, end_time),
+    ).aggregate(most=Max("seats_taken"))["most"]
+    return room.capacity - (taken or 0)
+
+
+def reserve_seats(room, booking_date, start_time, end_time, guest_count):
+    """
+    Take ``guest_count`` seats in every slot a booking in a shared room covers.
+
+    The caller holds the room's row lock, as create_booking and
+    promote_waitlist do, so checking and bumping the slot counters is atomic.
+    Seats are only taken if every slot has enough. Returns
+    (reserved, seats_left) with the free seats before the reservation.
+    """
+    slots = room.clock.slot_starts(start_time, end_time)
+    SlotOccupancy.objects.bulk_create(
+        [SlotOccupancy(room=room, booking_date=booking_date, start_time=slot) for slot in slots],
+        ignore_conflicts=True,
+    )
+    counters = SlotOccupancy.objects.filter(
+        room=room, booking_date=booking_date, start_time__in=slots
+    )
+    left = room.capacity - counters.aggregate(most=Max("seats_taken"))["most"]
+    if guest_count > left:
+        return False, left
+
+    counters.update(seats_taken=F("seats_taken") + guest_count)
+    return True, left
+
+
+def release_seats(booking_ids):
+    """
+    Give back the seats of bookings that stopped being active.
+
+    Bookings in exclusive rooms are ignored. The rooms are locked in id
+    order first, like promote_waitlist does, so releasing seats cannot
+    deadlock with a booking taking them.
+    """
+    bookings = list(
+        Booking.objects.filter(id__in=booking_ids, room__booking_mode="shared").values_list(
+            "room_id", "booking_date", "start_time", "end_time", "guest_count"
+        )
+    )
+    if not bookings:
+        return
+
+    rooms = {
+        room.id: room
+        for room in Room.objects.select_for_update()
+        .filter(id__in={booking[0] for booking in bookings})
+        .order_by("id")
+    }
+    freed = Counter()
+    for room_id, booking_date, start_time, end_time, guest_count in bookings:
+        for slot in rooms[room_id].clock.slot_starts(start_time, end_time):
+            freed[(room_id, booking_date, slot)] += guest_count
+
+    # One UPDATE per distinct seat count, usually a single one
+    by_seats = defaultdict(list)
+    for (room_id, booking_date, slot), seats in freed.items():
+        by_seats[seats].append(Q(room_id=room_id, booking_date=booking_date, start_time=slot))
+    for seats, slots in sorted(by_seats.items()):
+        SlotOccupancy.objects.filter(reduce(or_, slots)).update(
+            seats_taken=F("seats_taken") - seats
+        )
+
+
+def count_day_slots(changes):
+    """
+    Add the slots of bookings that became active to their day's DayOccupancy,
+    and take off those of bookings that stopped being active.
+
+    Counters are updated in (room, date) order, so concurrent writers
+    cannot deadlock on them.
+    """
+    taken = Counter()
+    for change in changes:
+        was_active = change.old_status in ACTIVE_STATUSES
+        is_active = change.new_status in ACTIVE_STATUSES
+        if was_active != is_active:
+            sign = 1 if is_active else -1
+            taken[(change.room_id, change.booking_date)] += sign * change.number_of_slots
+
+    days = sorted(day for day, slots in taken.items() if slots)
+    if not days:
+        return
+    DayOccupancy.objects.bulk_create(
+        [DayOccupancy(room_id=room_id, booking_date=booking_date) for room_id, booking_date in days],
+        ignore_conflicts=True,
+    )
+    for room_id, booking_date in days:
+        DayOccupancy.objects.filter(room_id=room_id, booking_date=booking_date).update(
+            slots_taken=F("slots_taken") + taken[(room_id, booking_date)]
+        )
+
+
+def rebuild_seat_counters(room_id):
+    """
+    Recount a room's seat counters from its active bookings.
+
+    Needed when a room is switched to shared or its slot grid changes.
+    Exclusive rooms are left without counters. Returns the number of slots
+    with seats taken.
+    """
+    with transaction.atomic():
+        room = Room.objects.select_for_update().get(id=room_id)
+        SlotOccupancy.objects.filter(room=room).delete()
+        if not room.is_shared:
+            return 0
+
+        taken = Counter()
+        for booking_date, start_time, end_time, guest_count in Booking.objects.filter(
+            room=room, status__in=ACTIVE_STATUSES
+        ).values_list("booking_date", "start_time", "end_time", "guest_count"):
+            for slot in room.clock.slot_starts(start_time, end_time):
+                taken[(booking_date, slot)] += guest_count
+
+        SlotOccupancy.objects.bulk_create(
+            [
+                SlotOccupancy(room=room, booking_date=booking_date, start_time=slot, seats_taken=seats)
+                for (booking_date, slot), seats in taken.items()
+            ],
+            batch_size=1000,
+        )
+    return len(taken)
+
+
+def status_change_for(booking, old_status, old_payment_status=None):
+    """
+    Build a StatusChange for a booking instance whose status was just set.
+
+    ``old_payment_status`` defaults to the booking's current payment status,
+    i.e. unchanged, except for a new booking (``old_status`` None).
+    """
+    if old_payment_status is None and old_status is not None:
+        old_payment_status = booking.payment_status
+
+    return StatusChange(
+        booking_id=booking.id,
+        room_id=booking.room_id,
+        booking_date=booking.booking_date,
+        start_time=booking.start_time,
+        end_time=booking.end_time,
+        number_of_slots=booking.number_of_slots,
+        total_amount=booking.total_amount,
+        old_status=old_status,
+        new_status=booking.status,
+        old_payment_status=old_payment_status,
+        new_payment_status=booking.payment_status,
+    )
+
+
+def record_status_changes(changes):
+    """
+    Append booking status and payment status changes to the event log and
+    propagate status changes to the day slot counters, availability streams,
+    shared-room seat counters and the waitlist.
+
+    Must be called inside the transaction that changed the bookings so the
+    events commit or roll back with them. The booking details of every
+    existing booking passed in are refreshed, changed or not, since callers
+    pass the bookings they wrote. New bookings (old status None) are left to
+    their creators, which write their rows with write_new_booking_details
+    without reading them back under the room lock. Rollups and other read
+    models are projections of the log, updated by the run_projections
+    worker.
+    """
+    changes = list(changes)
+    refresh_booking_details(
+        change.booking_id for change in changes if change.old_status is not None
+    )
+
+    changes = [
+        change
+        for change in changes
+        if change.old_status != change.new_status
+        or change.old_payment_status != change.new_payment_status
+    ]
+    if not changes:
+        return
+
+    events.append_events(changes)
+
+    changes = [change for change in changes if change.old_status != change.new_status]
+    if not changes:
+        return
+
+    count_day_slots(changes)
+    realtime.publish_availability_changes(changes)
+
+    freed = defaultdict(list)
+    freed_ids = []
+    for change in changes:
+        if change.old_status in ACTIVE_STATUSES and change.new_status not in ACTIVE_STATUSES:
+            freed[(change.room_id, change.booking_date)].append(
+                (change.start_time, change.end_time)
+            )
+            freed_ids.append(change.booking_id)
+    if freed_ids:
+        release_seats(freed_ids)
+    # Sorted so rooms are always locked in the same order
+    for (room_id, booking_date), intervals in sorted(freed.items()):
+        promote_waitlist(room_id, booking_date, intervals)
+
+
+def promote_waitlist(room_id, booking_date, freed_intervals):
+    """
+    Turn waiting entries that now fit into pending holds.
+
+    Only entries overlapping a freed interval are considered, oldest first.
+    Each candidate is checked against an interval index of the day's active
+    bookings, which is updated as entries are promoted. Returns the new
+    bookings.
+    """
+    # No timezone is a day behind UTC; the exact check needs the locked room
+    if booking_date < timezone.now().date() - timedelta(days=1):
+        return []
+
+    freed_start = min(start for start, _ in freed_intervals)
+    freed_end = max(end for _, end in freed_intervals)
+
+    with transaction.atomic():
+        # Same lock create_booking takes, so promotion cannot race new bookings
+        room = Room.objects.select_for_update().get(id=room_id)
+        if booking_date < room.clock.today():
+            return []
+
+        entries = list(
+            WaitlistEntry.objects.select_for_update(skip_locked=True, of=("self",))
+            .select_related("user")
+            .filter(
+                room_id=room_id,
+                booking_date=booking_date,
+                status="waiting",
+                start_time__lt=freed_end,
+                end_time__gt=freed_start,
+            )
+            .order_by("created_at")
+        )
+        if not entries:
+            return []
+
+        # Shared rooms check the seat counters instead of overlap
+        occupied = None
+        if not room.is_shared:
+            occupied = IntervalIndex(
+                Booking.objects.filter(
+                    room_id=room_id,
+                    booking_date=booking_date,
+                    status__in=ACTIVE_STATUSES,
+                ).values_list("start_time", "end_time")
+            )
+
+        hold_expires_at = timezone.now() + timedelta(minutes=room.hold_minutes)
+        promoted = []
+        for entry in entries:
+            fits_freed = any(
+                entry.start_time < end and entry.end_time > start
+                for start, end in freed_intervals
+            )
+            if not fits_freed:
+                continue
+            if not room.is_available or entry.guest_count > room.capacity:
+                continue
+            # The room's hours or slot grid may have changed since the entry was made
+            times = (entry.start_time, entry.end_time)
+            if not (room.clock.within_hours(*times) and room.clock.on_grid(*times)):
+                continue
+            # Priced like a new booking, before its own seats are taken
+            quote = quote_price(room, entry.booking_date, entry.start_time, entry.end_time)
+            if occupied is None:
+                reserved, _ = reserve_seats(
+                    room, entry.booking_date, entry.start_time, entry.end_time, entry.guest_count
+                )
+                if not reserved:
+                    continue
+            elif occupied.overlaps(entry.start_time, entry.end_time):
+                continue
+
+            booking = Booking.objects.create(
+                user=entry.user,
+                room=room,
+                booking_date=entry.booking_date,
+                start_time=entry.start_time,
+                end_time=entry.end_time,
+                guest_count=entry.guest_count,
+                total_amount=quote.total_amount,
+                number_of_slots=quote.number_of_slots,
+                special_requests=entry.special_requests,
+                status="pending",
+                payment_status="pending",
+                hold_expires_at=hold_expires_at,
+            )
+            entry.status = "promoted"
+            entry.booking = booking
+            entry.save(update_fields=["status", "booking", "updated_at"])
+
+            if occupied is not None:
+                occupied.add(entry.start_time, entry.end_time)
+            promoted.append(booking)
+
+        write_new_booking_details(promoted)
+        record_status_changes(status_change_for(booking, None) for booking in promoted)
+
+    return promoted
+
+
+def bulk_transition_bookings(booking_ids, target_status):
+    """
+    Move many bookings to ``target_status`` using set-based UPDATEs.
+
+    Bookings that are not eligible for the transition (e.g. completing a
+    pending booking) are skipped. Refunds are recorded only; the refund itself
+    is issued from the Stripe dashboard. Returns the ids that were changed.
+    """
+    if target_status not in BULK_TRANSITIONS:
+        raise ValueError(f"Unsupported booking transition: {target_status}")
+
+    rule = BULK_TRANSITIONS[target_status]
+    now = timezone.now()
+
+    if rule.get("whole_group"):
+        grouped = Booking.objects.filter(id__in=booking_ids, group__isnull=False).values("group_id")
+        booking_ids = Booking.objects.filter(Q(id__in=booking_ids) | Q(group__in=grouped)).values("id")
+
+    with transaction.atomic():
+        # Lock eligible rows in id order so concurrent batches cannot deadlock
+        rows = list(
+            Booking.objects.select_for_update()
+            .filter(rule["filter"], id__in=booking_ids)
+            .order_by("id")
+            .values_list(*STATUS_CHANGE_FIELDS)
+        )
+        if not rows:
+            return []
+
+        ids = [row[0] for row in rows]
+        Booking.objects.filter(id__in=ids).update(updated_at=now, **rule["booking"])
+
+        if rule["payment"]:
+            payments = Payment.objects.filter(booking_id__in=ids)
+            if target_status == "cancelled":
+                payments = payments.exclude(status="succeeded")
+            payments.update(status=rule["payment"], updated_at=now)
+
+        # Read back payment statuses the UPDATE may have computed per row
+        new_payment_statuses = {}
+        if "payment_status" in rule["booking"]:
+            new_payment_statuses = dict(
+                Booking.objects.filter(id__in=ids).values_list("id", "payment_status")
+            )
+
+        new_status = rule["booking"]["status"]
+        record_status_changes(
+            StatusChange(
+                *row[:-1],
+                new_status=new_status,
+                old_payment_status=row[-1],
+                new_payment_status=new_payment_statuses.get(row[0], row[-1]),
+            )
+            for row in rows
+        )
+
+    return ids
+
+
+def complete_past_bookings(batch_size=500, now=None):
+    """
+    Mark confirmed bookings whose end time has passed as completed.
+
+    Works through matching rows in id-ordered batches so each transaction
+    stays short. Returns the number of bookings completed.
+    """
+    now = now or timezone.now()
+
+    completed = 0
+    last_id = 0
+    while True:
+        ids = list(
+            Booking.objects.filter(status="confirmed", ends_at__lte=now, id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        completed += len(bulk_transition_bookings(ids, "completed"))
+        last_id = ids[-1]
+
+    return completed
+
+
+def find_overlapping_bookings(room_ids=None):
+    """
+    Return (booking_id, conflicting_booking_id) pairs of active bookings that
+    overlap in the same exclusive room. Must always be empty; used to verify
+    the booking path under concurrency.
+    """
+    active = Booking.objects.filter(status__in=ACTIVE_STATUSES, room__booking_mode="exclusive")
+    if room_ids is not None:
+        active = active.filter(room_id__in=room_ids)
+
+    conflicts = active.filter(
+        room_id=OuterRef("room_id"),
+        id__gt=OuterRef("id"),
+        starts_at__lt=OuterRef("ends_at"),
+        ends_at__gt=OuterRef("starts_at"),
+    )
+    return list(
+        active.annotate(conflict_id=Subquery(conflicts.order_by("id").values("id")[:1]))
+        .filter(conflict_id__isnull=False)
+        .order_by("id")
+        .values_list("id", "conflict_id")
+    )
+
+
+def find_seat_count_errors(room_ids=None):
+    """
+    Return (room_id, booking_date, slot_start, seats_booked, seats_counted)
+    for shared-room slots whose counter disagrees with the guests of the
+    active bookings in them, or whose bookings exceed the room's capacity.
+    Must always be empty; used to verify the booking path under concurrency.
+    """
+    rooms = Room.objects.filter(booking_mode="shared")
+    if room_ids is not None:
+        rooms = rooms.filter(id__in=room_ids)
+
+    errors = []
+    for room in rooms:
+        booked = Counter()
+        for booking_date, start_time, end_time, guest_count in Booking.objects.filter(
+            room=room, status__in=ACTIVE_STATUSES
+        ).values_list("booking_date", "start_time", "end_time", "guest_count"):
+            for slot in room.clock.slot_starts(start_time, end_time):
+                booked[(booking_date, slot)] += guest_count
+
+        counted = {
+            (booking_date, slot): seats
+            for booking_date, slot, seats in SlotOccupancy.objects.filter(room=room).values_list(
+                "booking_date", "start_time", "seats_taken"
+            )
+        }
+        for key in sorted(booked.keys() | counted.keys()):
+            seats_booked, seats_counted = booked[key], counted.get(key, 0)
+            if seats_booked != seats_counted or seats_booked > room.capacity:
+                errors.append((room.id, *key, seats_booked, seats_counted))
+
+    return errors
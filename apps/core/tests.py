@@ -1,3 +1,880 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.core import realtime
+from apps.core.booking_details import get_booking_details, refresh_booking_details
+from apps.core.clock import RoomClock
+from apps.core.intervals import IntervalIndex
+from apps.core.admin import BookingAdmin, RoomAdmin
+from apps.core.models import (
+    Booking,
+    BookingEvent,
+    DayOccupancy,
+    Payment,
+    PaymentIntentOutbox,
+    Room,
+    WaitlistEntry,
+)
+from apps.core.outbox import MAX_ATTEMPTS, claim_due_entries, create_leased_entry, deliver_entry
+from apps.core.paginators import decode_cursor, encode_cursor
+from apps.core.payments import FakeStripeGateway
+from apps.core.pricing import PricingTiers, validate_pricing_tiers
+from apps.core.room_import import RoomImportError, import_rooms, read_rows
+from apps.core.services import (
+    bulk_transition_bookings,
+    quote_price,
+    record_status_changes,
+    status_change_for,
+)
+from apps.core.timing_wheel import TimingWheel
+from apps.core.webhooks import apply_payment_events, process_pending_events, store_event
+
+
+def make_room(**fields):
+    values = {
+        "name": "Room A",
+        "description": "A meeting room",
+        "price_per_slot": Decimal("10.00"),
+        "capacity": 5,
+        "opening_time": time(9, 0),
+        "closing_time": time(18, 0),
+    }
+    values.update(fields)
+    return Room.objects.create(**values)
+
+
+def make_user(username="guest"):
+    return User.objects.create_user(
+        username=username, email=f"{username}@example.com", password="pw"
+    )
+
+
+def make_booking(user, room, booking_date, start_time, end_time, **fields):
+    values = {
+        "user": user,
+        "room": room,
+        "booking_date": booking_date,
+        "start_time": start_time,
+        "end_time": end_time,
+        "guest_count": 1,
+        "total_amount": Decimal("20.00"),
+        "number_of_slots": 2,
+        "status": "pending",
+        "payment_status": "pending",
+    }
+    values.update(fields)
+    return Booking.objects.create(**values)
+
+
+def parse_sse(chunk):
+    """(event, data) of one Server-Sent Events message"""
+    event, data = None, None
+    for line in chunk.decode().splitlines():
+        if line.startswith("event: "):
+            event = line[len("event: ") :]
+        elif line.startswith("data: "):
+            data = json.loads(line[len("data: ") :])
+    return event, data
+
+
+@override_settings(AVAILABILITY_PUBSUB_BACKEND="apps.core.realtime.InProcessPubSub")
+class AvailabilityStreamTests(TestCase):
+    def setUp(self):
+        # A fresh broadcaster on the in-process pub/sub for every test
+        realtime._broadcaster = None
+        self.addCleanup(setattr, realtime, "_broadcaster", None)
+        self.room = make_room()
+        self.user = make_user()
+        self.day = date.today() + timedelta(days=1)
+        self.url = f"/api/rooms/{self.room.id}/availability/stream/?date={self.day.isoformat()}"
+
+    def book(self, start_time, end_time):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = make_booking(self.user, self.room, self.day, start_time, end_time)
+            record_status_changes([status_change_for(booking, None)])
+        return booking
+
+    def test_wsgi_request_is_not_served(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 501)
+        self.assertFalse(response.streaming)
+
+    async def test_snapshot_then_slot_events(self):
+        await sync_to_async(self.book)(time(9, 0), time(10, 0))
+
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = response.streaming_content
+
+        event, data = parse_sse(await anext(stream))
+        self.assertEqual(event, "snapshot")
+        self.assertEqual(
+            data["occupied"], [{"start_time": "09:00:00", "end_time": "10:00:00", "status": "pending"}]
+        )
+
+        await sync_to_async(self.book)(time(11, 0), time(12, 0))
+
+        event, data = parse_sse(await anext(stream))
+        self.assertEqual(event, "slot")
+        self.assertNotIn("booking_id", data)
+        self.assertEqual(data["status"], "pending")
+        self.assertEqual(data["start_time"], "11:00:00")
+        await stream.aclose()
+
+    async def test_unknown_room_is_not_found(self):
+        response = await self.async_client.get(
+            f"/api/rooms/{self.room.id + 1}/availability/stream/?date={self.day.isoformat()}"
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(realtime.get_broadcaster()._subscribers, {})
+
+    async def test_invalid_date_is_rejected(self):
+        response = await self.async_client.get(
+            f"/api/rooms/{self.room.id}/availability/stream/?date=tomorrow"
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+
+class BroadcasterTests(TestCase):
+    async def test_dispatch_reaches_only_subscribers_of_the_key(self):
+        broadcaster = realtime.Broadcaster(realtime.InProcessPubSub())
+        watched = broadcaster.subscribe("1:2030-01-01")
+        other = broadcaster.subscribe("2:2030-01-01")
+
+        broadcaster.dispatch({"type": "slot", "key": "1:2030-01-01", "booking_id": 7})
+        message = await watched.get()
+
+        self.assertEqual(message["booking_id"], 7)
+        self.assertTrue(other.empty())
+
+    async def test_slow_subscriber_is_told_to_resync(self):
+        broadcaster = realtime.Broadcaster(realtime.InProcessPubSub())
+        queue = broadcaster.subscribe("1:2030-01-01")
+
+        for booking_id in range(realtime.CLIENT_QUEUE_SIZE + 1):
+            broadcaster.dispatch(
+                {"type": "slot", "key": "1:2030-01-01", "booking_id": booking_id}
+            )
+        message = await queue.get()
+
+        self.assertEqual(message, {"type": "resync", "key": "1:2030-01-01"})
+        self.assertTrue(queue.empty())
+
+    async def test_unsubscribed_queue_gets_nothing(self):
+        broadcaster = realtime.Broadcaster(realtime.InProcessPubSub())
+        queue = broadcaster.subscribe("1:2030-01-01")
+        broadcaster.unsubscribe("1:2030-01-01", queue)
+
+        broadcaster.dispatch({"type": "slot", "key": "1:2030-01-01", "booking_id": 7})
+        await asyncio.sleep(0)
+
+        self.assertTrue(queue.empty())
+        self.assertEqual(broadcaster._subscribers, {})
+
+
+class TimingWheelTests(SimpleTestCase):
+    def test_timer_fires_at_its_deadline_and_not_before(self):
+        wheel = TimingWheel(now=1000, tick_seconds=1, slots=8, levels=3)
+        wheel.schedule("hold", 1005)
+
+        self.assertEqual(wheel.advance(1004), [])
+        self.assertEqual(wheel.advance(1005), ["hold"])
+        self.assertNotIn("hold", wheel)
+
+    def test_far_deadline_cascades_down_to_its_tick(self):
+        wheel = TimingWheel(now=0, tick_seconds=1, slots=4, levels=2)
+        # Beyond a full top turn (4 ** 2 ticks)
+        wheel.schedule("far", 37)
+
+        fired = {}
+        for now in range(1, 41):
+            for key in wheel.advance(now):
+                fired[key] = now
+
+        self.assertEqual(fired, {"far": 37})
+
+    def test_reschedule_keeps_only_the_latest_deadline(self):
+        wheel = TimingWheel(now=0, tick_seconds=1, slots=8, levels=2)
+        wheel.schedule("hold", 3)
+        wheel.schedule("hold", 10)
+
+        self.assertEqual(wheel.advance(5), [])
+        self.assertEqual(wheel.advance(10), ["hold"])
+        self.assertEqual(len(wheel), 0)
+
+    def test_cancelled_timer_never_fires(self):
+        wheel = TimingWheel(now=0, tick_seconds=1)
+        wheel.schedule("hold", 2)
+        wheel.cancel("hold")
+
+        self.assertEqual(wheel.advance(5), [])
+
+    def test_past_deadline_is_due_on_next_advance(self):
+        wheel = TimingWheel(now=100, tick_seconds=1)
+        wheel.schedule("late", 50)
+
+        self.assertEqual(wheel.advance(100), ["late"])
+
+    def test_deadline_rounds_up_to_the_next_tick(self):
+        wheel = TimingWheel(now=0, tick_seconds=5)
+        wheel.schedule("hold", 7)
+
+        self.assertEqual(wheel.advance(9), [])
+        self.assertEqual(wheel.advance(10), ["hold"])
+
+
+class IntervalIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = IntervalIndex([(time(13, 0), time(14, 0)), (time(9, 0), time(10, 0))])
+
+    def test_touching_intervals_do_not_overlap(self):
+        self.assertFalse(self.index.overlaps(time(10, 0), time(13, 0)))
+        self.assertFalse(self.index.overlaps(time(8, 0), time(9, 0)))
+        self.assertFalse(self.index.overlaps(time(14, 0), time(15, 0)))
+
+    def test_overlaps_on_either_side(self):
+        self.assertTrue(self.index.overlaps(time(9, 30), time(11, 0)))
+        self.assertTrue(self.index.overlaps(time(12, 0), time(13, 30)))
+        self.assertTrue(self.index.overlaps(time(8, 0), time(15, 0)))
+
+    def test_added_interval_is_checked_afterwards(self):
+        self.index.add(time(11, 0), time(12, 0))
+
+        self.assertEqual(len(self.index), 3)
+        self.assertTrue(self.index.overlaps(time(11, 30), time(11, 45)))
+        self.assertFalse(self.index.overlaps(time(10, 0), time(11, 0)))
+
+
+class CreateBookingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(make_user())
+        self.room = make_room(timezone="Europe/Berlin")
+        self.day = date.today() + timedelta(days=1)
+
+    def book(self, start_time, end_time):
+        return self.client.post(
+            "/api/bookings/",
+            {
+                "room_id": self.room.id,
+                "booking_date": self.day.isoformat(),
+                "start_time": start_time,
+                "end_time": end_time,
+                "guest_count": 1,
+            },
+            format="json",
+        )
+
+    def test_booking_past_closing_is_rejected(self):
+        response = self.book("17:30:00", "18:30:00")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "Booking time must be between 09:00 and 18:00")
+
+    def test_booking_up_to_closing_is_accepted(self):
+        response = self.book("17:00:00", "18:00:00")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["number_of_slots"], 2)
+
+
+class WaitlistTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.room = make_room()
+        self.day = date.today() + timedelta(days=1)
+
+    def join(self, start_time, end_time):
+        return self.client.post(
+            "/api/waitlist/",
+            {
+                "room_id": self.room.id,
+                "booking_date": self.day.isoformat(),
+                "start_time": start_time,
+                "end_time": end_time,
+                "guest_count": 1,
+            },
+            format="json",
+        )
+
+    def test_entry_past_closing_is_rejected(self):
+        response = self.join("17:00:00", "19:00:00")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "Booking time must be between 09:00 and 18:00")
+
+    def test_entry_off_the_slot_grid_is_rejected(self):
+        self.assertEqual(self.join("09:15:00", "10:15:00").status_code, 400)
+
+    def test_entry_on_a_full_slot_is_accepted(self):
+        make_booking(self.user, self.room, self.day, time(9, 0), time(10, 0), status="confirmed")
+
+        self.assertEqual(self.join("09:00:00", "10:00:00").status_code, 201)
+
+    def test_entry_outside_the_hours_is_not_promoted(self):
+        booking = make_booking(self.user, self.room, self.day, time(17, 0), time(18, 0))
+        record_status_changes([status_change_for(booking, None)])
+        WaitlistEntry.objects.create(
+            user=make_user("waiting"),
+            room=self.room,
+            booking_date=self.day,
+            start_time=time(17, 0),
+            end_time=time(19, 0),
+            guest_count=1,
+        )
+
+        bulk_transition_bookings([booking.id], "cancelled")
+
+        self.assertEqual(WaitlistEntry.objects.get().status, "waiting")
+        self.assertEqual(Booking.objects.filter(status="pending").count(), 0)
+
+
+class RoomClockTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = RoomClock("Europe/Berlin", time(0, 0), time(23, 30), 30, Decimal("10.00"))
+
+    def test_span_is_in_utc(self):
+        starts_at, ends_at = self.clock.span(date(2026, 7, 1), time(9, 0), time(10, 0))
+
+        self.assertEqual(starts_at, datetime(2026, 7, 1, 7, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(ends_at, datetime(2026, 7, 1, 8, 0, tzinfo=dt_timezone.utc))
+
+    def test_time_skipped_by_spring_forward_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.clock.instant(date(2026, 3, 29), time(2, 30))
+
+    def test_spring_forward_day_charges_the_real_hours(self):
+        span = self.clock.span(date(2026, 3, 29), time(1, 0), time(4, 0))
+
+        self.assertEqual(self.clock.slots_and_amount(*span), (4, Decimal("40.00")))
+
+    def test_fall_back_day_charges_the_real_hours(self):
+        span = self.clock.span(date(2026, 10, 25), time(1, 0), time(4, 0))
+
+        self.assertEqual(self.clock.slots_and_amount(*span), (8, Decimal("80.00")))
+
+    def test_repeated_time_resolves_to_first_occurrence(self):
+        instant = self.clock.instant(date(2026, 10, 25), time(2, 30))
+
+        self.assertEqual(instant, datetime(2026, 10, 25, 0, 30, tzinfo=dt_timezone.utc))
+
+    def test_today_is_the_room_local_date(self):
+        now = datetime(2026, 7, 1, 23, 0, tzinfo=dt_timezone.utc)
+
+        self.assertEqual(self.clock.today(now), date(2026, 7, 2))
+
+    def test_slot_starts_follow_the_opening_grid(self):
+        clock = RoomClock("UTC", time(9, 15), time(18, 0), 30, Decimal("10.00"))
+
+        self.assertEqual(
+            clock.slot_starts(time(9, 30), time(10, 30)),
+            [time(9, 15), time(9, 45), time(10, 15)],
+        )
+
+
+class PricingTierTests(SimpleTestCase):
+    def setUp(self):
+        self.tiers = PricingTiers(
+            [
+                {"from": 0.8, "multiplier": "1.20"},
+                {"from": 0.3, "multiplier": "1"},
+                {"from": 0.1, "multiplier": "0.90"},
+            ]
+        )
+
+    def test_base_price_below_the_first_tier(self):
+        self.assertEqual(self.tiers.multiplier(0.05), Decimal(1))
+
+    def test_tier_applies_from_its_start_to_the_next(self):
+        self.assertEqual(self.tiers.multiplier(0.1), Decimal("0.90"))
+        self.assertEqual(self.tiers.multiplier(0.79), Decimal("1"))
+        self.assertEqual(self.tiers.multiplier(1.0), Decimal("1.20"))
+
+    def test_price_is_rounded_to_the_cent(self):
+        self.assertEqual(self.tiers.price_per_slot(Decimal("10.05"), 0.2), Decimal("9.05"))
+
+    def test_invalid_tiers_are_rejected(self):
+        for tiers in (
+            {"from": 0, "multiplier": 1},
+            [{"from": 0}],
+            [{"from": 1, "multiplier": "1.2"}],
+            [{"from": 0.5, "multiplier": "0"}],
+            [{"from": 0.5, "multiplier": "1"}, {"from": 0.5, "multiplier": "2"}],
+            [{"from": "x", "multiplier": "1"}],
+        ):
+            with self.subTest(tiers=tiers), self.assertRaises(ValidationError):
+                validate_pricing_tiers(tiers)
+
+
+class QuotePriceTests(TestCase):
+    def setUp(self):
+        # 10:00-12:00 is four of the day's 30-minute slots
+        self.room = make_room(
+            opening_time=time(10, 0),
+            closing_time=time(12, 0),
+            pricing_tiers=[{"from": 0.5, "multiplier": "1.50"}],
+        )
+        self.user = make_user()
+        self.day = date.today() + timedelta(days=1)
+
+    def test_quiet_day_is_priced_at_base(self):
+        quote = quote_price(self.room, self.day, time(10, 0), time(11, 0))
+
+        self.assertEqual(quote.occupancy, 0)
+        self.assertEqual(quote.total_amount, Decimal("20.00"))
+
+    def hold(self, start_time, end_time):
+        booking = make_booking(self.user, self.room, self.day, start_time, end_time)
+        record_status_changes([status_change_for(booking, None)])
+        return booking
+
+    def test_held_slots_raise_the_price(self):
+        self.hold(time(10, 0), time(11, 0))
+
+        with self.assertNumQueries(1):
+            quote = quote_price(self.room, self.day, time(11, 0), time(12, 0))
+
+        self.assertEqual(quote.occupancy, 0.5)
+        self.assertEqual(quote.price_per_slot, Decimal("15.00"))
+        self.assertEqual(quote.total_amount, Decimal("30.00"))
+
+    def test_released_slots_stop_counting(self):
+        booking = self.hold(time(10, 0), time(11, 0))
+        bulk_transition_bookings([booking.id], "cancelled")
+
+        self.assertEqual(quote_price(self.room, self.day, time(11, 0), time(12, 0)).occupancy, 0)
+        self.assertEqual(DayOccupancy.objects.get(room=self.room).slots_taken, 0)
+
+    @override_settings(ROOM_PRICING_TIERS=[])
+    def test_room_without_tiers_uses_the_default(self):
+        room = make_room(name="Room B", opening_time=time(10, 0), closing_time=time(11, 0))
+        make_booking(self.user, room, self.day, time(10, 0), time(10, 30), number_of_slots=1)
+
+        self.assertEqual(quote_price(room, self.day, time(10, 30), time(11, 0)).multiplier, 1)
+
+
+class ErrorResponseTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_unexpected_errors_are_logged_not_returned(self):
+        room = make_room()
+        params = {"booking_date": "2030-01-07", "start_time": "09:00:00", "end_time": "10:00:00"}
+
+        with mock.patch("apps.core.views.quote_price", side_effect=RuntimeError("db password")):
+            with self.assertLogs("apps.core.views", "ERROR") as logs:
+                response = self.client.get(f"/api/rooms/{room.id}/quote/", params)
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.data, {"error": "Failed to quote price"})
+        self.assertIn("db password", logs.output[0])
+
+    def test_malformed_login_body_is_a_client_error(self):
+        response = self.client.post(
+            "/api/login/", "{not json", content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        starts_at = datetime(2026, 7, 1, 7, 0, tzinfo=dt_timezone.utc)
+
+        self.assertEqual(decode_cursor(encode_cursor([starts_at, 42])), [starts_at.isoformat(), 42])
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in ("not base64!", encode_cursor([1])[:-4] + "}}}}", "eyJhIjogMX0="):
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+
+class MyBookingsTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # UTC+14, so the room's date is usually ahead of the UTC date
+        self.room = make_room(
+            timezone="Pacific/Kiritimati", opening_time=time(0, 0), closing_time=time(23, 30)
+        )
+
+    def book_at(self, starts_at):
+        local = starts_at.astimezone(self.room.clock.tz)
+        start = local.time().replace(minute=local.minute // 30 * 30, second=0, microsecond=0)
+        end = time(start.hour, start.minute + 29)
+        return make_booking(self.user, self.room, local.date(), start, end)
+
+    def test_split_by_start_instant(self):
+        now = timezone.now()
+        started = self.book_at(now - timedelta(hours=2))
+        upcoming = self.book_at(now + timedelta(hours=2))
+
+        upcoming_ids = [b["id"] for b in self.client.get("/api/bookings/mine/").data["bookings"]]
+        past_ids = [
+            b["id"]
+            for b in self.client.get("/api/bookings/mine/", {"when": "past"}).data["bookings"]
+        ]
+
+        self.assertEqual(upcoming_ids, [upcoming.id])
+        self.assertEqual(past_ids, [started.id])
+
+    def test_pages_follow_the_cursor(self):
+        now = timezone.now()
+        bookings = [self.book_at(now + timedelta(days=days)) for days in (3, 1, 2)]
+
+        first = self.client.get("/api/bookings/mine/", {"limit": 2}).data
+        second = self.client.get(
+            "/api/bookings/mine/", {"limit": 2, "cursor": first["next_cursor"]}
+        ).data
+
+        self.assertEqual(
+            [b["id"] for b in first["bookings"] + second["bookings"]],
+            [bookings[1].id, bookings[2].id, bookings[0].id],
+        )
+        self.assertIsNone(second["next_cursor"])
+
+    def test_invalid_cursor_is_rejected(self):
+        naive = encode_cursor([datetime(2026, 7, 1, 7, 0), 1])
+
+        for cursor in ("abc", naive, encode_cursor(["2026-07-01", "09:00", 1])):
+            with self.subTest(cursor=cursor):
+                response = self.client.get("/api/bookings/mine/", {"cursor": cursor})
+                self.assertEqual(response.status_code, 400)
+
+
+class RoomImportTests(TestCase):
+    def test_csv_rows_drop_empty_cells(self):
+        rows = list(read_rows(io.StringIO("code,name,capacity\nr1,Room 1,\n"), "csv"))
+
+        self.assertEqual(rows, [(1, {"code": "r1", "name": "Room 1"})])
+
+    def test_jsonl_rows_skip_blank_lines_and_keep_bad_json(self):
+        rows = list(read_rows(io.StringIO('{"code": "r1"}\n\nnot json\n'), "jsonl"))
+
+        self.assertEqual(rows[0], (1, {"code": "r1"}))
+        self.assertEqual(rows[1][0], 2)
+        self.assertIsInstance(rows[1][1], ValueError)
+
+    def rows(self, *rooms):
+        base = {"name": "Room", "description": "d", "price_per_slot": "10", "capacity": 4}
+        return [(number, {**base, **room}) for number, room in enumerate(rooms, start=1)]
+
+    def test_invalid_row_rolls_back_the_import(self):
+        rows = self.rows(
+            {"code": "r1"},
+            {"code": "r2", "opening_time": "18:00", "closing_time": "09:00"},
+            {"code": "r3", "timezone": "Mars/Base"},
+        ) + [(4, [1, 2])]
+
+        with self.assertRaises(RoomImportError) as raised:
+            import_rooms(iter(rows))
+
+        report = raised.exception.report
+        self.assertEqual(report["failed"], 3)
+        self.assertEqual([error["row"] for error in report["errors"]], [2, 3, 4])
+        self.assertFalse(Room.objects.filter(code="r1").exists())
+
+    def test_partial_import_keeps_valid_rows(self):
+        rows = self.rows({"code": "r1"}, {"code": "r2", "capacity": "many"})
+
+        report = import_rooms(iter(rows), partial=True)
+
+        self.assertEqual((report["created"], report["failed"]), (1, 1))
+        self.assertTrue(Room.objects.filter(code="r1").exists())
+
+    def test_rows_are_upserted_by_code(self):
+        room = make_room(code="r1")
+        booking = make_booking(make_user(), room, date.today(), time(9, 0), time(10, 0))
+        refresh_booking_details([booking.id])
+
+        report = import_rooms(iter(self.rows({"code": "r1", "name": "Renamed"}, {"code": "r2"})))
+
+        room.refresh_from_db()
+        self.assertEqual((report["created"], report["updated"]), (1, 1))
+        self.assertEqual(room.name, "Renamed")
+        self.assertEqual(get_booking_details([booking.id])[booking.id]["room_name"], "Renamed")
+
+
+class FakeStripeTestMixin:
+    def setUp(self):
+        super().setUp()
+        FakeStripeGateway.failures = 0
+        FakeStripeGateway.intents = {}
+        self.addCleanup(setattr, FakeStripeGateway, "intents", {})
+        self.addCleanup(setattr, FakeStripeGateway, "failures", 0)
+        self.gateway = FakeStripeGateway()
+
+
+class OutboxTests(FakeStripeTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.room = make_room()
+        self.booking = make_booking(
+            make_user(),
+            self.room,
+            date.today() + timedelta(days=1),
+            time(9, 0),
+            time(10, 0),
+            payment_status="processing",
+        )
+        self.entry = create_leased_entry(self.booking, "usd")
+
+    def test_delivery_stores_the_payment(self):
+        entry = deliver_entry(self.entry, self.gateway)
+
+        self.assertEqual(entry.status, "succeeded")
+        self.assertEqual(entry.attempts, 1)
+        payment = Payment.objects.get(booking=self.booking)
+        self.assertEqual(payment.stripe_payment_intent_id, entry.stripe_payment_intent_id)
+        self.assertEqual(payment.amount, Decimal("20.00"))
+        details = get_booking_details([self.booking.id])[self.booking.id]
+        self.assertEqual(details["payment"]["payment_intent_id"], payment.stripe_payment_intent_id)
+
+    def test_transient_failure_is_retried_with_the_same_intent(self):
+        FakeStripeGateway.failures = 1
+
+        with self.assertLogs("apps.core.outbox", "WARNING"):
+            entry = deliver_entry(self.entry, self.gateway)
+
+        self.assertEqual((entry.status, entry.attempts), ("pending", 1))
+        self.assertGreater(entry.next_attempt_at, timezone.now())
+        self.assertFalse(Payment.objects.exists())
+
+        PaymentIntentOutbox.objects.filter(id=entry.id).update(next_attempt_at=timezone.now())
+        self.assertEqual(claim_due_entries(10), [entry.id])
+        entry = PaymentIntentOutbox.objects.select_related("booking__room").get(id=entry.id)
+        entry = deliver_entry(entry, self.gateway)
+
+        self.assertEqual((entry.status, entry.attempts), ("succeeded", 2))
+        self.assertEqual(len(FakeStripeGateway.intents), 1)
+
+    def test_last_attempt_fails_the_booking_payment(self):
+        PaymentIntentOutbox.objects.filter(id=self.entry.id).update(attempts=MAX_ATTEMPTS - 1)
+        self.entry.attempts = MAX_ATTEMPTS - 1
+        FakeStripeGateway.failures = 1
+
+        with self.assertLogs("apps.core.outbox", "WARNING"):
+            entry = deliver_entry(self.entry, self.gateway)
+
+        self.booking.refresh_from_db()
+        self.assertEqual(entry.status, "failed")
+        self.assertEqual(self.booking.payment_status, "failed")
+
+    def test_entry_claimed_again_is_left_to_the_new_lease(self):
+        # Another worker took the entry over after this lease ran out
+        PaymentIntentOutbox.objects.filter(id=self.entry.id).update(
+            next_attempt_at=self.entry.next_attempt_at + timedelta(seconds=60)
+        )
+
+        entry = deliver_entry(self.entry, self.gateway)
+
+        self.assertEqual((entry.status, entry.attempts), ("processing", 0))
+        self.assertFalse(Payment.objects.exists())
+
+    def test_intent_of_an_entry_failed_meanwhile_is_cancelled(self):
+        # The hold expired while Stripe was being called
+        PaymentIntentOutbox.objects.filter(id=self.entry.id).update(status="failed")
+
+        entry = deliver_entry(self.entry, self.gateway)
+
+        self.assertEqual(entry.status, "failed")
+        self.assertFalse(Payment.objects.exists())
+        (intent,) = FakeStripeGateway.intents.values()
+        self.assertEqual(intent["status"], "canceled")
+
+    def test_claim_skips_entries_not_yet_due(self):
+        self.assertEqual(claim_due_entries(10), [])
+
+
+class WebhookOrderingTests(TestCase):
+    def setUp(self):
+        self.room = make_room()
+        self.booking = make_booking(
+            make_user(),
+            self.room,
+            date.today() + timedelta(days=1),
+            time(9, 0),
+            time(10, 0),
+            payment_status="processing",
+            hold_expires_at=timezone.now() + timedelta(minutes=30),
+        )
+        Payment.objects.create(
+            booking=self.booking,
+            stripe_payment_intent_id="pi_1",
+            amount=Decimal("20.00"),
+            status="requires_payment_method",
+        )
+
+    def apply(self, *event_types):
+        with transaction.atomic():
+            return apply_payment_events(
+                [(f"payment_intent.{event_type}", {"id": "pi_1"}) for event_type in event_types]
+            )
+
+    def assert_booking(self, status, payment_status):
+        self.booking.refresh_from_db()
+        self.assertEqual(
+            (self.booking.status, self.booking.payment_status), (status, payment_status)
+        )
+
+    def test_success_after_failure_confirms(self):
+        self.assertEqual(self.apply("payment_failed", "succeeded"), 2)
+
+        self.assert_booking("confirmed", "succeeded")
+
+    def test_cancellation_after_success_leaves_the_booking_confirmed(self):
+        with self.assertLogs("apps.core.webhooks", "WARNING"):
+            self.apply("succeeded", "canceled")
+
+        self.assert_booking("confirmed", "succeeded")
+        self.assertEqual(Payment.objects.get(booking=self.booking).status, "succeeded")
+
+    def test_late_failure_does_not_downgrade_a_succeeded_payment(self):
+        self.apply("succeeded")
+
+        with self.assertLogs("apps.core.webhooks", "WARNING"):
+            applied = self.apply("payment_failed")
+
+        self.assertEqual(applied, 0)
+        self.assert_booking("confirmed", "succeeded")
+        self.assertEqual(Payment.objects.get(booking=self.booking).status, "succeeded")
+
+    def test_success_for_an_expired_booking_is_kept_for_refund(self):
+        Booking.objects.filter(id=self.booking.id).update(status="expired", payment_status="failed")
+
+        with self.assertLogs("apps.core.webhooks", "WARNING") as logs:
+            self.apply("succeeded")
+
+        self.assertIn("refund needed", logs.output[0])
+        self.assert_booking("expired", "succeeded")
+
+    def test_unknown_intent_is_skipped(self):
+        with transaction.atomic():
+            applied = apply_payment_events([("payment_intent.succeeded", {"id": "pi_other"})])
+
+        self.assertEqual(applied, 0)
+        self.assert_booking("pending", "processing")
+
+    def test_stored_events_apply_in_arrival_order(self):
+        def event(event_id, event_type):
+            return {"id": event_id, "type": event_type, "data": {"object": {"id": "pi_1"}}}
+
+        store_event(event("evt_1", "payment_intent.payment_failed"))
+        store_event(event("evt_2", "payment_intent.succeeded"))
+        # A redelivered event is stored once
+        store_event(event("evt_1", "payment_intent.payment_failed"))
+
+        self.assertEqual(process_pending_events(), 2)
+        self.assertEqual(process_pending_events(), 0)
+        self.assert_booking("confirmed", "succeeded")
+
+
+class BookingDetailTests(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.booking = make_booking(
+            self.user, make_room(), date.today() + timedelta(days=1), time(9, 0), time(10, 0)
+        )
+        refresh_booking_details([self.booking.id])
+
+    def test_other_users_booking_is_not_returned(self):
+        other = make_user("other")
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_booking_details([self.booking.id], user=other), {})
+        self.assertIn(self.booking.id, get_booking_details([self.booking.id], user=self.user))
+
+    def test_email_change_refreshes_the_users_details(self):
+        self.user.email = "new@example.com"
+        self.user.save()
+
+        details = get_booking_details([self.booking.id])[self.booking.id]
+        self.assertEqual(details["user_email"], "new@example.com")
+
+    def test_login_does_not_read_the_details(self):
+        self.user.last_login = timezone.now()
+
+        with self.assertNumQueries(1):
+            self.user.save(update_fields=["last_login"])
+
+
+class BookingAdminTests(TestCase):
+    def setUp(self):
+        self.model_admin = BookingAdmin(Booking, admin.site)
+        self.request = RequestFactory().get("/")
+        self.request.user = User.objects.create_superuser("root", "root@example.com", "pw")
+
+    def test_status_is_read_only_on_existing_bookings(self):
+        booking = make_booking(
+            make_user(), make_room(), date.today() + timedelta(days=1), time(9, 0), time(10, 0)
+        )
+
+        readonly = self.model_admin.get_readonly_fields(self.request, booking)
+        self.assertIn("status", readonly)
+        self.assertIn("start_time", readonly)
+        self.assertNotIn("status", self.model_admin.get_readonly_fields(self.request))
+
+    def test_added_booking_is_logged(self):
+        booking = Booking(
+            user=make_user(),
+            room=make_room(),
+            booking_date=date.today() + timedelta(days=1),
+            start_time=time(9, 0),
+            end_time=time(10, 0),
+            guest_count=1,
+            total_amount=Decimal("20.00"),
+            number_of_slots=2,
+            status="confirmed",
+            payment_status="succeeded",
+        )
+        form = self.model_admin.get_form(self.request)()
+        form.changed_data = ["status"]
+
+        self.model_admin.save_model(self.request, booking, form, change=False)
+
+        event = BookingEvent.objects.get(booking_id=booking.id)
+        self.assertEqual((event.old_status, event.new_status), (None, "confirmed"))
+        self.assertEqual(get_booking_details([booking.id])[booking.id]["status"], "confirmed")
+
+
+class RoomAdminSearchTests(TestCase):
+    def setUp(self):
+        self.model_admin = RoomAdmin(Room, admin.site)
+        self.request = RequestFactory().get("/")
+        self.conference = make_room(name="Conference Hall", code="hall-east")
+        self.studio = make_room(name="Podcast Studio", description="Soundproofed booth")
+
+    def search(self, term):
+        queryset, _ = self.model_admin.get_search_results(self.request, Room.objects.all(), term)
+        return set(queryset)
+
+    def test_whole_words_match(self):
+        self.assertEqual(self.search("soundproofed"), {self.studio})
+
+    def test_partial_words_match(self):
+        self.assertEqual(self.search("conf"), {self.conference})
+        self.assertEqual(self.search("podc stu"), {self.studio})
+        self.assertEqual(self.search("hall-e"), {self.conference})
+
+    def test_query_syntax_is_not_passed_through(self):
+        self.assertEqual(self.search("conf & | !("), {self.conference})
@@ -0,0 +1,100 @@
+"""
+Hierarchical timing wheel for in-process timers keyed by id
+"""
+import math
+
+
+class TimingWheel:
+    """
+    Timers on a hierarchy of wheels, each ``slots`` buckets wide.
+
+    A level 0 bucket holds the timers due in one tick. Each bucket one level
+    up spans a full turn of the level below, and its timers cascade down
+    when the wheel reaches it. Scheduling, cancelling and firing are O(1)
+    per timer however many are pending, so a worker can track every hold
+    without scanning them. Rescheduling a key keeps only its latest
+    deadline; the stale copy left in its old bucket is skipped when reached.
+
+    Deadlines are seconds since the epoch. A timer is never reported before
+    its deadline, and at most one tick after the wheel is advanced past it.
+    """
+
+    def __init__(self, now, tick_seconds=1.0, slots=64, levels=4):
+        self.tick_seconds = tick_seconds
+        self.slots = slots
+        self.levels = levels
+        self.wheels = [[set() for _ in range(slots)] for _ in range(levels)]
+        self.deadlines = {}
+        self.current = math.floor(now / tick_seconds)
+        self._due = set()
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def __contains__(self, key):
+        return key in self.deadlines
+
+    def schedule(self, key, deadline):
+        tick = math.ceil(deadline / self.tick_seconds)
+        self.deadlines[key] = tick
+        self._place(key, tick)
+
+    def cancel(self, key):
+        self.deadlines.pop(key, None)
+
+    def _place(self, key, tick):
+        if tick <= self.current:
+            self._due.add(key)
+            return
+
+        # The lowest level whose current turn still contains the deadline
+        for level in range(self.levels):
+            span = self.slots ** (level + 1)
+            if tick // span == self.current // span:
+                break
+        else:
+            level = self.levels - 1
+            span = self.slots**level
+            if tick // span - self.current // span >= self.slots:
+                # More than a full top turn away: park in the top bucket
+                # reached last, which cascades and places it again in time
+                self.wheels[level][(self.current // span - 1) % self.slots].add(key)
+                return
+
+        self.wheels[level][(tick // self.slots**level) % self.slots].add(key)
+
+    def advance(self, now):
+        """Move the wheel to ``now`` and return the keys that are due"""
+        target = math.floor(now / self.tick_seconds)
+        if not self.deadlines:
+            self.current = max(self.current, target)
+            self._due.clear()
+            return []
+
+        while self.current < target:
+            self.current += 1
+
+            # Cascade from the top so timers can fall through several levels
+            for level in range(self.levels - 1, 0, -1):
+                if self.current % self.slots**level:
+                    continue
+                index = (self.current // self.slots**level) % self.slots
+                bucket, self.wheels[level][index] = self.wheels[level][index], set()
+                for key in bucket:
+                    if key in self.deadlines:
+                        self._place(key, self.deadlines[key])
+
+            index = self.current % self.slots
+            self._due.update(self.wheels[0][index])
+            self.wheels[0][index] = set()
+
+        due = [
+            key
+            for key in self._due
+            if key in self.deadlines and self.deadlines[key] <= self.current
+        ]
+        # Keys fired or rescheduled later are dropped; later ones sit in another bucket
+        self._due.clear()
+        for key in due:
+            del self.deadlines[key]
+        return due
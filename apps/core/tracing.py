@@ -0,0 +1,251 @@
+"""
+Request tracing: timed spans around the booking path, the ORM and Stripe
+
+Spans follow the OpenTelemetry model (a trace of nested spans with W3C
+``traceparent`` ids) without requiring an OpenTelemetry SDK or collector.
+TracingMiddleware starts a trace per request, sampled at
+settings.TRACING_SAMPLE_RATE or as the caller's ``traceparent`` asks, and
+hands each finished trace to the exporter named in settings.TRACING_EXPORTER.
+
+Only sampled requests pay for tracing: ``span()`` outside a sampled trace
+returns at once, and queries are wrapped with ``connection.execute_wrapper``
+only while a sampled request runs.
+"""
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+# Characters of SQL kept on a query span
+MAX_STATEMENT_LENGTH = 500
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_span = ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, trace, name, parent_id, attributes):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = "ok"
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    @property
+    def duration_ms(self):
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_exception(self, error):
+        self.status = "error"
+        self.attributes["exception.type"] = type(error).__name__
+        self.attributes["exception.message"] = str(error)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """The finished spans of one sampled request, root span last"""
+
+    def __init__(self, trace_id):
+        self.trace_id = trace_id
+        self.spans = []
+
+    def to_dict(self):
+        return {"trace_id": self.trace_id, "spans": [span.to_dict() for span in self.spans]}
+
+
+class ConsoleExporter:
+    """Prints each trace as an indented tree of span durations to stderr"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        children = {}
+        for span in trace.spans:
+            children.setdefault(span.parent_id, []).append(span)
+        root = trace.spans[-1]
+
+        lines = [f"trace {trace.trace_id}"]
+
+        def walk(span, depth):
+            error = " [error]" if span.status == "error" else ""
+            label = span.attributes.get("db.statement", "")[:80] if span.name == "db.query" else ""
+            lines.append(f"{span.duration_ms:>10.2f} ms  {'  ' * depth}{span.name}{error} {label}".rstrip())
+            for child in sorted(children.get(span.span_id, []), key=lambda child: child.start_ns):
+                walk(child, depth + 1)
+
+        walk(root, 0)
+        with self._lock:
+            sys.stderr.write("\n".join(lines) + "\n")
+
+
+class FileExporter:
+    """Appends each trace as a JSON line to settings.TRACING_FILE"""
+
+    def __init__(self):
+        self.path = settings.TRACING_FILE
+        self._lock = threading.Lock()
+
+    def export(self, trace):
+        line = json.dumps(trace.to_dict(), default=str) + "\n"
+        with self._lock, open(self.path, "a") as f:
+            f.write(line)
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter():
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = import_string(settings.TRACING_EXPORTER)()
+    return _exporter
+
+
+def current_span():
+    return _current_span.get()
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time the enclosed block as a child of the current span.
+
+    Yields the Span, or None when the current request is not sampled.
+    An exception escaping the block marks the span as failed.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.record_exception(e)
+        raise
+    finally:
+        child.end_ns = time.time_ns()
+        _current_span.reset(token)
+        parent.trace.spans.append(child)
+
+
+def _trace_queries(execute, sql, params, many, context):
+    with span("db.query", **{"db.statement": sql[:MAX_STATEMENT_LENGTH], "db.many": many}):
+        return execute(sql, params, many, context)
+
+
+def _sampling_decision(traceparent):
+    """(sampled, trace id, parent span id) from an incoming traceparent or the sample rate"""
+    match = _TRACEPARENT.match(traceparent or "")
+    if match:
+        trace_id, parent_id, flags = match.groups()
+        return bool(int(flags, 16) & 1), trace_id, parent_id
+    sampled = random.random() < settings.TRACING_SAMPLE_RATE
+    return sampled, os.urandom(16).hex(), None
+
+
+class TracingMiddleware:
+    """
+    Trace sampled requests from the first middleware to the rendered response.
+
+    The root span is named after the resolved URL route. A sampled response
+    carries the trace id in X-Trace-Id so a slow request can be found in the
+    exported traces.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sampled, trace_id, parent_id = _sampling_decision(request.headers.get("traceparent"))
+        if not sampled:
+            return self.get_response(request)
+
+        root = Span(
+            Trace(trace_id),
+            f"HTTP {request.method}",
+            parent_id,
+            {"http.method": request.method, "http.target": request.path},
+        )
+        token = _current_span.set(root)
+        try:
+            with connection.execute_wrapper(_trace_queries):
+                response = self.get_response(request)
+        except BaseException as e:
+            root.record_exception(e)
+            raise
+        else:
+            root.set_attribute("http.status_code", response.status_code)
+            if response.status_code >= 500:
+                root.status = "error"
+            response["X-Trace-Id"] = trace_id
+            return response
+        finally:
+            _current_span.reset(token)
+            match = getattr(request, "resolver_match", None)
+            if match is not None:
+                root.name = f"HTTP {request.method} /{match.route}"
+            root.end_ns = time.time_ns()
+            root.trace.spans.append(root)
+            try:
+                get_exporter().export(root.trace)
+            except Exception:
+                # A failing exporter must not fail the request it traced
+                logger.exception("Exporting trace %s failed", trace_id)
+
+
+def summarize_traces(lines):
+    """
+    Span durations of exported JSON line traces, grouped by route.
+
+    Returns {root span name: {span name: sorted durations in ms}}; query
+    spans are grouped as "db.query" whatever their statement.
+    """
+    summary = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        spans = json.loads(line)["spans"]
+        route = summary.setdefault(spans[-1]["name"], {})
+        for span_data in spans:
+            route.setdefault(span_data["name"], []).append(span_data["duration_ms"])
+    for route in summary.values():
+        for durations in route.values():
+            durations.sort()
+    return summary
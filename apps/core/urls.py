@@ -9,9 +9,40 @@ urlpatterns = [
     path("token/refresh-cookie/", views.refresh_access_token, name="refresh_access_token"),
     # Booking Service APIs
     path("rooms/", views.list_rooms, name="list_rooms"),
+    path("rooms/search/", views.search_rooms, name="search_rooms"),
+    path("rooms/import/", views.import_rooms, name="import_rooms"),
+    path("rooms/<int:room_id>/calendar/", views.get_room_calendar, name="get_room_calendar"),
+    path("rooms/<int:room_id>/quote/", views.get_price_quote, name="get_price_quote"),
+    path(
+        "rooms/<int:room_id>/availability/stream/",
+        views.availability_stream,
+        name="availability_stream",
+    ),
     path("bookings/", views.create_booking, name="create_booking"),
     path("bookings/all/", views.get_all_bookings, name="get_all_bookings"),
+    path("bookings/mine/", views.get_my_bookings, name="get_my_bookings"),
+    path("bookings/batch/", views.get_bookings_batch, name="get_bookings_batch"),
+    path("bookings/bulk-status/", views.bulk_update_booking_status, name="bulk_update_booking_status"),
     path("bookings/<int:booking_id>/", views.get_booking, name="get_booking"),
+    path(
+        "bookings/<int:booking_id>/heartbeat/",
+        views.booking_heartbeat,
+        name="booking_heartbeat",
+    ),
+    path("booking-groups/", views.create_booking_group, name="create_booking_group"),
+    path("booking-groups/<int:group_id>/", views.get_booking_group, name="get_booking_group"),
+    path(
+        "booking-groups/<int:group_id>/payment-intent/",
+        views.create_group_payment_intent,
+        name="create_group_payment_intent",
+    ),
+    path("waitlist/", views.waitlist, name="waitlist"),
+    path("waitlist/<int:entry_id>/", views.leave_waitlist, name="leave_waitlist"),
     path("payment-intent/", views.create_payment_intent, name="create_payment_intent"),
+    path("payment-intent/<int:booking_id>/", views.get_payment_intent, name="get_payment_intent"),
     path("stripe-webhook/", views.stripe_webhook, name="stripe_webhook"),
+    # Analytics APIs
+    path("analytics/utilization/", views.get_utilization, name="get_utilization"),
+    path("analytics/daily/", views.get_daily_stats, name="get_daily_stats"),
+    path("analytics/rejections/", views.get_rejected_requests, name="get_rejected_requests"),
 ]
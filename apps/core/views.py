@@ -4,24 +4,43 @@ import os
 import stripe
 from decimal import Decimal
 from rest_framework.decorators import api_view
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
-from .models import Room, Booking, Payment
+from .models import (
+    Room,
+    Booking,
+    BookingGroup,
+    ArchivedBooking,
+    Payment,
+    PaymentIntentOutbox,
+    WaitlistEntry,
+)
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import status
 from rest_framework.permissions import AllowAny
-from pydantic import ValidationError
 from .schemas import (
     RoomSchema,
     BookingCreateSchema,
+    BookingGroupCreateSchema,
+    BookingGroupPaymentSchema,
     BookingResponseSchema,
+    BookingBulkStatusSchema,
+    BookingBatchQuerySchema,
+    BookingHistoryQuerySchema,
+    AnalyticsQuerySchema,
+    CalendarQuerySchema,
+    PriceQuoteQuerySchema,
+    RoomSearchQuerySchema,
     PaymentIntentCreateSchema,
     PaymentIntentResponseSchema,
     ErrorResponseSchema,
@@ -29,17 +48,44 @@ from .schemas import (
 from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, datetime, time
+import asyncio
+import codecs
+import csv
+import json
+import logging
+from asgiref.sync import sync_to_async
+from . import room_import, search, tracing, webhooks
+from .booking_details import detail_data, get_booking_details, write_new_booking_details
+from .groups import GroupBookingRejected, create_group_booking, pay_group
+from .holds import extend_hold, hold_deadline
+from .ratelimit import limit_room_concurrency, rate_limit
+from .validation import rejection_counts, validate_body, validate_query
+from .availability import calendar_etag, room_calendar
+from .paginators import decode_cursor, encode_cursor, keyset_after
+from .outbox import create_leased_entry, deliver_entry, enqueue_payment_intent
+from .realtime import get_broadcaster, stream_key
+from .rollups import daily_stats, utilization_summary
+from .services import (
+    ACTIVE_STATUSES,
+    bulk_transition_bookings,
+    check_time_slot_overlap,
+    quote_price,
+    record_status_changes,
+    reserve_seats,
+    seats_left,
+    status_change_for,
+)
+
+logger = logging.getLogger(__name__)
 
 # Initialize Stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
-# Booking hold time in minutes
-BOOKING_HOLD_MINUTES = 30
-
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@rate_limit("register", key="ip")
 def register_user(request):
     email = request.data.get("email")
     password = request.data.get("password")
@@ -71,17 +117,18 @@ def register_user(request):
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@rate_limit("login", key="ip")
 def login_with_email(request):
-    try:
-        email = request.data.get("email")
-        password = request.data.get("password")
+    email = request.data.get("email")
+    password = request.data.get("password")
 
-        if not email or not password:
-            return Response(
-                {"error": "Email and password are required."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+    if not email or not password:
+        return Response(
+            {"error": "Email and password are required."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
+    try:
         try:
             user = User.objects.get(email=email)
         except User.DoesNotExist:
@@ -122,9 +169,10 @@ def login_with_email(request):
                 {"error": "Invalid email or password"},
                 status=status.HTTP_401_UNAUTHORIZED,
             )
-    except Exception as e:
+    except Exception:
+        logger.exception("Login failed")
         return Response(
-            {"error": "Login failed", "detail": str(e)},
+            {"error": "Login failed"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
 
@@ -136,22 +184,15 @@ def logout_user(request):
     Logout user by clearing refresh token cookie
     POST /api/logout
     """
-    try:
-        response = Response(
-            {"message": "Logout successful"},
-            status=status.HTTP_200_OK
-        )
-
-        # Clear refresh token cookie
-        response.delete_cookie('refresh_token')
+    response = Response(
+        {"message": "Logout successful"},
+        status=status.HTTP_200_OK
+    )
 
-        return response
+    # Clear refresh token cookie
+    response.delete_cookie('refresh_token')
 
-    except Exception as e:
-        return Response(
-            {"error": "Logout failed", "detail": str(e)},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
+    return response
 
 
 @api_view(["POST"])
@@ -183,9 +224,9 @@ def refresh_access_token(request):
             status=status.HTTP_200_OK
         )
 
-    except Exception as e:
+    except TokenError:
         return Response(
-            {"error": "Token refresh failed", "detail": str(e)},
+            {"error": "Token refresh failed"},
             status=status.HTTP_401_UNAUTHORIZED
         )
 
@@ -203,70 +244,348 @@ def list_rooms(request):
     GET /api/rooms
     """
     try:
-        rooms_data = list(Room.objects.filter(is_available=True).values())
+        rooms_data = list(Room.objects.filter(is_available=True).values(*search.ROOM_FIELDS))
 
         return Response(
             {"count": len(rooms_data), "rooms": rooms_data}, status=status.HTTP_200_OK
         )
 
-    except Exception as e:
+    except Exception:
+        logger.exception("Failed to fetch rooms")
+        return Response(
+            {"error": "Failed to fetch rooms"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@validate_query(RoomSearchQuerySchema)
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def search_rooms(request):
+    """
+    Search available rooms by name, amenities and description
+    GET /api/rooms/search?q=projector whiteboard&limit=20
+
+    Words are matched full-text (quoted phrases, "or" and -word are
+    supported) and ranked name first. When nothing matches, rooms with a
+    similarly spelled name are returned instead and match is "fuzzy".
+    """
+    try:
+        query = request.validated
+        match, rooms_data = search.search_rooms(query.q, query.limit)
+
+        return Response(
+            {"query": query.q, "match": match, "count": len(rooms_data), "rooms": rooms_data},
+            status=status.HTTP_200_OK,
+        )
+
+    except Exception:
+        logger.exception("Failed to search rooms")
         return Response(
-            {"error": "Failed to fetch rooms", "detail": str(e)},
+            {"error": "Failed to search rooms"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
 
 
-def calculate_slots_and_amount(start_time, end_time, room):
-    """Calculate number of slots and total amount based on time range"""
-    from datetime import datetime, timedelta
+# Request content types accepted by the room import
+ROOM_IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+}
 
-    # Convert times to datetime for calculation
-    start_dt = datetime.combine(datetime.today(), start_time)
-    end_dt = datetime.combine(datetime.today(), end_time)
 
-    # Calculate duration in minutes
-    duration_minutes = (end_dt - start_dt).total_seconds() / 60
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def import_rooms(request):
+    """
+    Create or update many rooms from CSV or JSON Lines, keyed by room code (Staff/Admin only)
+    POST /api/rooms/import?partial=true
+    Content-Type: text/csv (header row of room fields) or application/x-ndjson
+    (one room object per line). CSV amenities are separated by semicolons.
+
+    The body is streamed and upserted in chunks. Any invalid row rolls back
+    the whole import unless partial=true, which keeps the valid rows. Either
+    way the response lists the errors per row number.
+    """
+    try:
+        if not request.user.is_staff:
+            return Response(
+                {"error": "Permission denied. Admin access required."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
 
-    # Calculate number of slots (each slot is room.slot_duration_minutes)
-    number_of_slots = int(duration_minutes / room.slot_duration_minutes)
+        fmt = ROOM_IMPORT_CONTENT_TYPES.get(request.content_type.split(";")[0].strip())
+        if fmt is None:
+            return Response(
+                {"error": f"Content-Type must be one of {', '.join(ROOM_IMPORT_CONTENT_TYPES)}"},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        if request.stream is None:
+            return Response(
+                {"error": "Request body is empty"}, status=status.HTTP_400_BAD_REQUEST
+            )
 
-    # Calculate total amount
-    total_amount = room.price_per_slot * number_of_slots
+        partial = request.GET.get("partial", "").lower() in ("1", "true", "yes")
+        # Decode line by line; utf-8-sig also accepts spreadsheet exports with a BOM
+        lines = codecs.iterdecode(request.stream, "utf-8-sig")
 
-    return number_of_slots, total_amount
+        try:
+            report = room_import.import_rooms(room_import.read_rows(lines, fmt), partial=partial)
+        except room_import.RoomImportError as e:
+            return Response(
+                {"error": "Import has invalid rows, nothing was imported", **e.report},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except (UnicodeDecodeError, csv.Error) as e:
+            return Response(
+                {"error": "Malformed import file", "detail": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
+        return Response(report, status=status.HTTP_200_OK)
 
-def check_time_slot_overlap(
-    room, booking_date, start_time, end_time, exclude_booking_id=None
-):
-    """Check if the requested time slot overlaps with existing bookings"""
-    from datetime import datetime
+    except Exception:
+        logger.exception("Failed to import rooms")
+        return Response(
+            {"error": "Failed to import rooms"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
 
-    # Get all confirmed or pending bookings for this room on this date
-    bookings = Booking.objects.filter(
-        room=room, booking_date=booking_date, status__in=["pending", "confirmed"]
-    )
 
-    if exclude_booking_id:
-        bookings = bookings.exclude(id=exclude_booking_id)
+def _calendar_etag(request, room_id):
+    query = request.validated
+    return calendar_etag(room_id, query.date_from, query.date_to)
+
+
+@validate_query(CalendarQuerySchema)
+@condition(etag_func=_calendar_etag)
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def get_room_calendar(request, room_id):
+    """
+    Occupied intervals and free slots for a room over a date range
+    GET /api/rooms/:room_id/calendar?from=YYYY-MM-DD&to=YYYY-MM-DD
+
+    Each day's slot grid is run-length encoded as [state, length] pairs
+    starting at the room's opening time. The ETag changes with every booking
+    change in the range, so clients revalidate with If-None-Match and get a
+    304 while nothing has changed.
+    """
+    try:
+        query = request.validated
+
+        calendar_data = room_calendar(room_id, query.date_from, query.date_to)
+        if calendar_data is None:
+            return Response(
+                {"error": "Room not found or not available"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        response = Response(calendar_data, status=status.HTTP_200_OK)
+        response["Cache-Control"] = "no-cache"
+        return response
+
+    except Exception:
+        logger.exception("Failed to fetch calendar")
+        return Response(
+            {"error": "Failed to fetch calendar"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@validate_query(PriceQuoteQuerySchema)
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def get_price_quote(request, room_id):
+    """
+    Price a booking at the room's current occupancy for the day
+    GET /api/rooms/:room_id/quote?booking_date=YYYY-MM-DD&start_time=HH:MM:SS&end_time=HH:MM:SS
+
+    The price per slot is the room's base price times the multiplier of its
+    occupancy tier. A booking is charged the price quoted when its hold is
+    created, which may differ if the day fills up in between.
+    """
+    try:
+        query = request.validated
+
+        try:
+            room = Room.objects.get(id=room_id, is_available=True)
+        except Room.DoesNotExist:
+            return Response(
+                {"error": "Room not found or not available"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        if not room.clock.within_hours(query.start_time, query.end_time):
+            return Response(
+                {
+                    "error": f"Booking time must be between {room.opening_time.strftime('%H:%M')} and {room.closing_time.strftime('%H:%M')}"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            quote = quote_price(room, query.booking_date, query.start_time, query.end_time)
+        except ValueError as e:
+            # Local time skipped by a DST change in the room's timezone
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {
+                "room_id": room.id,
+                "booking_date": query.booking_date,
+                "start_time": query.start_time,
+                "end_time": query.end_time,
+                "number_of_slots": quote.number_of_slots,
+                "occupancy": round(quote.occupancy, 4),
+                "base_price_per_slot": room.price_per_slot,
+                "multiplier": quote.multiplier,
+                "price_per_slot": quote.price_per_slot,
+                "total_amount": quote.total_amount,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    except Exception:
+        logger.exception("Failed to quote price")
+        return Response(
+            {"error": "Failed to quote price"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+# Seconds between SSE keepalive comments on an idle stream
+AVAILABILITY_KEEPALIVE_SECONDS = 15
+
+
+def _availability_snapshot(room_id, booking_date):
+    if not Room.objects.filter(id=room_id, is_available=True).exists():
+        return None
+
+    # Intervals only: the stream is public, so booking ids stay private
+    return [
+        {
+            "start_time": booking["start_time"].isoformat(),
+            "end_time": booking["end_time"].isoformat(),
+            "status": booking["status"],
+        }
+        for booking in Booking.objects.filter(
+            room_id=room_id, booking_date=booking_date, status__in=ACTIVE_STATUSES
+        )
+        .order_by("start_time")
+        .values("start_time", "end_time", "status")
+    ]
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def availability_stream(request, room_id):
+    """
+    Stream slot changes for a room and date as Server-Sent Events
+    GET /api/rooms/:room_id/availability/stream?date=YYYY-MM-DD
+
+    Sends a "snapshot" event with the occupied slots, then a "slot" event
+    whenever a booking on that day is created, confirmed, expired, cancelled
+    or completed. Anyone may listen, so events carry times and statuses but
+    no booking ids. Only served by the ASGI app: under WSGI, Django buffers an
+    async stream to the end, which never comes, and the event loop the
+    client subscribed from is gone once the view returns.
+    """
+    if request.method != "GET":
+        return JsonResponse(
+            {"error": "Method not allowed"}, status=status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"error": "Availability streams are only served by the ASGI app"},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+
+    try:
+        booking_date = date.fromisoformat(request.GET.get("date", ""))
+    except ValueError:
+        return JsonResponse(
+            {"error": "date query parameter must be YYYY-MM-DD"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
-    # Convert to datetime for comparison
-    start_dt = datetime.combine(booking_date, start_time)
-    end_dt = datetime.combine(booking_date, end_time)
+    # Subscribe before reading the snapshot so no change falls in between.
+    # The server's event loop runs this view and the stream alike
+    key = stream_key(room_id, booking_date)
+    broadcaster = get_broadcaster()
+    queue = broadcaster.subscribe(key)
+
+    snapshot = await sync_to_async(_availability_snapshot)(room_id, booking_date)
+    if snapshot is None:
+        broadcaster.unsubscribe(key, queue)
+        return JsonResponse(
+            {"error": "Room not found or not available"},
+            status=status.HTTP_404_NOT_FOUND,
+        )
 
-    for booking in bookings:
-        existing_start = datetime.combine(booking_date, booking.start_time)
-        existing_end = datetime.combine(booking_date, booking.end_time)
+    async def events():
+        try:
+            yield _sse(
+                "snapshot",
+                {
+                    "room_id": room_id,
+                    "booking_date": booking_date.isoformat(),
+                    "occupied": snapshot,
+                },
+            )
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        queue.get(), timeout=AVAILABILITY_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(message["type"], message)
+        finally:
+            broadcaster.unsubscribe(key, queue)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _booking_response_data(booking, user, room):
+    """Booking fields plus user and room names, built without a query"""
+    response_data = {
+        field.attname: getattr(booking, field.attname)
+        for field in Booking._meta.concrete_fields
+    }
+    response_data.update(
+        user_name=user.username,
+        user_email=user.email,
+        room_name=room.name,
+    )
+    return response_data
 
-        # Check for overlap
-        if start_dt < existing_end and end_dt > existing_start:
-            return True, booking
 
-    return False, None
+def _payment_intent_response_data(payment):
+    return PaymentIntentResponseSchema(
+        payment_intent_id=payment.stripe_payment_intent_id,
+        client_secret=payment.metadata["client_secret"],
+        amount=payment.amount,
+        currency=payment.currency,
+        status=payment.status,
+        booking_id=payment.booking_id,
+    ).model_dump()
 
 
+@validate_body(BookingCreateSchema)
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@rate_limit("booking_user", key="user")
+@rate_limit("booking_room", key="room")
+@limit_room_concurrency
 def create_booking(request):
     """
     Create a new booking with time slots
@@ -278,12 +597,17 @@ def create_booking(request):
         "start_time": "HH:MM:SS",
         "end_time": "HH:MM:SS",
         "guest_count": int,
-        "special_requests": "string" (optional)
+        "special_requests": "string" (optional),
+        "pay": bool (optional),
+        "currency": "usd" (optional)
     }
+    With "pay": true the PaymentIntent for the booking total is created in the
+    same request and returned as "payment". If Stripe is unavailable the
+    payment outbox worker retries it; poll GET /api/payment-intent/:booking_id.
     """
     try:
-        # Validate input data with Pydantic
-        booking_data = BookingCreateSchema(**request.data)
+        # Validated by @validate_body before authentication
+        booking_data = request.validated
 
         # Get user from request (authenticated user)
         user = request.user
@@ -297,9 +621,10 @@ def create_booking(request):
         with transaction.atomic():
             # Lock the room row for update to prevent race conditions
             try:
-                room = Room.objects.select_for_update().get(
-                    id=booking_data.room_id, is_available=True
-                )
+                with tracing.span("booking.room_lock", room_id=booking_data.room_id):
+                    room = Room.objects.select_for_update().get(
+                        id=booking_data.room_id, is_available=True
+                    )
             except Room.DoesNotExist:
                 return Response(
                     {"error": "Room not found or not available"},
@@ -307,10 +632,7 @@ def create_booking(request):
                 )
 
             # Validate time slots are within room operating hours
-            if (
-                booking_data.start_time < room.opening_time
-                or booking_data.end_time > room.closing_time
-            ):
+            if not room.clock.within_hours(booking_data.start_time, booking_data.end_time):
                 return Response(
                     {
                         "error": f"Booking time must be between {room.opening_time.strftime('%H:%M')} and {room.closing_time.strftime('%H:%M')}"
@@ -318,24 +640,43 @@ def create_booking(request):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            # Calculate number of slots and total amount
-            number_of_slots, total_amount = calculate_slots_and_amount(
-                booking_data.start_time, booking_data.end_time, room
-            )
+            # Dates and times are local to the room
+            if booking_data.booking_date < room.clock.today():
+                return Response(
+                    {"error": "Booking date cannot be in the past"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
 
-            if number_of_slots < 1:
+            # Price at the day's occupancy so far; the total is locked into the
+            # hold and later bookings do not change it
+            try:
+                with tracing.span("booking.quote"):
+                    quote = quote_price(
+                        room,
+                        booking_data.booking_date,
+                        booking_data.start_time,
+                        booking_data.end_time,
+                    )
+            except ValueError as e:
+                # Local time skipped by a DST change in the room's timezone
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            if quote.number_of_slots < 1:
                 return Response(
                     {"error": "Booking duration must be at least one slot"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            # Check for time slot overlap
-            has_overlap, conflicting = check_time_slot_overlap(
-                room,
-                booking_data.booking_date,
-                booking_data.start_time,
-                booking_data.end_time,
-            )
+            # Check for time slot overlap; shared rooms count seats instead
+            has_overlap = False
+            if not room.is_shared:
+                with tracing.span("booking.overlap_check"):
+                    has_overlap, conflicting = check_time_slot_overlap(
+                        room,
+                        booking_data.booking_date,
+                        booking_data.start_time,
+                        booking_data.end_time,
+                    )
 
             if has_overlap:
                 return Response(
@@ -345,6 +686,7 @@ def create_booking(request):
                             "start_time": conflicting.start_time.strftime("%H:%M"),
                             "end_time": conflicting.end_time.strftime("%H:%M"),
                         },
+                        "waitlist_available": True,
                     },
                     status=status.HTTP_409_CONFLICT,
                 )
@@ -356,8 +698,27 @@ def create_booking(request):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            # Calculate hold expiration time (30 minutes from now)
-            hold_expires_at = timezone.now() + timedelta(minutes=BOOKING_HOLD_MINUTES)
+            if room.is_shared:
+                with tracing.span("booking.reserve_seats"):
+                    reserved, left = reserve_seats(
+                        room,
+                        booking_data.booking_date,
+                        booking_data.start_time,
+                        booking_data.end_time,
+                        booking_data.guest_count,
+                    )
+                if not reserved:
+                    return Response(
+                        {
+                            "error": "Not enough seats left for this time",
+                            "seats_left": left,
+                            "waitlist_available": True,
+                        },
+                        status=status.HTTP_409_CONFLICT,
+                    )
+
+            # The hold runs for the room's hold duration, extended by heartbeats
+            hold_expires_at = hold_deadline(room)
 
             # Create booking with hold expiration
             booking = Booking.objects.create(
@@ -367,246 +728,724 @@ def create_booking(request):
                 start_time=booking_data.start_time,
                 end_time=booking_data.end_time,
                 guest_count=booking_data.guest_count,
-                total_amount=total_amount,
-                number_of_slots=number_of_slots,
+                total_amount=quote.total_amount,
+                number_of_slots=quote.number_of_slots,
                 special_requests=booking_data.special_requests,
                 status="pending",
-                payment_status="pending",
+                payment_status="processing" if booking_data.pay else "pending",
                 hold_expires_at=hold_expires_at,
             )
+            write_new_booking_details([booking])
+            record_status_changes([status_change_for(booking, None)])
 
-            # Prepare response
-            from django.db.models import F
+            # Book-and-pay: queue the PaymentIntent with the hold, leased to this request
+            if booking_data.pay:
+                entry = create_leased_entry(booking, booking_data.currency)
 
-            response_data = (
-                Booking.objects.filter(id=booking.id)
-                .annotate(
-                    user_name=F("user__username"),
-                    user_email=F("user__email"),
-                    room_name=F("room__name"),
-                )
-                .values()
-                .first()
-            )
+        # Prepare response from the objects already in memory
+        with tracing.span("booking.serialize"):
+            response_data = _booking_response_data(booking, user, room)
+
+        if booking_data.pay:
+            try:
+                entry = deliver_entry(entry)
+            except Exception:
+                # The lease runs out and the outbox worker retries the request
+                logger.exception("Inline PaymentIntent creation failed for booking %s", booking.id)
+
+            if entry.status == "succeeded":
+                response_data["payment"] = _payment_intent_response_data(booking.payment)
+            else:
+                response_data["payment"] = {"request_id": entry.id, "status": entry.status}
 
         return Response(response_data, status=status.HTTP_201_CREATED)
 
-    except ValidationError as e:
-        return Response(
-            {"error": "Validation failed", "detail": e.errors()},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
-    except Exception as e:
+    except Exception:
+        logger.exception("Failed to create booking")
         return Response(
-            {"error": "Failed to create booking", "detail": str(e)},
+            {"error": "Failed to create booking"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
 
 
-@api_view(["POST"])
+@validate_body(BookingCreateSchema)
+@api_view(["GET", "POST"])
 @permission_classes([IsAuthenticated])
-def create_payment_intent(request):
+def waitlist(request):
     """
-    Create a Stripe payment intent for a booking
-    POST /api/payment-intent
+    List the current user's waitlist entries or join the waitlist for a fully booked slot
+    GET /api/waitlist
+    POST /api/waitlist
     Body: {
-        "booking_id": int,
-        "amount": decimal,
-        "currency": "usd" (optional)
+        "room_id": int,
+        "booking_date": "YYYY-MM-DD",
+        "start_time": "HH:MM:SS",
+        "end_time": "HH:MM:SS",
+        "guest_count": int,
+        "special_requests": "string" (optional)
     }
+    When the slot frees up the oldest fitting entry is promoted to a pending
+    booking hold, which is returned as booking_id on the entry.
     """
     try:
-        # Validate input data with Pydantic
-        payment_data = PaymentIntentCreateSchema(**request.data)
+        if request.method == "GET":
+            entries_data = list(
+                WaitlistEntry.objects.filter(user=request.user)
+                .exclude(status="cancelled")
+                .order_by("-created_at")
+                .values()
+            )
+            return Response(
+                {"count": len(entries_data), "entries": entries_data},
+                status=status.HTTP_200_OK,
+            )
+
+        waitlist_data = request.validated
 
-        # Get booking
         try:
-            booking = Booking.objects.get(id=payment_data.booking_id)
-        except Booking.DoesNotExist:
+            room = Room.objects.get(id=waitlist_data.room_id, is_available=True)
+        except Room.DoesNotExist:
             return Response(
-                {"error": "Booking not found"}, status=status.HTTP_404_NOT_FOUND
+                {"error": "Room not found or not available"},
+                status=status.HTTP_404_NOT_FOUND,
             )
 
-        # Check if booking already has a successful payment
-        if booking.payment_status == "succeeded":
+        if not room.clock.within_hours(waitlist_data.start_time, waitlist_data.end_time):
             return Response(
-                {"error": "Booking already paid"}, status=status.HTTP_400_BAD_REQUEST
+                {
+                    "error": f"Booking time must be between {room.opening_time.strftime('%H:%M')} and {room.closing_time.strftime('%H:%M')}"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Create Stripe PaymentIntent
-        # Stripe expects amount in cents
-        amount_cents = int(payment_data.amount * 100)
+        if not room.clock.on_grid(waitlist_data.start_time, waitlist_data.end_time):
+            return Response(
+                {
+                    "error": f"Booking times must fall on the room's {room.slot_duration_minutes}-minute slots from {room.opening_time.strftime('%H:%M')}"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        payment_intent = stripe.PaymentIntent.create(
-            amount=amount_cents,
-            currency=payment_data.currency,
-            metadata={
-                "booking_id": booking.id,
-                "user_id": booking.user.id,
-                "room_name": booking.room.name,
-            },
-            automatic_payment_methods={
-                "enabled": True,
-            },
-        )
+        if waitlist_data.guest_count > room.capacity:
+            return Response(
+                {"error": f"Guest count exceeds room capacity of {room.capacity}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        # Create or update Payment record
-        payment, created = Payment.objects.update_or_create(
-            booking=booking,
+        try:
+            if room.is_shared:
+                has_overlap = waitlist_data.guest_count > seats_left(
+                    room,
+                    waitlist_data.booking_date,
+                    waitlist_data.start_time,
+                    waitlist_data.end_time,
+                )
+            else:
+                has_overlap, _ = check_time_slot_overlap(
+                    room,
+                    waitlist_data.booking_date,
+                    waitlist_data.start_time,
+                    waitlist_data.end_time,
+                )
+        except ValueError as e:
+            # Local time skipped by a DST change in the room's timezone
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not has_overlap:
+            return Response(
+                {"error": "Time slot is available, create a booking instead"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        entry, created = WaitlistEntry.objects.get_or_create(
+            user=request.user,
+            room=room,
+            booking_date=waitlist_data.booking_date,
+            start_time=waitlist_data.start_time,
+            end_time=waitlist_data.end_time,
+            status="waiting",
             defaults={
-                "stripe_payment_intent_id": payment_intent.id,
-                "amount": payment_data.amount,
-                "currency": payment_data.currency,
-                "status": payment_intent.status,
-                "metadata": {"client_secret": payment_intent.client_secret},
+                "guest_count": waitlist_data.guest_count,
+                "special_requests": waitlist_data.special_requests,
             },
         )
 
-        # Update booking payment status
-        booking.payment_status = "processing"
-        booking.save()
-
-        # Prepare response
-        response_data = PaymentIntentResponseSchema(
-            payment_intent_id=payment_intent.id,
-            client_secret=payment_intent.client_secret,
-            amount=payment_data.amount,
-            currency=payment_data.currency,
-            status=payment_intent.status,
-            booking_id=booking.id,
-        )
-
-        return Response(response_data.model_dump(), status=status.HTTP_201_CREATED)
-
-    except ValidationError as e:
         return Response(
-            {"error": "Validation failed", "detail": e.errors()},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
-    except stripe.error.StripeError as e:
-        return Response(
-            {"error": "Payment processing failed", "detail": str(e)},
-            status=status.HTTP_400_BAD_REQUEST,
+            WaitlistEntry.objects.filter(id=entry.id).values().first(),
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
         )
-    except Exception as e:
+
+    except Exception:
+        logger.exception("Failed to process waitlist request")
         return Response(
-            {"error": "Failed to create payment intent", "detail": str(e)},
+            {"error": "Failed to process waitlist request"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
 
 
-@api_view(["GET"])
+@api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
-def get_booking(request, booking_id):
+def leave_waitlist(request, entry_id):
     """
-    Get a specific booking by ID
-    GET /api/bookings/:booking_id
+    Leave the waitlist
+    DELETE /api/waitlist/:entry_id
     """
     try:
-        from django.db.models import F
-
-        # Get booking with user and room details
-        booking_data = (
-            Booking.objects.filter(id=booking_id)
-            .annotate(
-                user_name=F("user__username"),
-                user_email=F("user__email"),
-                room_name=F("room__name"),
-            )
-            .values()
-            .first()
-        )
+        updated = WaitlistEntry.objects.filter(
+            id=entry_id, user=request.user, status="waiting"
+        ).update(status="cancelled", updated_at=timezone.now())
 
-        if not booking_data:
+        if not updated:
             return Response(
-                {"error": "Booking not found"}, status=status.HTTP_404_NOT_FOUND
+                {"error": "Waitlist entry not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        return Response(booking_data, status=status.HTTP_200_OK)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-    except Exception as e:
+    except Exception:
+        logger.exception("Failed to leave waitlist")
         return Response(
-            {"error": "Failed to fetch booking", "detail": str(e)},
+            {"error": "Failed to leave waitlist"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
 
 
-@csrf_exempt
+def _booking_group_data(group, bookings_data):
+    statuses = {booking_data["status"] for booking_data in bookings_data}
+    return {
+        "id": group.id,
+        "user_id": group.user_id,
+        "total_amount": group.total_amount,
+        # Members share their status unless some were changed one by one later
+        "status": statuses.pop() if len(statuses) == 1 else "mixed",
+        "lead_booking_id": bookings_data[0]["id"] if bookings_data else None,
+        "created_at": group.created_at,
+        "count": len(bookings_data),
+        "bookings": bookings_data,
+    }
+
+
+@validate_body(BookingGroupCreateSchema)
 @api_view(["POST"])
-@permission_classes([AllowAny])
-def stripe_webhook(request):
+@permission_classes([IsAuthenticated])
+@rate_limit("booking_user", key="user")
+def create_booking_group(request):
     """
-    Handle Stripe webhook events
-    POST /api/stripe-webhook
+    Hold several rooms at once, all or nothing
+    POST /api/booking-groups
+    Body: {
+        "bookings": [
+            {
+                "room_id": int,
+                "booking_date": "YYYY-MM-DD",
+                "start_time": "HH:MM:SS",
+                "end_time": "HH:MM:SS",
+                "guest_count": int,
+                "special_requests": "string" (optional)
+            },
+            ... (2 to 10 bookings)
+        ],
+        "pay": bool (optional),
+        "currency": "usd" (optional)
+    }
+    Either every booking is held or none is; a rejection names the failing
+    booking by its index. The bookings share one hold and are paid with one
+    PaymentIntent for the group total, created on the lead booking
+    (lead_booking_id). With "pay": true it is created in the same request.
     """
-    payload = request.body
-    sig_header = request.META.get("HTTP_STRIPE_SIGNATURE")
-    webhook_secret = settings.STRIPE_WEBHOOK_SECRET
-
     try:
-        event = stripe.Webhook.construct_event(payload, sig_header, webhook_secret)
-    except ValueError:
-        return Response(
-            {"error": "Invalid payload"}, status=status.HTTP_400_BAD_REQUEST
-        )
-    except stripe.error.SignatureVerificationError:
-        return Response(
-            {"error": "Invalid signature"}, status=status.HTTP_400_BAD_REQUEST
-        )
-
-    # Handle the event
-    if event["type"] == "payment_intent.succeeded":
-        payment_intent = event["data"]["object"]
+        group_data = request.validated
 
         try:
-            # Update payment and booking status
-            payment = Payment.objects.get(stripe_payment_intent_id=payment_intent["id"])
-            payment.status = "succeeded"
-            payment.payment_method = payment_intent.get("payment_method")
-            payment.save()
-
-            booking = payment.booking
-            booking.payment_status = "succeeded"
-            booking.status = "confirmed"
-            booking.save()
-
-        except Payment.DoesNotExist:
-            pass
+            group, bookings, entry = create_group_booking(
+                request.user, group_data.bookings, pay=group_data.pay, currency=group_data.currency
+            )
+        except GroupBookingRejected as e:
+            return Response(e.data, status=e.status_code)
 
-    elif event["type"] == "payment_intent.payment_failed":
-        payment_intent = event["data"]["object"]
+        response_data = _booking_group_data(
+            group,
+            [_booking_response_data(booking, request.user, booking.room) for booking in bookings],
+        )
 
-        try:
-            payment = Payment.objects.get(stripe_payment_intent_id=payment_intent["id"])
-            payment.status = "failed"
-            payment.save()
+        if group_data.pay:
+            try:
+                entry = deliver_entry(entry)
+            except Exception:
+                # The lease runs out and the outbox worker retries the request
+                logger.exception("Inline PaymentIntent creation failed for group %s", group.id)
 
-            booking = payment.booking
-            booking.payment_status = "failed"
-            booking.save()
+            if entry.status == "succeeded":
+                response_data["payment"] = _payment_intent_response_data(bookings[0].payment)
+            else:
+                response_data["payment"] = {"request_id": entry.id, "status": entry.status}
 
-        except Payment.DoesNotExist:
-            pass
+        return Response(response_data, status=status.HTTP_201_CREATED)
 
-    elif event["type"] == "payment_intent.canceled":
-        payment_intent = event["data"]["object"]
+    except Exception:
+        logger.exception("Failed to create booking group")
+        return Response(
+            {"error": "Failed to create booking group"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_booking_group(request, group_id):
+    """
+    Get a booking group with its bookings
+    GET /api/booking-groups/:group_id
+
+    Bookings are in the shape of GET /api/bookings/:booking_id, lead booking
+    first. Users only see their own groups; staff see all.
+    """
+    try:
+        groups = BookingGroup.objects.all()
+        if not request.user.is_staff:
+            groups = groups.filter(user=request.user)
+        group = groups.filter(id=group_id).first()
+        if group is None:
+            return Response(
+                {"error": "Booking group not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        # Archived members keep their group
+        booking_ids = sorted(
+            [*group.bookings.values_list("id", flat=True), *group.archived_bookings.values_list("id", flat=True)]
+        )
+        found = get_booking_details(booking_ids)
+
+        return Response(
+            _booking_group_data(
+                group, [found[booking_id] for booking_id in booking_ids if booking_id in found]
+            ),
+            status=status.HTTP_200_OK,
+        )
+
+    except Exception:
+        logger.exception("Failed to fetch booking group")
+        return Response(
+            {"error": "Failed to fetch booking group"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@validate_body(BookingGroupPaymentSchema)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def create_group_payment_intent(request, group_id):
+    """
+    Queue the Stripe payment intent for a booking group's total
+    POST /api/booking-groups/:group_id/payment-intent
+    Body: {
+        "currency": "usd" (optional)
+    }
+    The intent belongs to the group's lead booking; poll
+    GET /api/payment-intent/:lead_booking_id for the client secret.
+    """
+    try:
+        payment_data = request.validated
+
+        group = BookingGroup.objects.filter(id=group_id, user=request.user).first()
+        if group is None:
+            return Response(
+                {"error": "Booking group not found"}, status=status.HTTP_404_NOT_FOUND
+            )
 
         try:
-            payment = Payment.objects.get(stripe_payment_intent_id=payment_intent["id"])
-            payment.status = "canceled"
-            payment.save()
-
-            booking = payment.booking
-            # Check if hold has expired
-            if booking.is_hold_expired():
-                booking.status = "expired"
-            else:
-                booking.status = "cancelled"
-            booking.payment_status = "failed"
-            booking.save()
+            entry = pay_group(group, payment_data.currency)
+        except GroupBookingRejected as e:
+            return Response(e.data, status=e.status_code)
+
+        return Response(
+            {
+                "group_id": group.id,
+                "booking_id": entry.booking_id,
+                "request_id": entry.id,
+                "status": entry.status,
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    except Exception:
+        logger.exception("Failed to create payment intent")
+        return Response(
+            {"error": "Failed to create payment intent"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
 
-        except Payment.DoesNotExist:
-            pass
+
+@validate_body(PaymentIntentCreateSchema)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def create_payment_intent(request):
+    """
+    Queue a Stripe payment intent for a booking
+    POST /api/payment-intent
+    Body: {
+        "booking_id": int,
+        "amount": decimal (optional, must match the booking total),
+        "currency": "usd" (optional)
+    }
+    The intent is created in Stripe by the payment outbox worker; poll
+    GET /api/payment-intent/:booking_id for the client secret.
+    """
+    try:
+        # Validated by @validate_body before authentication
+        payment_data = request.validated
+
+        with transaction.atomic():
+            # Get booking
+            try:
+                with tracing.span("payment.booking_lock", booking_id=payment_data.booking_id):
+                    booking = Booking.objects.select_for_update().get(
+                        id=payment_data.booking_id, user=request.user
+                    )
+            except Booking.DoesNotExist:
+                return Response(
+                    {"error": "Booking not found"}, status=status.HTTP_404_NOT_FOUND
+                )
+
+            # A group is paid as a whole, for its total
+            if booking.group_id is not None:
+                return Response(
+                    {
+                        "error": "Booking is part of a group; pay for the group instead",
+                        "group_id": booking.group_id,
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            # Check if booking already has a successful payment
+            if booking.payment_status == "succeeded":
+                return Response(
+                    {"error": "Booking already paid"}, status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # Only a hold can be paid; it expires if the payment is abandoned
+            if booking.status != "pending":
+                return Response(
+                    {"error": "Booking is no longer held", "status": booking.status},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            # The amount charged is always the booking total locked in at hold time
+            if (
+                payment_data.amount is not None
+                and payment_data.amount != booking.total_amount
+            ):
+                return Response(
+                    {"error": "Amount does not match booking total"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            # Record the intent request with the booking update
+            entry = enqueue_payment_intent(
+                booking, booking.total_amount, payment_data.currency
+            )
+
+        return Response(
+            {
+                "booking_id": booking.id,
+                "request_id": entry.id,
+                "status": entry.status,
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    except Exception:
+        logger.exception("Failed to create payment intent")
+        return Response(
+            {"error": "Failed to create payment intent"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_payment_intent(request, booking_id):
+    """
+    Get the payment intent for a booking once the outbox worker has created it
+    GET /api/payment-intent/:booking_id
+    Returns 202 while the intent is still being created.
+    """
+    try:
+        # The client secret is only returned to the booking owner
+        entry = (
+            PaymentIntentOutbox.objects.filter(
+                booking_id=booking_id, booking__user=request.user
+            )
+            .order_by("-created_at")
+            .first()
+        )
+        if entry is None:
+            return Response(
+                {"error": "Payment intent not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        if entry.status in ("pending", "processing"):
+            return Response(
+                {"booking_id": booking_id, "request_id": entry.id, "status": "pending"},
+                status=status.HTTP_202_ACCEPTED,
+            )
+
+        if entry.status == "failed":
+            return Response(
+                {"error": "Payment processing failed", "detail": entry.last_error},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        payment = Payment.objects.get(booking_id=booking_id)
+
+        return Response(
+            _payment_intent_response_data(payment), status=status.HTTP_200_OK
+        )
+
+    except Exception:
+        logger.exception("Failed to fetch payment intent")
+        return Response(
+            {"error": "Failed to fetch payment intent"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def booking_heartbeat(request, booking_id):
+    """
+    Keep the current user's pending booking held while they check out
+    POST /api/bookings/:booking_id/heartbeat
+
+    Slides the hold to the room's hold duration from now. The checkout page
+    calls this periodically, well within the hold duration. Returns 409 once
+    the hold has run out or the booking is no longer pending.
+    """
+    try:
+        booking = (
+            Booking.objects.select_related("room")
+            .filter(id=booking_id, user=request.user)
+            .first()
+        )
+        if booking is None:
+            return Response(
+                {"error": "Booking not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        hold_expires_at = extend_hold(booking) if booking.status == "pending" else None
+        if hold_expires_at is None:
+            return Response(
+                {"error": "Booking is no longer held", "status": booking.status},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        return Response(
+            {
+                "booking_id": booking.id,
+                "hold_expires_at": hold_expires_at,
+                "hold_minutes": booking.room.hold_minutes,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    except Exception:
+        logger.exception("Failed to extend booking hold")
+        return Response(
+            {"error": "Failed to extend booking hold"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_booking(request, booking_id):
+    """
+    Get a specific booking by ID
+    GET /api/bookings/:booking_id
+
+    Read from the booking detail read model, with user and room names and
+    the payment. Finished bookings moved out by archive_bookings carry
+    "archived": true. Users only see their own bookings; staff see all.
+    """
+    try:
+        # Ownership is part of the lookup, so other users' bookings are a 404
+        booking_data = get_booking_details(
+            [booking_id], user=None if request.user.is_staff else request.user
+        ).get(booking_id)
+
+        if not booking_data:
+            return Response(
+                {"error": "Booking not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        return Response(booking_data, status=status.HTTP_200_OK)
+
+    except Exception:
+        logger.exception("Failed to fetch booking")
+        return Response(
+            {"error": "Failed to fetch booking"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@validate_query(BookingBatchQuerySchema)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_bookings_batch(request):
+    """
+    Get many bookings by ID in one call
+    GET /api/bookings/batch?ids=1,2,3 (up to 100 ids)
+
+    Returns the bookings in the order asked for, in the same shape as
+    GET /api/bookings/:booking_id. IDs that do not exist, or belong to
+    another user for non-staff, are listed in not_found.
+    """
+    try:
+        query = request.validated
+        booking_ids = list(dict.fromkeys(query.ids))
+
+        found = get_booking_details(
+            booking_ids, user=None if request.user.is_staff else request.user
+        )
+        bookings_data = [found[booking_id] for booking_id in booking_ids if booking_id in found]
+
+        return Response(
+            {
+                "count": len(bookings_data),
+                "bookings": bookings_data,
+                "not_found": [booking_id for booking_id in booking_ids if booking_id not in found],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    except Exception:
+        logger.exception("Failed to fetch bookings")
+        return Response(
+            {"error": "Failed to fetch bookings"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+# Sort key of the booking history, matching booking_user_starts_idx
+HISTORY_ORDER = ["starts_at", "id"]
+
+
+def _booking_history_data(booking):
+    """Booking fields with user and room names and payment from select_related, without a query"""
+    response_data = detail_data(booking)
+    response_data["archived"] = isinstance(booking, ArchivedBooking)
+    return response_data
+
+
+@validate_query(BookingHistoryQuerySchema)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_my_bookings(request):
+    """
+    Get the current user's bookings, one page at a time
+    GET /api/bookings/mine?when=upcoming|past&limit=20&cursor=<next_cursor>
+
+    Upcoming bookings (starting now or later) are listed soonest first. Past
+    bookings, archived ones included, are listed most recent first. Both are
+    split and ordered by start instant, whatever the rooms' timezones. Pass
+    the returned next_cursor to fetch the following page.
+    """
+    try:
+        query = request.validated
+
+        after = None
+        if query.cursor:
+            try:
+                starts_at, booking_id = decode_cursor(query.cursor)
+                after = [datetime.fromisoformat(starts_at), int(booking_id)]
+                if timezone.is_naive(after[0]):
+                    raise ValueError("Cursor start has no timezone")
+            except (TypeError, ValueError):
+                return Response(
+                    {"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST
+                )
+
+        now = timezone.now()
+        descending = query.when == "past"
+        if descending:
+            models_to_list = [Booking, ArchivedBooking]
+            time_filter = {"starts_at__lt": now}
+            order = [f"-{field}" for field in HISTORY_ORDER]
+        else:
+            models_to_list = [Booking]
+            time_filter = {"starts_at__gte": now}
+            order = HISTORY_ORDER
+
+        # One joined query per table, each walking booking_user_starts_idx from
+        # the cursor; one extra row tells whether another page exists
+        bookings = []
+        for model in models_to_list:
+            queryset = model.objects.filter(user=request.user, **time_filter)
+            if after:
+                queryset = queryset.filter(keyset_after(HISTORY_ORDER, after, descending))
+            bookings.extend(
+                queryset.select_related("user", "room", "payment").order_by(*order)[: query.limit + 1]
+            )
+
+        def sort_key(booking):
+            return [getattr(booking, field) for field in HISTORY_ORDER]
+
+        bookings.sort(key=sort_key, reverse=descending)
+        page = bookings[: query.limit]
+        next_cursor = (
+            encode_cursor(sort_key(page[-1])) if len(bookings) > query.limit else None
+        )
+
+        return Response(
+            {
+                "when": query.when,
+                "count": len(page),
+                "next_cursor": next_cursor,
+                "bookings": [_booking_history_data(booking) for booking in page],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    except Exception:
+        logger.exception("Failed to fetch bookings")
+        return Response(
+            {"error": "Failed to fetch bookings"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@csrf_exempt
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def stripe_webhook(request):
+    """
+    Handle Stripe webhook events
+    POST /api/stripe-webhook
+
+    Verified payment_intent.succeeded, .payment_failed and .canceled events
+    are stored for the webhook worker (run_webhook_events) to apply.
+    """
+    payload = request.body
+    sig_header = request.META.get("HTTP_STRIPE_SIGNATURE")
+    webhook_secret = settings.STRIPE_WEBHOOK_SECRET
+
+    try:
+        with tracing.span("stripe.webhook_verify"):
+            event = webhooks.verify_event(payload, sig_header, webhook_secret)
+    except ValueError:
+        return Response(
+            {"error": "Invalid payload"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    except stripe.error.SignatureVerificationError:
+        return Response(
+            {"error": "Invalid signature"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Unhandled event types are acknowledged so Stripe stops retrying them
+    if event is None:
+        return Response({"status": "ignored"}, status=status.HTTP_200_OK)
+
+    # Applied to the payment and booking by the webhook worker
+    webhooks.store_event(event)
 
     return Response({"status": "success"}, status=status.HTTP_200_OK)
 
@@ -617,6 +1456,7 @@ def get_all_bookings(request):
     """
     Get all bookings (Staff/Admin only)
     GET /api/bookings/all
+    Query params: include_archived=true to also list archived bookings
     """
     try:
         # Check if user is staff/admin
@@ -629,16 +1469,26 @@ def get_all_bookings(request):
         # Get all bookings with user and room details
         from django.db.models import F
 
-        bookings_data = list(
-            Booking.objects.select_related("room", "user")
-            .annotate(
-                user_name=F("user__username"),
-                user_email=F("user__email"),
-                room_name=F("room__name"),
-            )
-            .order_by("-created_at")
-            .values()
-        )
+        models_to_list = [Booking]
+        if request.query_params.get("include_archived") == "true":
+            models_to_list.append(ArchivedBooking)
+
+        bookings_data = []
+        for model in models_to_list:
+            for booking_data in (
+                model.objects.annotate(
+                    user_name=F("user__username"),
+                    user_email=F("user__email"),
+                    room_name=F("room__name"),
+                )
+                .order_by("-created_at")
+                .values()
+            ):
+                booking_data["archived"] = model is ArchivedBooking
+                bookings_data.append(booking_data)
+
+        if len(models_to_list) > 1:
+            bookings_data.sort(key=lambda booking: booking["created_at"], reverse=True)
 
         return Response(
             {
@@ -648,8 +1498,153 @@ def get_all_bookings(request):
             status=status.HTTP_200_OK,
         )
 
-    except Exception as e:
+    except Exception:
+        logger.exception("Failed to fetch bookings")
+        return Response(
+            {"error": "Failed to fetch bookings"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@validate_body(BookingBulkStatusSchema)
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def bulk_update_booking_status(request):
+    """
+    Mark many bookings as completed, cancelled or refunded (Staff/Admin only)
+    POST /api/bookings/bulk-status
+    Body: {
+        "booking_ids": [int],
+        "status": "completed" | "cancelled" | "refunded"
+    }
+    """
+    try:
+        if not request.user.is_staff:
+            return Response(
+                {"error": "Permission denied. Admin access required."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        bulk_data = request.validated
+
+        updated_ids = bulk_transition_bookings(bulk_data.booking_ids, bulk_data.status)
+
+        return Response(
+            {
+                "status": bulk_data.status,
+                "updated_count": len(updated_ids),
+                "updated_ids": updated_ids,
+                "skipped_ids": sorted(set(bulk_data.booking_ids) - set(updated_ids)),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    except Exception:
+        logger.exception("Failed to update bookings")
+        return Response(
+            {"error": "Failed to update bookings"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+# ============================================
+# Analytics APIs
+# ============================================
+
+
+@validate_query(AnalyticsQuerySchema)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_utilization(request):
+    """
+    Occupancy rate, revenue and expiry/cancellation rates per room (Staff/Admin only)
+    GET /api/analytics/utilization?from=YYYY-MM-DD&to=YYYY-MM-DD&room_id=int
+    """
+    try:
+        if not request.user.is_staff:
+            return Response(
+                {"error": "Permission denied. Admin access required."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        query = request.validated
+        rooms_data = utilization_summary(query.date_from, query.date_to, query.room_id)
+
+        return Response(
+            {
+                "from": query.date_from,
+                "to": query.date_to,
+                "count": len(rooms_data),
+                "rooms": rooms_data,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    except Exception:
+        logger.exception("Failed to fetch utilization")
+        return Response(
+            {"error": "Failed to fetch utilization"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@validate_query(AnalyticsQuerySchema)
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_daily_stats(request):
+    """
+    Revenue, booked slots and status counts per room per day (Staff/Admin only)
+    GET /api/analytics/daily?from=YYYY-MM-DD&to=YYYY-MM-DD&room_id=int
+    """
+    try:
+        if not request.user.is_staff:
+            return Response(
+                {"error": "Permission denied. Admin access required."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        query = request.validated
+        days_data = daily_stats(query.date_from, query.date_to, query.room_id)
+
+        return Response(
+            {
+                "from": query.date_from,
+                "to": query.date_to,
+                "count": len(days_data),
+                "days": days_data,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    except Exception:
+        logger.exception("Failed to fetch daily stats")
+        return Response(
+            {"error": "Failed to fetch daily stats"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def get_rejected_requests(request):
+    """
+    Requests rejected by validation per endpoint and error type (Staff/Admin only)
+    GET /api/analytics/rejections
+
+    Counts are kept per worker process since it started.
+    """
+    try:
+        if not request.user.is_staff:
+            return Response(
+                {"error": "Permission denied. Admin access required."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        return Response({"endpoints": rejection_counts()}, status=status.HTTP_200_OK)
+
+    except Exception:
+        logger.exception("Failed to fetch rejected requests")
         return Response(
-            {"error": "Failed to fetch bookings", "detail": str(e)},
+            {"error": "Failed to fetch rejected requests"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR,
         )
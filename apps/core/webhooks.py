@@ -0,0 +1,193 @@
+"""
+Stripe webhook intake and batched application of payment events
+
+The webhook only verifies the signature and stores events of the handled
+types; everything else is acknowledged without being parsed. Payloads are
+read as plain JSON rather than Stripe objects. The webhook worker applies the
+stored events in batches, locking all their payments in one query and
+writing them back in bulk, instead of one transaction per request.
+
+Events only move bookings that are still held. A payment that succeeds for a
+booking that already expired or was cancelled leaves the booking as it is,
+with payment status "succeeded", which marks it for a refund.
+"""
+import json
+import logging
+
+import stripe
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Booking, Payment, StripeWebhookEvent
+from .services import record_status_changes, status_change_for
+
+
+logger = logging.getLogger(__name__)
+
+# Handled event types and the payment status each one sets
+HANDLED_EVENT_TYPES = {
+    "payment_intent.succeeded": "succeeded",
+    "payment_intent.payment_failed": "failed",
+    "payment_intent.canceled": "canceled",
+}
+
+# A handled event's payload contains its quoted type, so payloads without
+# any of them are known to be unhandled without parsing
+_HANDLED_TYPE_MARKERS = tuple(f'"{event_type}"'.encode() for event_type in HANDLED_EVENT_TYPES)
+
+
+def verify_event(payload, sig_header, secret):
+    """
+    Check a webhook payload's signature and return the event as a dict.
+
+    Returns None for a correctly signed event of a type that is not handled.
+    Raises stripe.error.SignatureVerificationError for a bad signature and
+    ValueError for a payload that is not a readable event.
+    """
+    text = payload.decode("utf-8")
+    stripe.WebhookSignature.verify_header(
+        text, sig_header, secret, stripe.Webhook.DEFAULT_TOLERANCE
+    )
+
+    if not any(marker in payload for marker in _HANDLED_TYPE_MARKERS):
+        return None
+    event = json.loads(text)
+    if not isinstance(event, dict) or event.get("type") not in HANDLED_EVENT_TYPES:
+        return None
+    data = event.get("data")
+    intent = data.get("object") if isinstance(data, dict) else None
+    if not event.get("id") or not isinstance(intent, dict) or not intent.get("id"):
+        raise ValueError("Event has no id or no payment intent id")
+    return event
+
+
+def store_event(event):
+    """Queue a verified event for the webhook worker; a redelivered event is ignored"""
+    StripeWebhookEvent.objects.bulk_create(
+        [
+            StripeWebhookEvent(
+                event_id=event["id"],
+                event_type=event["type"],
+                payload=event["data"]["object"],
+            )
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def apply_payment_events(events):
+    """
+    Apply (event type, payment intent) pairs to their payments and bookings.
+
+    Events are applied in the given order, so the outcome is the same as
+    handling them one by one. An event for a group's payment applies to
+    every booking of the group that is still in a state the event applies
+    to. Events for unknown payment intents are skipped, as are failures and
+    cancellations of a payment that already succeeded. Must run inside a
+    transaction; returns the number applied.
+    """
+    payments = {
+        payment.stripe_payment_intent_id: payment
+        for payment in Payment.objects.select_for_update()
+        .select_related("booking")
+        .filter(stripe_payment_intent_id__in={intent["id"] for _, intent in events})
+        .order_by("id")
+    }
+
+    # Bookings each payment settles: its own, or all of its group's
+    settles = {payment.id: [payment.booking] for payment in payments.values()}
+    groups = {
+        payment.booking.group_id: payment
+        for payment in payments.values()
+        if payment.booking.group_id is not None
+    }
+    if groups:
+        for booking in (
+            Booking.objects.select_for_update().filter(group_id__in=groups).order_by("id")
+        ):
+            payment = groups[booking.group_id]
+            if booking.id != payment.booking_id:
+                settles[payment.id].append(booking)
+
+    applied = 0
+    touched = {}
+    # Booking id -> (status, payment status) before the first event
+    original = {}
+    bookings = {}
+    for event_type, intent in events:
+        payment = payments.get(intent["id"])
+        if payment is None:
+            continue
+        if payment.status == "succeeded" and event_type != "payment_intent.succeeded":
+            # A late or redelivered failure cannot undo a payment that went through
+            logger.warning("Ignoring %s for succeeded payment %s", event_type, intent["id"])
+            continue
+        applied += 1
+        touched[payment.id] = payment
+        payment.status = HANDLED_EVENT_TYPES[event_type]
+        if event_type == "payment_intent.succeeded":
+            payment.payment_method = intent.get("payment_method")
+
+        for booking in settles[payment.id]:
+            bookings[booking.id] = booking
+            original.setdefault(booking.id, (booking.status, booking.payment_status))
+
+            if event_type == "payment_intent.succeeded":
+                booking.payment_status = "succeeded"
+                if booking.status == "pending":
+                    booking.status = "confirmed"
+                elif booking.status in ("cancelled", "expired"):
+                    # Its slot may be booked again; the payment is to be refunded
+                    logger.warning(
+                        "Payment %s succeeded for %s booking %s; refund needed",
+                        intent["id"],
+                        booking.status,
+                        booking.id,
+                    )
+            elif booking.status != "pending":
+                # Failures and cancellations only settle bookings still held
+                continue
+            elif event_type == "payment_intent.payment_failed":
+                booking.payment_status = "failed"
+            else:
+                # Check if hold has expired
+                booking.status = "expired" if booking.is_hold_expired() else "cancelled"
+                booking.payment_status = "failed"
+
+    if not touched:
+        return applied
+
+    now = timezone.now()
+    for payment in touched.values():
+        payment.updated_at = now
+    for booking in bookings.values():
+        booking.updated_at = now
+    Payment.objects.bulk_update(touched.values(), ["status", "payment_method", "updated_at"])
+    Booking.objects.bulk_update(bookings.values(), ["status", "payment_status", "updated_at"])
+    record_status_changes(
+        [status_change_for(booking, *original[booking.id]) for booking in bookings.values()]
+    )
+    return applied
+
+
+def process_pending_events(batch_size=200):
+    """
+    Apply up to ``batch_size`` stored events in one transaction.
+
+    Events claimed by another worker are skipped. Returns the number of
+    events processed, including those for unknown payment intents.
+    """
+    with transaction.atomic():
+        pending = list(
+            StripeWebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True)
+            .order_by("id")[:batch_size]
+        )
+        if not pending:
+            return 0
+
+        apply_payment_events([(event.event_type, event.payload) for event in pending])
+        StripeWebhookEvent.objects.filter(id__in=[event.id for event in pending]).update(
+            processed_at=timezone.now()
+        )
+    return len(pending)
@@ -0,0 +1,62 @@
+"""
+Gunicorn configuration for production serving
+
+    gunicorn -c gunicorn.conf.py
+
+Serves the WSGI app with gthread workers by default, for the JSON API.
+Availability streams (Server-Sent Events) are only served by the ASGI app:
+run them from a second gunicorn with
+GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker and DB_CONN_MAX_AGE=0,
+since Django does not support persistent database connections under ASGI.
+docker-compose.yml runs both. Every setting below can be overridden from
+the environment.
+"""
+import multiprocessing
+import os
+
+
+def _int(name, default):
+    return int(os.getenv(name, default))
+
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+asgi = worker_class.startswith("uvicorn")
+wsgi_app = "csv_toolkit.asgi:application" if asgi else "csv_toolkit.wsgi:application"
+
+# Request handling is mostly waiting on Postgres and Stripe, so run more
+# workers than cores. Each gthread worker also keeps a database connection
+# per thread (CONN_MAX_AGE): Postgres sees up to workers * threads connections.
+workers = _int("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1)
+threads = _int("GUNICORN_THREADS", 1 if asgi else 4)
+
+# Import Django and the app once in the master; workers fork with it loaded,
+# which shortens startup and shares the read-only memory between them
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+
+# Keep client connections open between requests, a little longer than
+# the proxy in front so it never reuses a connection gunicorn just closed
+keepalive = _int("GUNICORN_KEEPALIVE", 5)
+timeout = _int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = _int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+
+# Recycle workers now and then to cap slow memory growth; the jitter keeps
+# them from restarting together
+max_requests = _int("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = _int("GUNICORN_MAX_REQUESTS_JITTER", 100)
+
+# Heartbeat files on tmpfs; a disk-backed /tmp in containers can stall workers
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    # Never share a database connection the master opened before forking
+    if server.cfg.preload_app:
+        from django.db import connections
+
+        connections.close_all()
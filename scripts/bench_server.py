@@ -0,0 +1,167 @@
+"""
+Compare startup time and throughput of runserver and the production servers
+
+    python scripts/bench_server.py --path /api/rooms/ --requests 2000 --concurrency 16
+
+Each server is started on its own port with DEBUG=False, timed until the
+first successful response, then sent requests over keep-alive connections
+from a pool of client threads. The database in DATABASE_URL must be
+migrated; pass --servers to pick which servers to run.
+"""
+import argparse
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Server name -> (command, extra environment); {port} is filled in per run
+SERVERS = {
+    "runserver": (
+        [sys.executable, "manage.py", "runserver", "--noreload", "127.0.0.1:{port}"],
+        {},
+    ),
+    "gunicorn": (
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", "127.0.0.1:{port}"],
+        {},
+    ),
+    "uvicorn": (
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", "127.0.0.1:{port}"],
+        {"GUNICORN_WORKER_CLASS": "uvicorn_worker.UvicornWorker", "DB_CONN_MAX_AGE": "0"},
+    ),
+}
+
+STARTUP_TIMEOUT_SECONDS = 60
+
+
+def get(connection, path):
+    connection.request("GET", path, headers={"Host": "localhost"})
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+
+def wait_until_ready(port, path, process):
+    """Seconds until the server answers ``path`` with a 200"""
+    started = time.perf_counter()
+    while time.perf_counter() - started < STARTUP_TIMEOUT_SECONDS:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            if get(connection, path) == 200:
+                connection.close()
+                return time.perf_counter() - started
+            connection.close()
+        except OSError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"Server did not answer within {STARTUP_TIMEOUT_SECONDS}s")
+
+
+def load(port, path, requests, concurrency):
+    """Send ``requests`` GETs from ``concurrency`` keep-alive clients"""
+    remaining = iter(range(requests))
+    lock = threading.Lock()
+    latencies = []
+    errors = 0
+
+    def client():
+        nonlocal errors
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        try:
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                started = time.perf_counter()
+                try:
+                    ok = get(connection, path) == 200
+                except (OSError, http.client.HTTPException):
+                    # The server closed the connection; reconnect for the next request
+                    connection.close()
+                    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                    ok = False
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    errors += not ok
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "throughput": requests / elapsed,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p95": latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000,
+        "errors": errors,
+    }
+
+
+def bench(name, port, options):
+    command, extra_env = SERVERS[name]
+    env = {**os.environ, "DEBUG": "False", "GUNICORN_ACCESS_LOG": "", **extra_env}
+    process = subprocess.Popen(
+        [part.format(port=port) for part in command],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        startup = wait_until_ready(port, options.path, process)
+        # Warm every worker before measuring
+        load(port, options.path, options.concurrency * 10, options.concurrency)
+        result = load(port, options.path, options.requests, options.concurrency)
+        return {"startup": startup, **result}
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--path", default="/api/rooms/", help="Endpoint to request")
+    parser.add_argument("--requests", type=int, default=2000, help="Measured requests per server")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent client connections")
+    parser.add_argument(
+        "--servers",
+        default="runserver,gunicorn",
+        help=f"Comma separated servers to compare, from {', '.join(SERVERS)}",
+    )
+    parser.add_argument("--port", type=int, default=8100, help="First port to bind servers to")
+    options = parser.parse_args()
+
+    names = [name.strip() for name in options.servers.split(",") if name.strip()]
+    unknown = set(names) - set(SERVERS)
+    if unknown:
+        parser.error(f"Unknown servers: {', '.join(sorted(unknown))}")
+
+    print(f"GET {options.path}: {options.requests} requests, {options.concurrency} concurrent")
+    print(f"{'server':<10} {'startup s':>10} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'errors':>8}")
+    for offset, name in enumerate(names):
+        result = bench(name, options.port + offset, options)
+        print(
+            f"{name:<10} {result['startup']:>10.2f} {result['throughput']:>10.1f} "
+            f"{result['p50']:>10.1f} {result['p95']:>10.1f} {result['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()